@@ -0,0 +1,21 @@
+from flask import Flask
+import pytest
+
+from showcontrol.api import construct_api_blueprint
+
+
+@pytest.fixture
+def client(dispatcher):
+    app = Flask(__name__)
+    app.register_blueprint(construct_api_blueprint(dispatcher), url_prefix="/api")
+    dispatcher.start()
+    return app.test_client()
+
+
+@pytest.mark.parametrize(
+    "url",
+    ["/api/tracks", "/api/upcoming_tracks", "/api/scheduler_state", "/api/services"],
+)
+def test_api_get(benchmark, client, url):
+    response = benchmark(client.get, url)
+    assert response.status_code == 200
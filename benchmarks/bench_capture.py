@@ -0,0 +1,90 @@
+from pathlib import Path
+
+import pytest
+
+from showcontrol.capture import Capture, read_capture, replay
+from showcontrol.emulators import FakeReaper, free_port
+
+
+@pytest.fixture
+def capture(tmp_path, schedctrl) -> Capture:
+    capture = Capture(tmp_path / "test.sccap")
+    capture.attach(schedctrl)
+    yield capture
+    capture.close()
+
+
+def test_capture_and_replay(capture, schedctrl, emulators):
+    """a captured cue is replayed to another fake reaper with the same messages and spacing"""
+    reaper, players = emulators
+    capture.start()
+    schedctrl.play_track("brunnen", False)
+    capture.stop()
+
+    datagrams = list(read_capture(capture.path))
+    reaper_datagrams = [d for d in datagrams if d.sink == "reaper"]
+    assert len(reaper_datagrams) == 4
+    assert [d.message() for d in reaper_datagrams][:2] == [
+        "/track/1/mute [0]",
+        f"/region [{schedctrl.tracks['brunnen'].audio_index}]",
+    ]
+    assert {d.destination for d in reaper_datagrams} == {
+        "{}:{}".format(*reaper.sockets[0].getsockname())
+    }
+    assert any(d.sink == "video" for d in datagrams)
+    assert [d.offset_ns for d in datagrams] == sorted(d.offset_ns for d in datagrams)
+
+    with FakeReaper(("127.0.0.1", free_port())) as target:
+        lateness = replay(
+            reaper_datagrams,
+            speed=10,
+            destinations={
+                reaper.sockets[0].getsockname(): target.sockets[0].getsockname()
+            },
+        )
+        assert target.wait_for(4)
+        assert [f"{address} {args}" for _, address, args in target.messages] == [
+            d.message() for d in reaper_datagrams
+        ]
+    assert len(lateness) == 4
+    assert max(lateness) < 0.05
+
+
+def test_truncated_capture(capture, schedctrl):
+    """a capture cut off by a crash is read up to its last complete record"""
+    schedctrl.play_track("brunnen", False)
+    capture.flush()
+    n_datagrams = len(list(read_capture(capture.path)))
+
+    data = capture.path.read_bytes()
+    truncated = Path(str(capture.path) + ".truncated")
+    truncated.write_bytes(data[:-3])
+    assert len(list(read_capture(truncated))) == n_datagrams - 1
+
+
+def test_record(benchmark, capture):
+    """cost a capture adds to every datagram that is sent"""
+    data = b'{"command": ["set_property", "pause", "no"]}\n'
+    benchmark(capture.record, "default", "video", ("127.255.255.255", 12000), data)
+    assert capture.flush() > 0
+
+
+def test_send_with_capture(benchmark, capture, schedctrl, emulators):
+    reaper, players = emulators
+    benchmark(
+        schedctrl.send_udp_broadcast, {"command": ["set_property", "pause", "no"]}
+    )
+    assert players[0].wait_for(1)
+    capture.flush()
+    assert capture.n_captured > 0
+
+
+def test_stop_closes_capture(tmp_path, dispatcher, schedctrl):
+    """the capture file is closed when showcontrol stops"""
+    dispatcher.capture = Capture(tmp_path / "stop.sccap")
+    dispatcher.capture.attach(schedctrl)
+    dispatcher.capture.start()
+    schedctrl.play_track("brunnen", False)
+    dispatcher.stop()
+    assert dispatcher.capture._file is None
+    assert len(list(read_capture(tmp_path / "stop.sccap"))) > 0
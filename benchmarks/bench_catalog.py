@@ -0,0 +1,65 @@
+import pytest
+
+from showcontrol.catalog import Track, TrackCatalog, read_catalog
+from showcontrol.config import ConfigError, read_tracks
+
+
+@pytest.fixture(scope="module")
+def catalog(config_dir):
+    return read_catalog(config_dir / "tracks")
+
+
+def test_read_catalog(benchmark, config_dir):
+    catalog = benchmark(read_catalog, config_dir / "tracks")
+    assert set(catalog) == set(read_tracks(config_dir / "tracks"))
+
+
+def test_lookup_by_audio_index(benchmark, catalog):
+    indexes = [track.audio_index for track in catalog.values()]
+
+    def lookup_all():
+        return [catalog.by_audio_index(i) for i in indexes]
+
+    tracks = benchmark(lookup_all)
+    assert [track.audio_index for track in tracks] == indexes
+
+
+def test_matches_read_tracks(config_dir, catalog):
+    # the track records hold the same data as the dicts of read_tracks
+    tracks = read_tracks(config_dir / "tracks")
+    for name, track in tracks.items():
+        record = catalog[name]
+        duration = track["duration"]
+        assert record.duration == duration["minutes"] * 60 + duration["seconds"]
+        assert record.as_dict() == track
+        if record.video_index is not None:
+            assert catalog.by_video_index(record.video_index) is record
+
+
+def test_unique_indexes():
+    catalog = TrackCatalog([Track("a", "A", 1, 1, 60), Track("b", "B", 2, None, 60)])
+    with pytest.raises(ConfigError):
+        catalog.add(Track("c", "C", 1, 3, 60))
+    with pytest.raises(ConfigError):
+        catalog.add(Track("c", "C", 3, 1, 60))
+    with pytest.raises(ConfigError):
+        catalog.replace([Track("a", "A", 1, 1, 60), Track("a", "A", 2, 2, 60)])
+    # a failed change leaves the catalog as it was
+    assert list(catalog) == ["a", "b"]
+    catalog.add(Track("c", "C", 3, None, 60))
+    assert catalog.by_audio_index(3).name == "c"
+
+
+def test_version_invalidates_sorted_tracks():
+    catalog = TrackCatalog([Track("b", "B", 2, None, 60)])
+    assert [t.name for t in catalog.sorted_by_audio_index()] == ["b"]
+    catalog.add(Track("a", "A", 1, None, 60))
+    assert [t.name for t in catalog.sorted_by_audio_index()] == ["a", "b"]
+    catalog.remove("b")
+    assert [t.name for t in catalog.sorted_by_audio_index()] == ["a"]
+
+
+def test_zones_share_catalog(dispatcher):
+    # zones with the same tracks dir use the same catalog
+    catalogs = {id(zone.tracks) for zone in dispatcher.zones.values()}
+    assert len(catalogs) == len(dispatcher.catalogs)
@@ -0,0 +1,122 @@
+from datetime import datetime, timedelta
+
+from apscheduler.triggers.cron import CronTrigger
+import pytest
+
+from showcontrol.clock import ClockWatchdog, ManualClock
+
+
+@pytest.fixture
+def armed(dispatcher, schedctrl):
+    """the zone with only a cron job at 12:00 and a date job in ten minutes, the scheduler computed their fire times"""
+    schedctrl.sched.remove_all_jobs(jobstore=schedctrl.name)
+    schedctrl.arm_cue_queue()
+    schedctrl.last_cue = None
+    now = schedctrl.clock.now()
+    cron = schedctrl.sched.add_job(
+        schedctrl.play_scheduled_track,
+        "cron",
+        hour=12,
+        minute=0,
+        args=["brunnen"],
+        jobstore=schedctrl.name,
+    )
+    date = schedctrl.sched.add_job(
+        schedctrl.play_scheduled_track,
+        "date",
+        run_date=now + timedelta(minutes=10),
+        args=["pune"],
+        jobstore=schedctrl.name,
+    )
+    schedctrl.sched.start(paused=True)
+    dispatcher.clock_watchdog.reset()
+    return cron, date
+
+
+def next_noon(after: datetime) -> datetime:
+    noon = after.replace(hour=12, minute=0, second=0, microsecond=0)
+    return noon if noon > after else noon + timedelta(days=1)
+
+
+def test_detect_step():
+    clock = ManualClock(datetime(2026, 3, 28, 23, 0).astimezone())
+    events = []
+    watchdog = ClockWatchdog(lambda step, event: events.append(event), clock=clock)
+
+    clock.advance(60)
+    clock.step(1.5)
+    assert watchdog.check() is None
+
+    clock.advance(1)
+    clock.step(-3600)
+    event = watchdog.check()
+    assert event["kind"] == "step"
+    assert event["step"] == pytest.approx(-3600)
+
+    clock.advance(1)
+    clock.set_utcoffset(2)
+    event = watchdog.check()
+    assert event["kind"] == "utcoffset"
+    assert event["step"] == pytest.approx(0)
+    assert events == list(watchdog.events)
+
+
+def test_rearm_forward_step(dispatcher, schedctrl, armed):
+    """a cron job is re-armed from the new time, a date job moves with the clock"""
+    cron, date = armed
+    date_time = date.next_run_time
+
+    schedctrl.clock.step(86400 + 3600)
+    event = dispatcher.clock_watchdog.check()
+    assert event["step"] == pytest.approx(86400 + 3600)
+
+    now = schedctrl.clock.now()
+    assert cron.trigger.get_next_fire_time(None, now) == next_noon(now)
+    assert schedctrl.sched.get_job(cron.id).next_run_time == next_noon(now)
+    assert schedctrl.sched.get_job(date.id).next_run_time == date_time + timedelta(
+        seconds=86400 + 3600
+    )
+
+
+def test_rearm_backward_step(dispatcher, schedctrl, armed):
+    """after a backwards step no job fires while the last track is still playing, so nothing is replayed"""
+    cron, date = armed
+    cron.reschedule(CronTrigger(minute="*"))
+    schedctrl.play_track("brunnen", False)
+    _, started = schedctrl.last_cue
+
+    schedctrl.clock.step(-600)
+    assert dispatcher.clock_watchdog.check()["step"] == pytest.approx(-600)
+
+    now = schedctrl.clock.now()
+    playing_until = now + timedelta(
+        seconds=schedctrl.get_track_duration("brunnen")
+        - (schedctrl.clock.monotonic() - started)
+    )
+    next_run_time = schedctrl.sched.get_job(cron.id).next_run_time
+    assert next_run_time >= playing_until
+    assert next_run_time - playing_until <= timedelta(minutes=1)
+    # the date job was queued relative to the clock, it still fires ten minutes after it was queued
+    remaining = schedctrl.sched.get_job(date.id).next_run_time - now
+    assert remaining.total_seconds() == pytest.approx(
+        600 - schedctrl.clock.monotonic(), abs=1e-3
+    )
+
+
+def test_rearm_keeps_absolute_cues(dispatcher, schedctrl, armed):
+    """a cue queued at a time of day keeps it when ntp corrects the clock, a cue queued in seconds moves"""
+    now = schedctrl.clock.now()
+    absolute = schedctrl.queue_track("pune", when=now + timedelta(hours=2))
+    relative = schedctrl.queue_track("sufi", in_seconds=7200)
+
+    schedctrl.clock.step(3600)
+    assert dispatcher.clock_watchdog.check()["step"] == pytest.approx(3600)
+
+    assert schedctrl.cue_queue.get(absolute.id).time == absolute.time
+    assert schedctrl.cue_queue.get(relative.id).time == relative.time + timedelta(
+        hours=1
+    )
+    assert [cue.id for cue in schedctrl.cue_queue.upcoming()] == [
+        absolute.id,
+        relative.id,
+    ]
@@ -0,0 +1,144 @@
+from datetime import timedelta
+import os
+import struct
+import tracemalloc
+
+import pytest
+
+from showcontrol.compiled import (
+    CompiledSchedule,
+    CompiledScheduleWriter,
+    compiled_path,
+    header,
+    load_schedule,
+)
+from showcontrol.config import ConfigError, read_schedule
+from showcontrol.export import YAMLWriter, export_schedule
+from showcontrol.schedule_generator import read_programme, weekly_entries
+
+
+@pytest.fixture(scope="module")
+def schedule_file(config_dir, tmp_path_factory):
+    """the weekly schedule as yaml and compiled schedule"""
+    path = tmp_path_factory.mktemp("compiled") / "schedule.yml"
+    tracks, blocks, blockplan = read_programme(config_dir)
+    export_schedule(
+        weekly_entries(blockplan, blocks, tracks),
+        [YAMLWriter(path, tracks), CompiledScheduleWriter(compiled_path(path), tracks)],
+    )
+    return path
+
+
+def expanded(schedule: list[dict]) -> set[tuple]:
+    """one record per day and play, the compiled schedule groups the days differently"""
+    return {
+        (entry["track_id"], entry["hour"], entry["minute"], entry["second"], day)
+        for entry in schedule
+        for day in (
+            [entry["date"]] if "date" in entry else str(entry["day_of_week"]).split(",")
+        )
+    }
+
+
+def peak_memory(function, *args) -> int:
+    tracemalloc.start()
+    try:
+        function(*args)
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def test_load_yaml(benchmark, schedule_file):
+    schedule = benchmark(read_schedule, schedule_file)
+    benchmark.extra_info["peak_bytes"] = peak_memory(read_schedule, schedule_file)
+    benchmark.extra_info["file_bytes"] = schedule_file.stat().st_size
+    assert len(schedule) > 0
+
+
+def test_load_compiled(benchmark, schedule_file):
+    schedule = benchmark(load_schedule, schedule_file)
+
+    assert expanded(schedule) == expanded(read_schedule(schedule_file))
+    peak = peak_memory(load_schedule, schedule_file)
+    assert peak < peak_memory(read_schedule, schedule_file) / 5
+    benchmark.extra_info["peak_bytes"] = peak
+    benchmark.extra_info["file_bytes"] = compiled_path(schedule_file).stat().st_size
+
+
+def test_open_compiled(benchmark, schedule_file):
+    """mapping the file, the records are not touched"""
+
+    def open_close():
+        with CompiledSchedule(compiled_path(schedule_file)) as compiled:
+            return len(compiled)
+
+    assert benchmark(open_close) == len(expanded(read_schedule(schedule_file)))
+
+
+def test_stale_or_broken_compiled(schedule_file, tmp_path):
+    """an older or invalid compiled schedule is ignored"""
+    yaml_path = tmp_path / "schedule.yml"
+    yaml_path.write_bytes(schedule_file.read_bytes())
+    stale = compiled_path(yaml_path)
+    stale.write_bytes(compiled_path(schedule_file).read_bytes())
+    mtime = yaml_path.stat().st_mtime
+    os.utime(stale, (mtime - 60, mtime - 60))
+    assert load_schedule(yaml_path) == read_schedule(yaml_path)
+
+    stale.write_bytes(b"not a compiled schedule")
+    assert load_schedule(yaml_path) == read_schedule(yaml_path)
+
+
+def corrupted(data: bytes, offset: int, patch: bytes) -> bytes:
+    return data[:offset] + patch + data[offset + len(patch) :]
+
+
+def test_corrupt_compiled(schedule_file, tmp_path):
+    """a compiled schedule with a corrupt track table or track ordinals is rejected when it is opened"""
+    yaml_path = tmp_path / "schedule.yml"
+    yaml_path.write_bytes(schedule_file.read_bytes())
+    path = compiled_path(yaml_path)
+    data = compiled_path(schedule_file).read_bytes()
+    _, _, _, n_tracks, n_weekly, _, names_size = header.unpack_from(data)
+    weekly_tracks = header.size + (names_size + 3) // 4 * 4 + 4 * n_weekly
+
+    for broken in [
+        corrupted(data, header.size, b"\xff\xfe"),
+        corrupted(data, weekly_tracks, struct.pack("<H", n_tracks)),
+        corrupted(data, header.size - 4, struct.pack("<I", names_size + 4096)),
+        data[: weekly_tracks + 1],
+    ]:
+        path.write_bytes(broken)
+        with pytest.raises(ConfigError):
+            CompiledSchedule(path)
+        assert load_schedule(yaml_path) == read_schedule(yaml_path)
+
+
+def test_engine_loads_compiled(schedule_file, schedctrl):
+    """the engine fires the same cues from the compiled schedule as from the yaml schedule"""
+
+    def fire_times() -> list[tuple]:
+        """every cue of the next two weeks, the jobs are grouped differently"""
+        schedctrl.sched.remove_all_jobs(jobstore=schedctrl.name)
+        schedctrl.add_jobs_to_scheduler()
+        start = schedctrl.clock.now()
+        times = []
+        for job in schedctrl.sched.get_jobs(jobstore=schedctrl.name):
+            fire_time = job.trigger.get_next_fire_time(None, start)
+            while fire_time is not None and fire_time < start + timedelta(days=14):
+                times.append((fire_time, job.args[0]))
+                fire_time = job.trigger.get_next_fire_time(fire_time, fire_time)
+        return sorted(times)
+
+    schedctrl.zone.schedule_file_path = schedule_file
+    from_compiled = fire_times()
+    compiled = compiled_path(schedule_file)
+    moved = compiled.with_suffix(".moved")
+    compiled.rename(moved)
+    try:
+        from_yaml = fire_times()
+    finally:
+        moved.rename(compiled)
+    assert len(from_yaml) > 100
+    assert from_compiled == from_yaml
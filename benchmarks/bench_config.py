@@ -0,0 +1,39 @@
+import pytest
+
+from showcontrol.config import (
+    ConfigError,
+    read_blocks,
+    read_schedule,
+    read_tracks,
+    read_zones,
+)
+from showcontrol.liveness import heartbeat_jobstore
+
+
+def test_read_tracks(benchmark, config_dir):
+    tracks = benchmark(read_tracks, config_dir / "tracks")
+    assert "brunnen" in tracks
+
+
+def test_read_tracks_by_audio_index(benchmark, config_dir):
+    tracks = benchmark(read_tracks, config_dir / "tracks", identifier_is_name=False)
+    assert 2 in tracks
+
+
+def test_read_blocks(benchmark, config_dir):
+    blocks = benchmark(read_blocks, config_dir / "blocks")
+    assert "student_pieces" in blocks
+
+
+def test_read_schedule(benchmark, config_dir):
+    schedule = benchmark(read_schedule, config_dir / "schedule.yml")
+    assert len(schedule) > 100
+
+
+def test_reserved_zone_name(config_dir):
+    """a zone can not take the jobstore of the heartbeat"""
+    with pytest.raises(ConfigError):
+        read_zones({"zones": [{"name": heartbeat_jobstore}]})
+    assert [zone.name for zone in read_zones({"zones": [{"name": "heartbeat"}]})] == [
+        "heartbeat"
+    ]
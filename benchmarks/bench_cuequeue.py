@@ -0,0 +1,121 @@
+from datetime import datetime, timedelta
+import random
+
+from flask import Flask
+import pytest
+
+from showcontrol.api import construct_api_blueprint
+from showcontrol.cuequeue import CueQueue, idle_time
+from showcontrol.simulation import Simulation
+
+
+@pytest.fixture
+def start() -> datetime:
+    return datetime(2026, 5, 4, 10, 0).astimezone()
+
+
+def filled_queue(n_cues: int, start: datetime) -> tuple[CueQueue, list[str]]:
+    queue = CueQueue(lambda track_id: 300)
+    rng = random.Random(n_cues)
+    ids = [
+        queue.add("brunnen", start + timedelta(seconds=rng.randrange(86400))).id
+        for _ in range(n_cues)
+    ]
+    return queue, ids
+
+
+@pytest.mark.parametrize("n_cues", [100, 10000])
+def test_queue_and_cancel(benchmark, start, n_cues):
+    """queueing n_cues from an automated system, then moving and cancelling half of them"""
+
+    def churn():
+        queue, ids = filled_queue(n_cues, start)
+        for cue_id in ids[::4]:
+            queue.reschedule(cue_id, queue.get(cue_id).time + timedelta(minutes=5))
+        for cue_id in ids[1::4]:
+            queue.cancel(cue_id)
+        return queue
+
+    queue = benchmark(churn)
+    assert len(queue) == n_cues - len(range(1, n_cues, 4))
+
+
+@pytest.mark.parametrize("n_cues", [100, 10000])
+def test_upcoming(benchmark, start, n_cues):
+    queue, ids = filled_queue(n_cues, start)
+    for cue_id in ids[::2]:
+        queue.cancel(cue_id)
+
+    upcoming = benchmark(queue.upcoming, 20)
+    assert upcoming == queue.upcoming()[:20]
+
+
+def test_pop_due_and_tail(start):
+    queue, ids = filled_queue(1000, start)
+    last = max(queue.upcoming(), key=lambda cue: cue.end)
+    assert queue.tail() == last.end
+    queue.cancel(last.id)
+    assert queue.tail() == max(cue.end for cue in queue.upcoming())
+
+    due = queue.pop_due(start + timedelta(hours=12))
+    assert [cue.time for cue in due] == sorted(cue.time for cue in due)
+    assert all(cue.time > start + timedelta(hours=12) for cue in queue.upcoming())
+    assert len(due) + len(queue) == 999
+
+
+def test_append_back_to_back(dispatcher, schedctrl, start):
+    """appended cues play one after another, moved and cancelled cues are respected"""
+    schedctrl.sched.remove_all_jobs(jobstore=schedctrl.name)
+    schedctrl.last_cue = None
+    sim = Simulation(start, dispatcher)
+    schedctrl.cue_queue.clear()
+
+    track_ids = ["brunnen", "trailer", "pune"]
+    cues = [schedctrl.queue_track(track_id, append=True) for track_id in track_ids]
+    for previous, cue in zip(cues, cues[1:]):
+        assert cue.time == previous.end
+    moved = schedctrl.queue_track("brunnen", in_seconds=60)
+    schedctrl.reschedule_cue(moved.id, append=True)
+    schedctrl.cancel_cue(cues[1].id)
+
+    # the queue job is armed for the first cue
+    job = schedctrl.sched.get_job(schedctrl.queue_job_id, schedctrl.name)
+    assert job.next_run_time == cues[0].time
+
+    sim.run(start + timedelta(hours=2))
+    assert [(time, track_id) for time, _, track_id in sim.cues] == [
+        (cues[0].time, "brunnen"),
+        (cues[2].time, "pune"),
+        (cues[2].end, "brunnen"),
+    ]
+    assert len(schedctrl.cue_queue) == 0
+    assert job.trigger.get_next_fire_time(None, start) == idle_time
+
+
+def test_api_queue(dispatcher, schedctrl):
+    app = Flask(__name__)
+    app.register_blueprint(construct_api_blueprint(dispatcher), url_prefix="/api")
+    client = app.test_client()
+    schedctrl.cue_queue.clear()
+
+    response = client.post("/api/queue?track_id=brunnen&interval=600")
+    assert response.status_code == 200
+    cue = response.json
+    at = (schedctrl.clock.now() + timedelta(hours=1)).isoformat()
+    response = client.post("/api/queue", query_string={"track_id": "pune", "at": at})
+    assert response.status_code == 200
+    assert client.post("/api/queue?track_id=nosuchtrack&interval=1").status_code == 404
+    assert client.post("/api/queue?track_id=pune&at=tomorrow").status_code == 400
+    assert client.post("/api/queue?track_id=pune").status_code == 400
+
+    queued = client.get("/api/queue").json
+    assert [c["track_id"] for c in queued] == ["brunnen", "pune"]
+    assert queued[0]["title"] == schedctrl.tracks["brunnen"].title
+
+    moved = client.put(f"/api/queue/{cue['id']}?interval=7200").json
+    assert moved["id"] == cue["id"]
+    assert [c["track_id"] for c in client.get("/api/queue").json] == ["pune", "brunnen"]
+
+    assert client.delete(f"/api/queue/{cue['id']}").status_code == 200
+    assert client.delete(f"/api/queue/{cue['id']}").status_code == 404
+    assert len(schedctrl.cue_queue) == 1
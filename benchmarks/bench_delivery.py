@@ -0,0 +1,76 @@
+import statistics
+import time
+
+import pytest
+
+from showcontrol.delivery import VideoDelivery, create_video_delivery
+from showcontrol.emulators import free_port, receive_skew_ns, syncplayer_fleet
+
+multicast_group = "239.255.19.1"
+message = b'{"command": ["set_property", "pause", "no"]}\n'
+
+
+@pytest.fixture(scope="module")
+def players():
+    """eight players listening for broadcasts, on a multicast group and on their own address"""
+    players = [
+        p.start()
+        for p in syncplayer_fleet(
+            8,
+            free_port(),
+            free_port(),
+            first_address=31,
+            multicast_group=multicast_group,
+        )
+    ]
+    yield players
+    for player in players:
+        player.close()
+
+
+def delivery_config(mode: str, players) -> dict:
+    return {
+        "video_delivery": mode,
+        "broadcast_ip": "127.255.255.255",
+        "multicast_group": multicast_group,
+        "multicast_interface": "127.0.0.1",
+        "system": [
+            {"name": p.name, "ip": p.address, "services": ["mpv"]} for p in players
+        ],
+    }
+
+
+@pytest.mark.parametrize("mode", ["broadcast", "multicast", "unicast"])
+def test_send(benchmark, players, mode):
+    """cost of sending one command to all players, receive skew is the spread of the arrival
+    times of a command over the players"""
+    delivery = create_video_delivery(delivery_config(mode, players))
+    port = players[0].video_port
+
+    benchmark(delivery.send, message, [port])
+
+    # let the players drain the datagrams of the benchmark
+    time.sleep(0.2)
+    for player in players:
+        player.clear()
+    n_commands = 50
+    for i in range(n_commands):
+        delivery.send(message, [port])
+        # one command at a time, so the skew of a command is not inflated by the queue of the previous ones
+        assert all(p.wait_for(i + 1) for p in players)
+    delivery.close()
+
+    skews = [receive_skew_ns(players, i) for i in range(n_commands)]
+    assert None not in skews
+    benchmark.extra_info["receive_skew_us_median"] = statistics.median(skews) / 1000
+    benchmark.extra_info["receive_skew_us_max"] = max(skews) / 1000
+
+
+def test_incomplete_delivery():
+    """a delivery without destinations fails when it is created, not when the first cue is sent"""
+
+    class IncompleteDelivery(VideoDelivery):
+        mode = "incomplete"
+
+    with pytest.raises(TypeError):
+        IncompleteDelivery()
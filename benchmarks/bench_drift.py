@@ -0,0 +1,86 @@
+import json
+import time
+
+import pytest
+from pythonosc.udp_client import SimpleUDPClient
+
+from showcontrol.delivery import UnicastDelivery
+from showcontrol.drift import DriftCorrector
+from showcontrol.emulators import FakeReaper, free_port, syncplayer_fleet
+from showcontrol.syncmonitor import ReaperFeedback, SyncPoller
+
+poll_interval = 0.2
+duration = 4.0
+
+
+@pytest.mark.parametrize("correction", [False, True])
+def test_drift_correction(benchmark, correction):
+    """players running 2% faster than reaper, with and without the correction loop"""
+    feedback = ReaperFeedback(("127.0.0.1", 0))
+    feedback.start()
+    reaper = FakeReaper(
+        ("127.0.0.1", free_port()), feedback_address=feedback.address
+    ).start()
+    players = [
+        p.start()
+        for p in syncplayer_fleet(
+            4, free_port(), free_port(), first_address=61, rate=1.02
+        )
+    ]
+    video_port = players[0].video_port
+    delivery = UnicastDelivery({p.name: p.address for p in players})
+
+    def send(command: dict, targets: list[str] | None):
+        message = json.dumps(command).encode("utf-8") + b"\n"
+        delivery.send(message, [video_port], targets)
+
+    poller = SyncPoller(
+        UnicastDelivery({p.name: p.address for p in players}),
+        {p.name: p.address for p in players},
+        players[0].info_port,
+        reaper_feedback=feedback,
+        interval=poll_interval,
+    )
+    corrector = DriftCorrector(
+        send,
+        feedback,
+        targeted=True,
+        poll_interval=poll_interval,
+        threshold=0.02,
+        max_speed_change=0.05,
+        min_interval=0.5,
+    )
+    if correction:
+        poller.on_sample = corrector.update
+
+    osc = SimpleUDPClient(*reaper.sockets[0].getsockname())
+    osc.send_message("/region", [1])
+    osc.send_message("/play", [1.0])
+    send({"command": ["playlist-play-index", 1]}, None)
+    send({"command": ["set_property", "pause", "no"]}, None)
+
+    def run():
+        t_end = time.monotonic() + duration
+        while time.monotonic() < t_end:
+            poller.poll()
+            time.sleep(poll_interval)
+
+    benchmark.pedantic(run, rounds=1, iterations=1)
+    offsets = [
+        abs(offset)
+        for sample in list(poller.history)[len(poller.history) // 2 :]
+        for offset in sample.reaper_offsets.values()
+    ]
+    poller.close()
+    delivery.close()
+    feedback.close()
+    for emulator in [reaper, *players]:
+        emulator.close()
+
+    benchmark.extra_info["max_drift_ms_second_half"] = max(offsets) * 1000
+    benchmark.extra_info["n_corrections"] = len(corrector.corrections)
+    if correction:
+        assert max(offsets) < 0.05
+        assert all(c["kind"] == "speed" for c in corrector.corrections)
+    else:
+        assert max(offsets) > 0.05
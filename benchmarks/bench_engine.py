@@ -0,0 +1,53 @@
+from datetime import timedelta
+
+import pytest
+
+from showcontrol.simulation import Simulation
+
+
+def test_send_udp_broadcast(benchmark, schedctrl, emulators):
+    reaper, players = emulators
+    benchmark(
+        schedctrl.send_udp_broadcast, {"command": ["set_property", "pause", "no"]}
+    )
+    assert players[0].wait_for(1)
+
+
+def test_play_track(benchmark, schedctrl, emulators):
+    reaper, players = emulators
+    benchmark(schedctrl.play_track, "brunnen", False)
+    assert reaper.wait_for(4)
+
+
+@pytest.mark.parametrize("n_adhoc_jobs", [0, 1000, 5000])
+def test_get_upcoming_tracks(benchmark, schedctrl, n_adhoc_jobs):
+    # the shipped schedule plus a number of manually queued tracks
+    track_ids = list(schedctrl.tracks)
+    for i in range(n_adhoc_jobs):
+        schedctrl.schedule_track(track_ids[i % len(track_ids)], 60 + i * 10)
+    schedctrl.sched.start(paused=True)
+
+    upcoming = benchmark(schedctrl.get_upcoming_tracks, 20)
+    assert len(upcoming) == 20
+
+
+@pytest.mark.parametrize("cue_interval", [None, 60])
+def test_simulate_week(benchmark, dispatcher, schedctrl, cue_interval):
+    """throughput of the engine in virtual time, with the shipped schedule or a cue every cue_interval seconds"""
+    if cue_interval is not None:
+        schedctrl.sched.remove_all_jobs()
+        schedctrl.sched.add_job(
+            schedctrl.play_scheduled_track,
+            "interval",
+            seconds=cue_interval,
+            args=["trailer"],
+            jobstore=schedctrl.name,
+        )
+    start = schedctrl.clock.now()
+
+    def simulate():
+        sim = Simulation(start, dispatcher)
+        return sim.run(start + timedelta(days=7))
+
+    n_fired = benchmark.pedantic(simulate, rounds=3)
+    assert n_fired > 100
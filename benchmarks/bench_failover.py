@@ -0,0 +1,102 @@
+import time
+
+import pytest
+
+from showcontrol.emulators import free_port
+from showcontrol.failover import Failover, FailoverNode
+
+interval = 0.05
+timeout = 0.3
+
+
+def wait_until(condition, timeout: float = 2.0) -> bool:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if condition():
+            return True
+        time.sleep(0.005)
+    return condition()
+
+
+@pytest.fixture
+def pair():
+    """two failover instances talking over loopback, a has priority"""
+    a = FailoverNode("showcontrol-a", "127.0.0.1", free_port(), priority=1)
+    b = FailoverNode("showcontrol-b", "127.0.0.1", free_port())
+    failovers = [
+        Failover(a, b, interval=interval, timeout=timeout),
+        Failover(b, a, interval=interval, timeout=timeout),
+    ]
+    for failover in failovers:
+        failover.start()
+    yield failovers
+    for failover in failovers:
+        failover.stop()
+
+
+def test_takeover(pair):
+    """only the active instance fires while both are up, the standby takes over within the timeout and
+    catches up on the cue the active instance missed, but not on the one it dispatched
+    """
+    active, standby = pair
+    assert wait_until(lambda: active.active and standby.role == "standby")
+
+    takeovers = []
+    standby.on_takeover = lambda zone, track_id: takeovers.append(
+        (zone, track_id, time.monotonic())
+    )
+
+    # both schedulers fire every cue, only one instance dispatches it
+    for track_id in ["brunnen", "trailer", "pune"]:
+        fired = [f for f in pair if f.may_fire("hall", track_id)]
+        assert fired == [active]
+        active.cue_fired("hall", track_id)
+    assert wait_until(
+        lambda: standby.peer_heartbeat.get("last_cue", {}).get("hall", [None])[0]
+        == "pune"
+    )
+
+    # the active instance stops beating before it dispatched the cue of the foyer
+    assert not standby.may_fire("foyer", "sufi")
+    active.stop()
+
+    assert wait_until(lambda: standby.active)
+    assert wait_until(lambda: takeovers)
+    zone, track_id, taken_over = takeovers[0]
+    assert taken_over - standby.peer_seen <= timeout + interval
+    # the cues of the hall were dispatched by the peer, they are not fired twice
+    assert [(zone, track_id) for zone, track_id, _ in takeovers] == [("foyer", "sufi")]
+    assert standby.may_fire("hall", "brunnen")
+
+
+def test_restarted_instance_stands_by(pair):
+    """an instance that starts next to an active peer never fires, even with the higher priority"""
+    a, b = pair
+    assert wait_until(lambda: a.active)
+    a.stop()
+    assert wait_until(lambda: b.active)
+
+    restarted = Failover(a.node, b.node, interval=interval, timeout=timeout)
+    restarted.start()
+    try:
+        assert not restarted.may_fire("hall", "brunnen")
+        assert wait_until(lambda: restarted.role != "starting")
+        assert wait_until(lambda: restarted.active != b.active)
+    finally:
+        restarted.stop()
+
+
+def test_lone_instance_catches_up():
+    """an instance without a running peer fires the cue due while it was starting once it is active"""
+    a = FailoverNode("showcontrol-a", "127.0.0.1", free_port())
+    b = FailoverNode("showcontrol-b", "127.0.0.1", free_port())
+    failover = Failover(a, b, interval=interval, timeout=timeout)
+    takeovers = []
+    failover.on_takeover = lambda zone, track_id: takeovers.append((zone, track_id))
+    failover.start()
+    try:
+        assert not failover.may_fire("hall", "brunnen")
+        assert wait_until(lambda: failover.active)
+        assert takeovers == [("hall", "brunnen")]
+    finally:
+        failover.stop()
@@ -0,0 +1,114 @@
+import json
+
+import pytest
+
+from click.testing import CliRunner
+
+from showcontrol import schedule_generator
+from showcontrol.export import (
+    ScheduleEntry,
+    ScheduleWriter,
+    YAMLWriter,
+    export_filenames,
+    export_paths,
+    export_schedule,
+    writer_classes,
+)
+from showcontrol.schedule_generator import (
+    create_alternative_schedule,
+    create_readable_txt,
+    create_schedule,
+    read_entries,
+    read_programme,
+    season_timeline,
+)
+from showcontrol.season import read_season
+from showcontrol.validation import Issue, ValidationResult
+
+
+def test_create_schedule(benchmark, config_dir, tmp_path):
+    output_file = tmp_path / "schedule.yml"
+    benchmark(create_schedule, config_dir, output_file)
+    assert output_file.stat().st_size > 0
+
+
+def test_create_readable_txt(benchmark, config_dir, tmp_path):
+    output_file = tmp_path / "full_schedule.txt"
+    benchmark(
+        create_readable_txt,
+        config_dir / "schedule.yml",
+        str(output_file),
+        config_dir / "tracks",
+    )
+    assert output_file.stat().st_size > 0
+
+
+def test_create_alternative_schedule(benchmark, config_dir, tmp_path):
+    output_file = tmp_path / "track_schedule.txt"
+    benchmark(
+        create_alternative_schedule,
+        config_dir / "schedule.yml",
+        output_file,
+        config_dir / "tracks",
+    )
+    assert output_file.stat().st_size > 0
+
+
+def test_export_season(benchmark, config_dir, tmp_path):
+    """a season schedule and every export in one pass over the timeline"""
+    tracks, blocks, blockplan = read_programme(config_dir)
+    season = read_season(config_dir / "season.yml", blockplan)
+    entries = [
+        ScheduleEntry.from_play(play)
+        for play in season_timeline(season, blocks, tracks)
+    ]
+    paths = export_paths(tmp_path, export_filenames, "season")
+    writers = [YAMLWriter(tmp_path / "schedule.yml", tracks)] + [
+        writer_classes[name](path, tracks) for name, path in paths.items()
+    ]
+
+    n_entries = benchmark(export_schedule, entries, writers)
+
+    assert n_entries == len(entries)
+    assert read_entries(tmp_path / "schedule.yml") == entries
+    with open(paths["json"]) as f:
+        assert len(json.load(f)) == n_entries
+    with open(paths["ics"]) as f:
+        assert f.read().count("BEGIN:VEVENT") == n_entries
+    benchmark.extra_info["n_entries"] = n_entries
+
+
+def test_invalid_schedule_not_written(config_dir, tmp_path, monkeypatch):
+    """a schedule with errors leaves no file behind that the engine could load"""
+    overlap = Issue("overlap", 0, 39600, "pune", "pune starts 60s before sufi ends")
+    monkeypatch.setattr(
+        schedule_generator,
+        "validate_entries",
+        lambda entries, *args: ValidationResult([overlap], len(entries), 1, set()),
+    )
+    output_file = tmp_path / "schedule.yml"
+    result = CliRunner().invoke(
+        schedule_generator.main,
+        ["-c", str(config_dir), "-o", str(output_file), "-r", str(tmp_path)],
+    )
+    assert result.exit_code == 1
+    assert "not written" in result.output
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_export_closes_writers(config_dir, tmp_path):
+    """a writer that can not be opened closes the ones opened before it"""
+    tracks, _, _ = read_programme(config_dir)
+    writers = [
+        YAMLWriter(tmp_path / "schedule.yml", tracks),
+        YAMLWriter(tmp_path / "missing" / "schedule.yml", tracks),
+    ]
+    with pytest.raises(FileNotFoundError):
+        export_schedule([], writers)
+    assert writers[0].file is None
+
+    class IncompleteWriter(ScheduleWriter):
+        pass
+
+    with pytest.raises(TypeError):
+        IncompleteWriter(tmp_path / "schedule.txt", tracks)
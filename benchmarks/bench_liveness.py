@@ -0,0 +1,113 @@
+import time
+
+from apscheduler.jobstores.memory import MemoryJobStore
+from apscheduler.schedulers.background import BackgroundScheduler
+from flask import Flask
+import pytest
+
+from showcontrol.api import construct_api_blueprint
+from showcontrol.clock import ManualClock
+from showcontrol.dispatcher import Dispatcher
+from showcontrol.emulators import FakeNotifySocket, FakeServiceTransport
+from showcontrol.liveness import Heartbeat, SystemdNotifier
+
+interval = 0.2
+max_lateness = 0.1
+
+
+@pytest.fixture
+def notify_socket(tmp_path):
+    with FakeNotifySocket(tmp_path / "notify") as notify_socket:
+        yield notify_socket
+
+
+@pytest.fixture
+def watched(config_dir, notify_socket):
+    """Dispatcher as started by systemd with a short WatchdogSec"""
+    dispatcher = Dispatcher(
+        clock=ManualClock(),
+        service_transport=FakeServiceTransport(),
+        notifier=SystemdNotifier(notify_socket.path),
+    )
+    dispatcher.heartbeat.interval = interval
+    dispatcher.heartbeat.max_lateness = max_lateness
+    yield dispatcher
+    dispatcher.stop()
+
+
+def test_ready_and_watchdog(watched, notify_socket):
+    assert not notify_socket.times("READY=1")
+    watched.start()
+    assert notify_socket.wait_for("READY=1")
+    assert notify_socket.wait_for("WATCHDOG=1", 5, timeout=2)
+
+    pings = notify_socket.times("WATCHDOG=1")
+    assert notify_socket.times("READY=1")[0] < pings[0]
+    gaps = [b - a for a, b in zip(pings, pings[1:])]
+    assert max(gaps) < interval + max_lateness
+    assert watched.heartbeat.is_alive()
+
+    watched.stop()
+    assert notify_socket.wait_for("STOPPING=1")
+
+
+def test_wedged_scheduler(watched, notify_socket):
+    """a scheduler loop that does not advance stops the pings and fails the health check"""
+    app = Flask(__name__)
+    app.register_blueprint(construct_api_blueprint(watched), url_prefix="/api")
+    client = app.test_client()
+    watched.start()
+    assert notify_socket.wait_for("WATCHDOG=1", 2)
+    response = client.get("/api/health")
+    assert response.status_code == 200
+    assert response.json["alive"]
+
+    # holding the jobstore lock stops the scheduler thread like a deadlock would
+    with watched.sched._jobstores_lock:
+        n_pings = len(notify_socket.times("WATCHDOG=1"))
+        time.sleep(3 * interval)
+        response = client.get("/api/health")
+        assert response.status_code == 503
+        assert response.json["last_beat_age"] > 2 * interval
+        assert len(notify_socket.times("WATCHDOG=1")) <= n_pings + 1
+
+    # the late beat still pings the watchdog, it is reported as late
+    assert notify_socket.wait_for("WATCHDOG=1", n_pings + 2, timeout=2)
+    assert watched.heartbeat.n_late >= 1
+    response = client.get("/api/health")
+    assert response.status_code == 200
+    assert response.json["n_late"] >= 1
+
+
+def test_late_beat_pings(watched, notify_socket):
+    """a single late beat is reported but the watchdog is still pinged, a hiccup must not kill the show"""
+    heartbeat = watched.heartbeat
+    heartbeat.start()
+    heartbeat._last_beat = heartbeat.clock.monotonic() - interval - 5 * max_lateness
+    n_pings = len(notify_socket.times("WATCHDOG=1"))
+    heartbeat.beat()
+    assert heartbeat.is_late()
+    assert heartbeat.status()["late"]
+    assert notify_socket.wait_for("WATCHDOG=1", n_pings + 1)
+
+
+def test_default_interval(monkeypatch):
+    """with the default interval two beats can be missed before systemd gives up"""
+    monkeypatch.setenv("WATCHDOG_USEC", "10000000")
+    monkeypatch.delenv("WATCHDOG_PID", raising=False)
+    heartbeat = Heartbeat(BackgroundScheduler(), notifier=SystemdNotifier(""))
+    assert heartbeat.interval <= 10 / 3
+
+
+def test_zone_named_heartbeat():
+    """the jobstore of a zone called heartbeat does not collide with the one of the heartbeat"""
+    sched = BackgroundScheduler()
+    sched.add_jobstore(MemoryJobStore(), alias="heartbeat")
+    heartbeat = Heartbeat(sched, notifier=SystemdNotifier(""))
+    assert heartbeat.interval > 0
+
+
+def test_beat(benchmark, watched, notify_socket):
+    watched.heartbeat.start()
+    benchmark(watched.heartbeat.beat)
+    assert notify_socket.wait_for("WATCHDOG=1")
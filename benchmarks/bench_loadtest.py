@@ -0,0 +1,45 @@
+from pathlib import Path
+
+import pytest
+
+from showcontrol.config import find_config_files
+from showcontrol.loadtest import LoadTest, format_report, match_arrivals
+
+repo_config_dir = Path(__file__).parent.parent / "config"
+
+
+def test_match_arrivals():
+    """redundant copies count once, a lost cue is reported as missing and does not shift the later ones"""
+    ms = 1e6
+    fire_times = [i * 100 * ms for i in range(6)]
+    regions = [1, 2, 3, 1, 2, 3]
+    arrivals = {
+        # three copies of every cue, the second cue of region 1 was lost
+        1: [0.5 * ms, 0.6 * ms, 0.7 * ms],
+        2: [t + d for t in (100 * ms, 400 * ms) for d in (2 * ms, 2.1 * ms, 2.2 * ms)],
+        3: [t + d for t in (200 * ms, 500 * ms) for d in (3 * ms, 3.1 * ms, 3.2 * ms)],
+    }
+    lateness, n_missing = match_arrivals(fire_times, regions, arrivals, 100 * ms)
+    assert n_missing == 1
+    assert sorted(lateness) == pytest.approx([0.5, 2, 2, 3, 3])
+
+
+def test_loadtest_smoke(tmp_path, config_dir):
+    loadtest = LoadTest(repo_config_dir, tmp_path, n_players=2, cue_interval=0.1)
+    try:
+        report = loadtest.run(n_clients=2, duration=0.5)
+    finally:
+        loadtest.close()
+        # the load test points the config at its own emulators
+        find_config_files(config_dir)
+
+    assert report["requests_per_second"] > 0
+    for stats in report["http"].values():
+        assert stats["n"] > 0
+        assert stats["p50"] <= stats["p99"]
+    for phase in ["idle", "loaded"]:
+        stats = report["cue_lateness"][phase]
+        assert stats["missing"] == 0
+        assert stats["n"] == 5
+        assert 0 <= stats["p50"] <= stats["p99"]
+    assert "web load adds" in format_report(report)
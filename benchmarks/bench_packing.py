@@ -0,0 +1,148 @@
+from datetime import timedelta
+
+import pytest
+
+from showcontrol.catalog import read_catalog
+from showcontrol.config import read_blocks
+from showcontrol.packing import Candidate, candidate_space, evaluate, optimize_day
+from showcontrol.schedule_generator import (
+    fill_day,
+    read_blockplan,
+    time_start,
+    time_stop,
+)
+
+
+@pytest.fixture(scope="module")
+def programme(config_dir):
+    tracks = read_catalog(config_dir / "tracks")
+    blocks = read_blocks(config_dir / "blocks")
+    return read_blockplan(config_dir), blocks, tracks
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_optimize_day(benchmark, programme, workers):
+    """the wednesday programme on one process and on a pool, a smaller padding range keeps it short"""
+    blockplan, blocks, tracks = programme
+    block_names = blockplan["wednesday"]["blocks"]
+
+    best, greedy, n_candidates = benchmark.pedantic(
+        optimize_day,
+        args=(block_names, blocks, tracks, time_start, time_stop),
+        kwargs=dict(max_extra_padding=20, workers=workers),
+        rounds=1,
+        iterations=1,
+    )
+
+    assert best.utilisation >= greedy.utilisation
+    assert best.score >= greedy.score
+    assert best.candidate.blocks.index("student_pieces") == block_names.index(
+        "student_pieces"
+    )
+    for trackstart, track_name in best.plays:
+        end = trackstart + timedelta(seconds=tracks[track_name].duration)
+        assert end <= time_stop
+    # the same programme no matter how many processes evaluate it
+    reference, _, _ = optimize_day(
+        block_names,
+        blocks,
+        tracks,
+        time_start,
+        time_stop,
+        max_extra_padding=20,
+        workers=1,
+    )
+    assert best.candidate == reference.candidate
+    benchmark.extra_info["n_candidates"] = n_candidates
+    benchmark.extra_info["utilisation"] = best.utilisation
+    benchmark.extra_info["greedy_utilisation"] = greedy.utilisation
+
+
+def test_greedy_candidate(programme):
+    """without reordering, rotation and extra padding a candidate is the programme of create_schedule"""
+    blockplan, blocks, tracks = programme
+    block_names = blockplan["default"]["blocks"]
+    _, greedy, _ = optimize_day(
+        block_names,
+        blocks,
+        tracks,
+        time_start,
+        time_stop,
+        max_extra_padding=0,
+        workers=1,
+    )
+    plays = [
+        (start, name)
+        for start, name in fill_day(block_names, blocks, tracks, time_start, time_stop)
+        if start + timedelta(seconds=tracks[name].duration) <= time_stop
+    ]
+    assert greedy.plays == plays
+    assert evaluate(greedy.candidate, blocks, tracks, time_start, time_stop).score == (
+        greedy.score
+    )
+
+
+def test_candidate_space(programme):
+    """fixed blocks are not rotated, a sample of a large space is part of the full space"""
+    blockplan, blocks, tracks = programme
+    block_names = blockplan["wednesday"]["blocks"]
+    fixed = block_names.index("student_pieces")
+    n_all, candidates = candidate_space(
+        block_names, blocks, {"student_pieces"}, [0, 10]
+    )
+    full = list(candidates)
+    assert len(full) == n_all == len(set(full))
+    assert all(c.rotations[fixed] == 0 for c in full)
+
+    n_sampled, sampled = candidate_space(
+        block_names, blocks, {"student_pieces"}, [0, 10], max_candidates=100
+    )
+    sampled = list(sampled)
+    assert n_sampled == len(sampled) == 100
+    assert sampled[0] == Candidate(tuple(block_names), 0, (0,) * len(block_names))
+    assert set(sampled) <= set(full)
+    # reproducible
+    assert (
+        list(
+            candidate_space(
+                block_names, blocks, {"student_pieces"}, [0, 10], max_candidates=100
+            )[1]
+        )
+        == sampled
+    )
+
+
+def test_optimize_day_bounded(programme):
+    """a search limited to a few candidates is at least as good as the greedy programme"""
+    blockplan, blocks, tracks = programme
+    block_names = blockplan["wednesday"]["blocks"]
+    best, greedy, n_candidates = optimize_day(
+        block_names,
+        blocks,
+        tracks,
+        time_start,
+        time_stop,
+        max_candidates=200,
+        workers=1,
+    )
+    assert n_candidates == 200
+    assert best.score >= greedy.score
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_optimize_empty_day(programme, workers):
+    """a day without blocks and a block without tracks are planned like create_schedule does"""
+    _, blocks, tracks = programme
+    best, greedy, n_candidates = optimize_day(
+        [], {}, tracks, time_start, time_stop, workers=workers
+    )
+    assert best.plays == greedy.plays == []
+    assert best.utilisation == 0
+
+    blocks = dict(blocks, empty={"tracks": [], "track_padding": 0})
+    block_names = ["empty", next(name for name in blocks if name != "empty")]
+    best, greedy, n_candidates = optimize_day(
+        block_names, blocks, tracks, time_start, time_stop, workers=workers
+    )
+    assert n_candidates > 0
+    assert best.score >= greedy.score
@@ -0,0 +1,90 @@
+import asyncio
+import socket
+import time
+
+import pytest
+from pythonosc.osc_message import OscMessage
+
+from showcontrol.emulators import free_port
+from showcontrol.panels import Panel, PanelMonitor, osc_message
+
+n_panels = 300
+n_silent = 10
+
+
+@pytest.fixture(scope="module")
+def panels():
+    """300 panels on the loopback interface. The probe port is closed on most of them, so they answer
+    with icmp port unreachable like a panel that is up. The first ten have a socket bound to the probe
+    port that never answers, like a panel that is down"""
+    port = free_port()
+    panels = [
+        Panel(f"panel-{i:03d}", f"127.0.{2 + i // 250}.{1 + i % 250}")
+        for i in range(n_panels)
+    ]
+    silent = []
+    for panel in panels[:n_silent]:
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        sock.bind((panel.address, port))
+        silent.append(sock)
+    yield panels, port
+    for sock in silent:
+        sock.close()
+
+
+def test_check_round(benchmark, panels):
+    """one round over all panels takes about one timeout, not one timeout per panel"""
+    panels, port = panels
+    timeout = 0.3
+    monitor = PanelMonitor(panels, probes=[f"udp:{port}"], timeout=timeout)
+
+    benchmark.pedantic(lambda: asyncio.run(monitor.check_all()), rounds=3, iterations=1)
+
+    assert [p.name for p in panels if p.up is False] == [
+        p.name for p in panels[:n_silent]
+    ]
+    assert all(p.up for p in panels[n_silent:])
+    assert monitor.last_round_duration < 3 * timeout
+    benchmark.extra_info["n_panels"] = n_panels
+    benchmark.extra_info["round_s"] = monitor.last_round_duration
+
+
+def test_osc_check(panels):
+    """the /check/panels round trip of panelpinger.py: confirmation, then one reply per panel"""
+    panels, port = panels
+    reply = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    reply.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 1 << 20)
+    reply.bind(("127.0.0.1", 0))
+    reply.settimeout(2)
+    osc_address = ("127.0.0.1", free_port())
+    monitor = PanelMonitor(
+        panels,
+        probes=[f"udp:{port}"],
+        interval=3600,
+        timeout=0.3,
+        osc_address=osc_address,
+        osc_reply_port=reply.getsockname()[1],
+    )
+    monitor.start()
+    try:
+        deadline = time.monotonic() + 5
+        while monitor.n_rounds < 1 and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+        t_start = time.monotonic()
+        reply.sendto(osc_message("/check/panels"), osc_address)
+        messages = [OscMessage(reply.recv(1024))]
+        while len(messages) < n_panels + 1:
+            messages.append(OscMessage(reply.recv(1024)))
+        round_trip = time.monotonic() - t_start
+    finally:
+        monitor.stop()
+        reply.close()
+
+    assert messages[0].address == "/ping/request"
+    assert monitor.n_rounds == 2
+    errors = {m.params[0] for m in messages[1:] if m.address == "/panel/error"}
+    assert errors == {p.name for p in panels[:n_silent]}
+    ok = [m.params for m in messages[1:] if m.address == "/panel/ok"]
+    assert len(ok) == n_panels - n_silent
+    assert round_trip < 2
@@ -0,0 +1,88 @@
+from pathlib import Path
+import socket
+import time
+
+import pytest
+from pythonosc.udp_client import SimpleUDPClient
+
+from showcontrol.emulators import FakeReaper, free_port
+from showcontrol.reaperosc import read_pattern_config, trimmed_pattern_config
+
+stock_pattern_file = Path(__file__).parent.parent / "HufoShowControl.ReaperOSC"
+
+pattern_configs = {
+    "stock": read_pattern_config(stock_pattern_file),
+    "trimmed": trimmed_pattern_config(),
+    "trimmed_no_feedback": trimmed_pattern_config(feedback=False),
+}
+
+
+def count_feedback(patterns, n_cues: int = 5, cue_interval: float = 0.4) -> int:
+    """datagrams showcontrol receives from reaper while n_cues tracks are started like SchedControl.play_track"""
+    sink = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sink.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 1 << 22)
+    sink.bind(("127.0.0.1", 0))
+    sink.setblocking(False)
+    reaper = FakeReaper(
+        ("127.0.0.1", free_port()),
+        feedback_address=sink.getsockname(),
+        patterns=patterns,
+    ).start()
+    osc = SimpleUDPClient(*reaper.sockets[0].getsockname())
+
+    n_received = 0
+    try:
+        for i in range(n_cues):
+            osc.send_message("/track/1/mute", [1])
+            osc.send_message("/region", [i + 1])
+            osc.send_message("/stop", [1.0])
+            osc.send_message("/play", [1.0])
+            osc.send_message("/track/1/mute", [0])
+            time.sleep(cue_interval)
+            while True:
+                try:
+                    sink.recv(4096)
+                except BlockingIOError:
+                    break
+                n_received += 1
+    finally:
+        reaper.close()
+        sink.close()
+    return n_received
+
+
+@pytest.mark.parametrize("name", list(pattern_configs))
+def test_feedback_rate(benchmark, name):
+    """feedback packets per second reaper sends to showcontrol with the stock and the trimmed pattern config"""
+    n_cues, cue_interval = 5, 0.4
+    n_received = benchmark.pedantic(
+        count_feedback,
+        args=(pattern_configs[name], n_cues, cue_interval),
+        rounds=1,
+        iterations=1,
+    )
+    pps = n_received / (n_cues * cue_interval)
+    benchmark.extra_info["feedback_pps"] = pps
+    benchmark.extra_info["feedback_per_cue"] = n_received / n_cues
+    print(f"{name}: {pps:.0f} packets/s")
+    assert n_received > 0
+
+
+def feedback_addresses(patterns) -> set[str]:
+    return {
+        "/" + address
+        for action in patterns.actions
+        for address in patterns.feedback_patterns(action)
+    }
+
+
+def test_trimmed_keeps_feedback():
+    """the trimmed config still has all the feedback ReaperFeedback reads"""
+    assert {
+        "/time",
+        "/play",
+        "/stop",
+        "/lastregion/time",
+        "/lastregion/number/str",
+    } <= feedback_addresses(pattern_configs["trimmed"])
+    assert "/time" not in feedback_addresses(pattern_configs["stock"])
@@ -0,0 +1,58 @@
+import json
+import time
+
+import pytest
+
+from showcontrol.delivery import BroadcastDelivery
+from showcontrol.emulators import FakeSyncplayer, LinkImpairment, free_port
+from showcontrol.redundancy import is_idempotent_video_command, send_burst
+
+n_commands = 200
+
+
+@pytest.fixture(params=[0.05, 0.2], ids=lambda loss: f"loss{loss}")
+def lossy_players(request):
+    """eight players behind a link that drops a share of the datagrams, every player with its own random losses"""
+    video_port = free_port()
+    info_port = free_port()
+    players = [
+        FakeSyncplayer(
+            f"syncplayer-{i + 1:02}",
+            f"127.0.0.{41 + i}",
+            video_port,
+            info_port,
+            impairment=LinkImpairment(loss=request.param, seed=i),
+        ).start()
+        for i in range(8)
+    ]
+    yield request.param, players
+    for player in players:
+        player.close()
+
+
+@pytest.mark.parametrize("copies", [1, 2, 3])
+def test_lossy_delivery(benchmark, lossy_players, copies):
+    """sends n_commands playlist-play-index commands with redundancy, the success rate is the share
+    of (player, command) pairs where at least one copy arrived"""
+    loss, players = lossy_players
+    delivery = BroadcastDelivery("127.255.255.255")
+    video_port = players[0].video_port
+    commands = [["playlist-play-index", i] for i in range(n_commands)]
+    assert all(is_idempotent_video_command(c) for c in commands)
+
+    def send_all():
+        for command in commands:
+            message = json.dumps({"command": command}).encode("utf-8") + b"\n"
+            send_burst(lambda: delivery.send(message, [video_port]), copies, 0.0002)
+
+    benchmark.pedantic(send_all, rounds=1, iterations=1)
+    # let the players drain their sockets
+    time.sleep(0.2)
+    delivery.close()
+
+    received = [{c[1] for _, _, c in p.commands} for p in players]
+    success_rate = sum(len(r) for r in received) / (n_commands * len(players))
+    benchmark.extra_info["loss"] = loss
+    benchmark.extra_info["success_rate"] = success_rate
+    benchmark.extra_info["expected_success_rate"] = 1 - loss**copies
+    assert success_rate >= 1 - loss**copies - 0.05
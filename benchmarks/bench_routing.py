@@ -0,0 +1,59 @@
+from pathlib import Path
+
+import pytest
+
+from showcontrol.emulators import fake_jack_lsp
+from showcontrol.routing import diff_graphs, parse_jack_lsp, read_snapshot
+
+snapshots_dir = Path(__file__).parent.parent / "config" / "snapshots"
+snapshot_names = ["main", "player", "wfs1", "wfs2"]
+
+
+@pytest.mark.parametrize("name", snapshot_names)
+def test_read_snapshot(benchmark, name):
+    path = snapshots_dir / f"{name}.snap"
+
+    graph = benchmark(read_snapshot, path)
+
+    assert graph.n_connections == path.read_text().count("<connection")
+    assert "system" in graph.clients
+    benchmark.extra_info["n_connections"] = graph.n_connections
+
+
+def test_diff_snapshots(benchmark):
+    wfs1 = read_snapshot(snapshots_dir / "wfs1.snap")
+    wfs2 = read_snapshot(snapshots_dir / "wfs2.snap")
+    main = read_snapshot(snapshots_dir / "main.snap")
+
+    assert diff_graphs(wfs1, wfs2).ok
+    diff = benchmark(diff_graphs, main, wfs1)
+
+    assert len(diff.missing) == main.n_connections
+    assert len(diff.extra) == wfs1.n_connections
+    assert "SC_MIX" in diff.missing_clients
+
+
+@pytest.mark.parametrize("properties", [True, False])
+def test_check_live(benchmark, properties):
+    """parse a jack_lsp dump of the wfs snapshot with one connection removed and one added and find both"""
+    expected = read_snapshot(snapshots_dir / "wfs1.snap")
+    live = read_snapshot(snapshots_dir / "wfs1.snap")
+    client, ports = next((c, p) for c, p in live.clients.items() if any(p.values()))
+    port, destinations = next((p, d) for p, d in ports.items() if d)
+    removed = sorted(destinations)[0]
+    destinations.remove(removed)
+    live.add_connection("system:capture_1", "twonder1:input_99")
+    lines = fake_jack_lsp(live, properties=properties)
+
+    def check():
+        return diff_graphs(expected, parse_jack_lsp(lines))
+
+    diff = benchmark(check)
+
+    source = f"{client}:{port}"
+    assert len(diff.missing) == len(diff.extra) == 1
+    if properties:
+        assert diff.missing == [(source, removed)]
+        assert diff.extra == [("system:capture_1", "twonder1:input_99")]
+    else:
+        assert diff.missing == [tuple(sorted((source, removed)))]
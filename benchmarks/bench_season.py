@@ -0,0 +1,83 @@
+from datetime import date, datetime, timedelta
+
+import pytest
+
+from showcontrol.catalog import read_catalog
+from showcontrol.config import read_blocks
+from showcontrol.schedule_generator import (
+    create_season_schedule,
+    day_template,
+    read_blockplan,
+    season_timeline,
+)
+from showcontrol.season import Season, read_season
+from showcontrol.simulation import Simulation
+
+
+@pytest.fixture(scope="module")
+def programme(config_dir):
+    tracks = read_catalog(config_dir / "tracks")
+    blocks = read_blocks(config_dir / "blocks")
+    season = read_season(config_dir / "season.yml", read_blockplan(config_dir))
+    return season, blocks, tracks
+
+
+def test_season_timeline(benchmark, programme):
+    """the programme of the shipped season, every day plan is only filled once"""
+    season, blocks, tracks = programme
+
+    timeline = benchmark(season_timeline, season, blocks, tracks)
+
+    days = {play.start.date() for play in timeline}
+    assert date(2026, 5, 1) not in days
+    assert not days & {date(2026, 7, 20) + timedelta(days=n) for n in range(7)}
+    # the summer period opens at 10:00, the long night ends late
+    assert (
+        min(p.start for p in timeline if p.start.date() == date(2026, 8, 3)).hour == 10
+    )
+    assert (
+        max(p.start for p in timeline if p.start.date() == date(2026, 8, 29)).hour >= 22
+    )
+    assert [p.start for p in timeline] == sorted(p.start for p in timeline)
+    benchmark.extra_info["n_days"] = len(days)
+    benchmark.extra_info["n_plays"] = len(timeline)
+
+
+def test_season_timeline_unmemoized(benchmark, programme):
+    """the same season with every day filled on its own, for comparison"""
+    season, blocks, tracks = programme
+
+    def timeline():
+        return [
+            (plan.date, day_template(plan.blocks, plan.hours, blocks, tracks))
+            for plan in season.days()
+            if plan.hours is not None
+        ]
+
+    benchmark(timeline)
+
+
+def test_dated_schedule_engine(config_dir, tmp_path, dispatcher, schedctrl):
+    """the engine plays the dated entries of a season schedule on their dates, and only there"""
+    timeline = create_season_schedule(
+        config_dir, config_dir / "season.yml", tmp_path / "schedule.yml"
+    )
+    schedctrl.zone.schedule_file_path = tmp_path / "schedule.yml"
+    schedctrl.sched.remove_all_jobs(jobstore=schedctrl.name)
+    schedctrl.add_jobs_to_scheduler()
+    # one job per track instead of one per entry
+    assert len(schedctrl.sched.get_jobs(jobstore=schedctrl.name)) == len(
+        {play.track_id for play in timeline}
+    )
+
+    start = datetime(2026, 4, 28).astimezone()
+    sim = Simulation(start, dispatcher)
+    sim.run(start + timedelta(days=7))
+
+    expected = [
+        (play.start, play.track_id)
+        for play in timeline
+        if start <= play.start.astimezone() < start + timedelta(days=7)
+    ]
+    assert [(t.replace(tzinfo=None), track) for t, _, track in sim.cues] == expected
+    assert not any(t.date() == date(2026, 5, 1) for t, _, _ in sim.cues)
@@ -0,0 +1,64 @@
+import time
+
+import pytest
+
+from showcontrol.config import get_config, read_systems
+from showcontrol.emulators import FakeServiceTransport
+from showcontrol.services import ServiceHealth, ServiceTransport
+
+
+@pytest.fixture
+def systems(config_dir):
+    """the eleven hosts of the shipped config"""
+    return read_systems(get_config())
+
+
+def test_fleet_check(benchmark, systems):
+    """all hosts are checked concurrently, a host that never answers costs one timeout for the whole check"""
+    timeout = 0.5
+    transport = FakeServiceTransport(
+        states={"RE01": {"cwonder": "failed"}},
+        latency=0.05,
+        unreachable=["syncplayer-08"],
+        hanging=["RE03"],
+    )
+    health = ServiceHealth(systems, transport, timeout=timeout)
+
+    def check():
+        t_start = time.monotonic()
+        health.refresh(force=True)
+        return time.monotonic() - t_start
+
+    duration = benchmark.pedantic(check, rounds=3, iterations=1)
+
+    assert duration < 2 * timeout
+    down = health.down()
+    assert ("RE01", "cwonder") in down
+    assert ("RE01", "seamless_jack") not in down
+    assert {system for system, _ in down} == {"RE01", "RE03", "syncplayer-08"}
+    assert not health.hosts["RE03"].reachable
+    benchmark.extra_info["n_hosts"] = len(systems)
+    benchmark.extra_info["check_s"] = duration
+
+
+def test_cached(benchmark, systems):
+    """within the ttl the status is served from the cache"""
+    transport = FakeServiceTransport(latency=0.05)
+    health = ServiceHealth(systems, transport, ttl=60)
+    health.refresh()
+    n_checks = transport.n_checks
+
+    status = benchmark(health.status)
+
+    assert transport.n_checks == n_checks == len(systems)
+    assert status["down"] == []
+
+
+def test_incomplete_transport():
+    """a transport without check fails when it is created, not during the first health check"""
+
+    class IncompleteTransport(ServiceTransport):
+        pass
+
+    with pytest.raises(TypeError):
+        IncompleteTransport()
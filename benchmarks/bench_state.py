@@ -0,0 +1,130 @@
+from datetime import timedelta
+from importlib.resources import files
+import sqlite3
+
+import pytest
+
+from showcontrol.clock import ManualClock
+from showcontrol.dispatcher import Dispatcher
+from showcontrol.emulators import FakeServiceTransport
+from showcontrol.state import StateStore
+
+
+def restarted(path, clock: ManualClock) -> Dispatcher:
+    """a new engine restoring the state saved in path, like showcontrol after a restart"""
+    return Dispatcher(
+        clock=clock,
+        service_transport=FakeServiceTransport(),
+        state=StateStore(path),
+    )
+
+
+def test_restart_restores_state(config_dir, tmp_path):
+    clock = ManualClock()
+    dispatcher = restarted(tmp_path / "state.sqlite", clock)
+    schedctrl = dispatcher.default_zone
+    schedctrl.play_track("brunnen", pause_scheduler=False)
+    cues = [schedctrl.queue_track("pune", in_seconds=600 + i) for i in range(3)]
+    appended = schedctrl.queue_track("trailer", append=True)
+    absolute = schedctrl.queue_track("sufi", when=clock.now() + timedelta(hours=1))
+    schedctrl.cancel_cue(cues[1].id)
+    schedctrl.reschedule_cue(cues[2].id, in_seconds=1200)
+    # due while showcontrol is down, too late after the restart
+    late = schedctrl.queue_track("sufi", in_seconds=5)
+    schedctrl.scheduler_pause()
+    queued = {
+        cue.id: (cue.time, cue.relative) for cue in schedctrl.cue_queue.upcoming()
+    }
+    playing_for = clock.monotonic() - schedctrl.last_cue[1]
+    dispatcher.stop()
+
+    clock.advance(120)
+    dispatcher = restarted(tmp_path / "state.sqlite", clock)
+    try:
+        schedctrl = dispatcher.default_zone
+        assert schedctrl.paused
+        assert schedctrl.last_cue[0] == "brunnen"
+        assert clock.monotonic() - schedctrl.last_cue[1] == pytest.approx(
+            playing_for + 120
+        )
+        del queued[late.id]
+        assert {
+            cue.id: (cue.time, cue.relative) for cue in schedctrl.cue_queue.upcoming()
+        } == queued
+        assert not queued[absolute.id][1] and queued[appended.id][1]
+        assert appended.id in schedctrl.cue_queue
+        job = schedctrl.sched.get_job(schedctrl.queue_job_id, schedctrl.name)
+        assert job.next_run_time == min(time for time, _ in queued.values())
+    finally:
+        dispatcher.stop()
+
+    # the dropped cue is gone for good
+    assert late.id not in {
+        cue_id
+        for cue_id, _, _, _ in StateStore(tmp_path / "state.sqlite")
+        .load()[schedctrl.name]
+        .cues
+    }
+
+
+def test_init_db_keeps_state(config_dir, tmp_path):
+    """flask init-db resets the users in the same database, the state survives and stop releases the file"""
+    path = tmp_path / "state.sqlite"
+    dispatcher = restarted(path, ManualClock())
+    dispatcher.default_zone.queue_track("pune", in_seconds=600)
+    dispatcher.stop()
+    assert dispatcher.state._db is None
+
+    db = sqlite3.connect(path)
+    db.executescript(files("showcontrol").joinpath("schema.sql").read_text())
+    db.close()
+    assert StateStore(path).load()[dispatcher.default_zone.name].cues
+
+
+def test_write_behind(benchmark, tmp_path):
+    """a burst of changes costs one transaction, only the last change of a cue is written"""
+    store = StateStore(tmp_path / "state.sqlite")
+    zone = "default"
+
+    def burst():
+        for i in range(1000):
+            store.save_zone(zone, i % 2 == 0, "brunnen", float(i))
+            store.save_cue(zone, f"cue{i % 100}", "pune", float(i))
+        return store.flush()
+
+    assert benchmark(burst) == 101
+    saved = store.load()[zone]
+    assert saved.paused is False
+    assert len(saved.cues) == 100
+    store.close()
+
+
+@pytest.mark.parametrize("n_cues", [100, 10000])
+def test_restore(benchmark, config_dir, tmp_path, n_cues):
+    """restore of the whole engine state, it has to stay within the default startup budget of 0.5s"""
+    clock = ManualClock()
+    path = tmp_path / "state.sqlite"
+    dispatcher = Dispatcher(clock=clock, service_transport=FakeServiceTransport())
+    schedctrl = dispatcher.default_zone
+    zone = schedctrl.name
+    store = StateStore(path)
+    start = clock.now() + timedelta(minutes=5)
+    for i in range(n_cues):
+        store.save_cue(
+            zone, f"cue{i}", "brunnen", (start + timedelta(seconds=i)).timestamp()
+        )
+    store.save_zone(zone, True, "pune", clock.time())
+    store.close()
+    dispatcher.state = StateStore(path)
+
+    def restore():
+        schedctrl.cue_queue.clear()
+        dispatcher.restore_state()
+
+    try:
+        benchmark(restore)
+        assert len(schedctrl.cue_queue) == n_cues
+        assert schedctrl.paused
+        assert benchmark.stats is None or benchmark.stats["max"] < 0.5
+    finally:
+        dispatcher.stop()
@@ -0,0 +1,76 @@
+import json
+import time
+
+import pytest
+from pythonosc.udp_client import SimpleUDPClient
+
+from showcontrol.delivery import BroadcastDelivery, UnicastDelivery
+from showcontrol.emulators import FakeReaper, free_port, syncplayer_fleet
+from showcontrol.syncmonitor import ReaperFeedback, SyncPoller
+
+
+def command(*args) -> bytes:
+    return json.dumps({"command": list(args)}).encode("utf-8") + b"\n"
+
+
+@pytest.fixture
+def playing_fleet():
+    """reaper and eight players playing the same region and video, the last player is 300 ms ahead"""
+    feedback = ReaperFeedback(("127.0.0.1", 0))
+    feedback.start()
+    reaper = FakeReaper(
+        ("127.0.0.1", free_port()), feedback_address=feedback.address
+    ).start()
+    players = [
+        p.start()
+        for p in syncplayer_fleet(8, free_port(), free_port(), first_address=51)
+    ]
+    video_port = players[0].video_port
+
+    osc = SimpleUDPClient(*reaper.sockets[0].getsockname())
+    osc.send_message("/region", [2])
+    osc.send_message("/play", [1.0])
+    broadcast = BroadcastDelivery("127.255.255.255")
+    broadcast.send(command("playlist-play-index", 1), [video_port])
+    broadcast.send(command("set_property", "pause", "no"), [video_port])
+    broadcast.close()
+    unicast = UnicastDelivery({players[-1].name: players[-1].address})
+    unicast.send(command("seek", 0.3, "relative"), [video_port])
+    unicast.close()
+    assert all(p.wait_for(2) for p in players) and players[-1].wait_for(3)
+    # wait for a few /time updates of reaper
+    time.sleep(0.2)
+
+    yield reaper, players, feedback
+    feedback.close()
+    for emulator in [reaper, *players]:
+        emulator.close()
+
+
+def test_poll(benchmark, playing_fleet):
+    """one poll of eight players, the skew of the player that is ahead has to be detected"""
+    reaper, players, feedback = playing_fleet
+    poller = SyncPoller(
+        BroadcastDelivery("127.255.255.255"),
+        {p.name: p.address for p in players},
+        players[0].info_port,
+        reaper_feedback=feedback,
+        timeout=0.5,
+    )
+
+    sample = benchmark(poller.poll)
+    poller.close()
+
+    assert sample.missing == []
+    assert sample.playlist_pos == 1
+    assert sample.skew == pytest.approx(0.3, abs=0.05)
+    assert sample.reaper_offsets[players[-1].name] == pytest.approx(0.3, abs=0.05)
+    assert abs(sample.reaper_offsets[players[0].name]) < 0.05
+    assert {a["kind"] for a in poller.active_alerts.values()} == {
+        "skew",
+        "reaper_offset",
+    }
+    benchmark.extra_info["skew_ms"] = sample.skew * 1000
+    benchmark.extra_info["max_rtt_ms"] = (
+        max(p.rtt for p in sample.players.values()) * 1000
+    )
@@ -0,0 +1,163 @@
+from datetime import date
+
+from dataclasses import replace
+import gc
+import sys
+
+import pytest
+import yaml
+
+from showcontrol.catalog import read_catalog
+from showcontrol.config import ConfigError, read_schedule
+from showcontrol.schedcontrol import SchedControl
+from showcontrol.schedule_generator import create_season_schedule, read_blockplan
+from showcontrol.season import parse_opening_hours, read_season
+from showcontrol.validation import validate_schedule
+
+
+@pytest.fixture(scope="module")
+def tracks(config_dir):
+    return read_catalog(config_dir / "tracks")
+
+
+@pytest.fixture(scope="module")
+def season_schedule(config_dir, tmp_path_factory):
+    path = tmp_path_factory.mktemp("season") / "schedule.yml"
+    create_season_schedule(config_dir, config_dir / "season.yml", path)
+    return read_schedule(path)
+
+
+def test_validate_season(benchmark, config_dir, tracks, season_schedule):
+    """the sweep over a whole season, reading the yaml file takes far longer and is not measured"""
+    season = read_season(
+        config_dir / "season.yml", read_blockplan(config_dir), "10:40-18:30"
+    )
+
+    result = benchmark(
+        validate_schedule,
+        season_schedule,
+        tracks,
+        lambda day: season.day(day).hours,
+    )
+
+    assert result.ok
+    assert {issue.kind for issue in result.issues} <= {"outside_hours"}
+    assert result.n_intervals == len(season_schedule)
+    benchmark.extra_info["n_plays"] = result.n_intervals
+
+
+def test_validate_issues(config_dir, tracks):
+    """every kind of issue is found at the entry that causes it"""
+    schedule = read_schedule(config_dir / "schedule.yml")
+    broken = [
+        # starts during the first track of the tuesday
+        dict(schedule[0], track_id="brunnen", minute=42),
+        dict(schedule[0], track_id="nosuchtrack", hour=12),
+        dict(schedule[0], hour=9, minute=0),
+        dict(schedule[0], day_of_week="7"),
+        {"track_id": "pune", "command": "play", "date": date(2026, 5, 4)},
+        {
+            "track_id": "pune",
+            "command": "play",
+            "date": date(2026, 5, 4),
+            "hour": 11,
+            "minute": 0,
+            "second": 0,
+        },
+        {
+            "track_id": "sufi",
+            "command": "play",
+            "date": date(2026, 5, 4),
+            "hour": 13,
+            "minute": 0,
+            "second": 0,
+        },
+    ]
+    result = validate_schedule(
+        schedule + broken, tracks, parse_opening_hours("10:40-18:30"), max_gap=900
+    )
+    issues = {
+        (issue.kind, issue.entry)
+        for issue in result.issues
+        if issue.entry >= len(schedule)
+    }
+    n = len(schedule)
+    assert issues == {
+        ("overlap", n),
+        ("unknown_track", n + 1),
+        ("outside_hours", n + 2),
+        ("invalid_entry", n + 3),
+        ("invalid_entry", n + 4),
+        ("gap", n + 6),
+    }
+    assert result.invalid_entries == {n + 1, n + 3, n + 4}
+
+
+def test_cron_expressions(tracks):
+    """entries the cron trigger accepts are played, the ones that can not be expanded are reported unchecked"""
+    entry = {"track_id": "pune", "command": "play", "second": 0}
+    schedule = [
+        dict(entry, hour="10-17", minute="*/30", day_of_week="mon-fri"),
+        dict(entry, hour="11", minute=0, day_of_week="sat,sun"),
+        dict(entry, hour=25, minute=0, day_of_week="mon"),
+        dict(entry, hour="10-17", minute="*/30", day_of_week="mon-fri", track_id="x"),
+    ]
+    result = validate_schedule(schedule, tracks)
+    assert [(issue.kind, issue.entry) for issue in result.issues] == [
+        ("unchecked_entry", 0),
+        ("invalid_entry", 2),
+        ("unknown_track", 3),
+    ]
+    assert result.ok is False
+    assert result.invalid_entries == {2, 3}
+    assert result.n_intervals == 2
+
+
+def test_load_skips_invalid_entries(config_dir, tmp_path, schedctrl):
+    """the engine does not add jobs for unknown tracks but for unchecked cron expressions, with schedule_strict
+    it refuses the schedule"""
+    schedule = read_schedule(config_dir / "schedule.yml")
+    schedule.append(dict(schedule[0], track_id="nosuchtrack"))
+    schedule.append(dict(schedule[0], hour="10-17", minute="*/30"))
+    with open(tmp_path / "schedule.yml", "w") as f:
+        yaml.dump(schedule, f)
+    schedctrl.zone.schedule_file_path = tmp_path / "schedule.yml"
+    schedctrl.sched.remove_all_jobs(jobstore=schedctrl.name)
+
+    schedctrl.add_jobs_to_scheduler()
+
+    jobs = schedctrl.sched.get_jobs(jobstore=schedctrl.name)
+    assert len(jobs) == len(schedule) - 1
+    assert "nosuchtrack" not in {job.args[0] for job in jobs}
+    assert [issue.kind for issue in schedctrl.schedule_validation.errors] == [
+        "unknown_track"
+    ]
+    assert "unchecked_entry" in {
+        issue.kind for issue in schedctrl.schedule_validation.warnings
+    }
+
+    schedctrl.config["schedule_strict"] = True
+    try:
+        with pytest.raises(ConfigError):
+            schedctrl.add_jobs_to_scheduler()
+    finally:
+        del schedctrl.config["schedule_strict"]
+
+
+def test_strict_schedule_refused_cleanly(tmp_path, schedctrl, monkeypatch):
+    """an engine refusing its schedule raises the ConfigError only, stopping it in __del__ does not fail"""
+    with open(tmp_path / "schedule.yml", "w") as f:
+        yaml.dump([{"track_id": "nosuchtrack", "command": "play"}], f)
+    zone = replace(
+        schedctrl.zone,
+        name="strict",
+        config=dict(schedctrl.config, schedule_strict=True),
+        schedule_file_path=tmp_path / "schedule.yml",
+    )
+    unraisable = []
+    monkeypatch.setattr(sys, "unraisablehook", unraisable.append)
+
+    with pytest.raises(ConfigError):
+        SchedControl(clock=schedctrl.clock, zone=zone)
+    gc.collect()
+    assert unraisable == []
@@ -0,0 +1,57 @@
+from pathlib import Path
+
+import pytest
+
+from showcontrol.clock import ManualClock
+from showcontrol.config import find_config_files
+from showcontrol.emulators import (
+    FakeReaper,
+    FakeServiceTransport,
+    emulator_config,
+    free_port,
+    syncplayer_fleet,
+)
+from showcontrol.dispatcher import Dispatcher
+
+repo_config_dir = Path(__file__).parent.parent / "config"
+
+
+@pytest.fixture(scope="session")
+def emulators():
+    """fake reaper and eight fake syncplayers on the loopback interface"""
+    video_port = free_port()
+    info_port = free_port()
+    reaper = FakeReaper(("127.0.0.1", free_port())).start()
+    players = [p.start() for p in syncplayer_fleet(8, video_port, info_port)]
+    yield reaper, players
+    for emulator in [reaper, *players]:
+        emulator.close()
+
+
+@pytest.fixture(scope="session")
+def config_dir(tmp_path_factory, emulators) -> Path:
+    """copy of the shipped config that points at the emulators instead of the venue"""
+    reaper, players = emulators
+    config_dir = emulator_config(
+        repo_config_dir, tmp_path_factory.mktemp("config"), reaper, players
+    )
+    find_config_files(config_dir)
+    return config_dir
+
+
+@pytest.fixture
+def dispatcher(config_dir):
+    """Dispatcher talking to the emulators. It uses a ManualClock, so the pauses between
+    the messages of a cue don't end up in the measurements. Service checks are answered by a fake transport
+    """
+    dispatcher = Dispatcher(
+        clock=ManualClock(), service_transport=FakeServiceTransport()
+    )
+    yield dispatcher
+    dispatcher.stop()
+
+
+@pytest.fixture
+def schedctrl(dispatcher):
+    """engine of the default zone"""
+    return dispatcher.default_zone
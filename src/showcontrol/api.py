@@ -1,20 +1,44 @@
-from flask import Blueprint, request
+from dataclasses import asdict
+
+from flask import Blueprint, abort, request
 import apscheduler
 
+from showcontrol.cuequeue import parse_cue_time
+from showcontrol.dispatcher import Dispatcher
+from showcontrol.metrics import metrics
 from showcontrol.schedcontrol import SchedControl
 
 
-def construct_api_blueprint(schedctrl: SchedControl) -> Blueprint:
+def construct_api_blueprint(dispatcher: Dispatcher) -> Blueprint:
+    """Routes without a zone act on the default zone, zones/<zone>/... on the named zone"""
     bp = Blueprint("api", __name__)
 
+    def get_zone(zone: str | None) -> SchedControl:
+        if zone is None:
+            return dispatcher.default_zone
+        if zone not in dispatcher.zones:
+            abort(404, f"unknown zone {zone}")
+        return dispatcher.zones[zone]
+
+    @bp.route("zones")
+    def get_zones():
+        return [
+            {"name": name, "state": ("running" if z.is_running() else "paused")}
+            for name, z in dispatcher.zones.items()
+        ]
+
     @bp.route("tracks")
-    def get_tracks():
-        return sorted(
-            schedctrl.tracks.values(), key=lambda x: x["audio_index"]
-        )
+    @bp.route("zones/<zone>/tracks")
+    def get_tracks(zone=None):
+        schedctrl = get_zone(zone)
+        return [
+            track.as_dict() for track in schedctrl.tracks.sorted_by_audio_index()
+        ]
 
     @bp.route("scheduler_state", methods=["GET", "POST", "PUT"])
-    def get_scheduler_state():
+    @bp.route("zones/<zone>/scheduler_state", methods=["GET", "POST", "PUT"])
+    def get_scheduler_state(zone=None):
+        schedctrl = get_zone(zone)
 
         # handle state changing on put or post
         if request.method in ["PUT", "POST"]:
@@ -28,13 +52,103 @@ def construct_api_blueprint(schedctrl: SchedControl) -> Blueprint:
         scheduler_state = {"state": ("running" if schedctrl.is_running() else "paused")}
         return scheduler_state
 
+    @bp.route("health")
+    def get_health():
+        health = dispatcher.heartbeat.status() | {
+            "zones": {
+                name: ("running" if z.is_running() else "paused")
+                for name, z in dispatcher.zones.items()
+            }
+        }
+        return health, 200 if health["alive"] else 503
+
+    @bp.route("clock_events")
+    def get_clock_events():
+        return list(dispatcher.clock_watchdog.events)
+
+    @bp.route("metrics")
+    def get_metrics():
+        return metrics.snapshot()
+
+    @bp.route("failover")
+    def get_failover_state():
+        if dispatcher.failover is None:
+            return {"role": "active", "enabled": False}
+        return dispatcher.failover.status() | {"enabled": True}
+
+    @bp.route("services", methods=["GET", "POST"])
+    def get_services():
+        if dispatcher.service_health is None:
+            return {"enabled": False}
+        # POST or ?refresh=true checks all hosts, regardless of the cache
+        refresh = request.method == "POST" or request.args.get(
+            "refresh", False, lambda v: v.lower() in ("1", "true", "yes")
+        )
+        return dispatcher.service_health.status(refresh=refresh)
+
+    @bp.route("panels")
+    def get_panels():
+        if dispatcher.panel_monitor is None:
+            return {"enabled": False}
+        return dispatcher.panel_monitor.status()
+
+    @bp.route("panels/check", methods=["PUT", "POST"])
+    def check_panels():
+        if dispatcher.panel_monitor is None:
+            abort(404, "panel monitor is not enabled")
+        dispatcher.panel_monitor.request_check()
+        return {"status": "requested"}
+
+    @bp.route("panels/<name>")
+    def get_panel(name):
+        if dispatcher.panel_monitor is None:
+            abort(404, "panel monitor is not enabled")
+        panel = dispatcher.panel_monitor.panels.get(name)
+        if panel is None:
+            abort(404, f"unknown panel {name}")
+        n_rounds = request.args.get("n_rounds", 100, int)
+        history = list(panel.history)[-n_rounds:]
+        return panel.summary() | {
+            "history": [
+                {"time": time, "up": up, "latency": latency}
+                for time, up, latency in history
+            ]
+        }
+
     @bp.route("upcoming_tracks")
-    def get_upcoming_tracks():
+    @bp.route("zones/<zone>/upcoming_tracks")
+    def get_upcoming_tracks(zone=None):
+        schedctrl = get_zone(zone)
         n_tracks = request.args.get("n_tracks", 20, int)
         return schedctrl.get_upcoming_tracks(n_tracks)
 
+    @bp.route("sync")
+    @bp.route("zones/<zone>/sync")
+    def get_sync_state(zone=None):
+        schedctrl = get_zone(zone)
+        if schedctrl.sync_poller is None:
+            return {"enabled": False}
+        drift_correction = (
+            {"enabled": False}
+            if schedctrl.drift_corrector is None
+            else schedctrl.drift_corrector.status()
+        )
+        return schedctrl.sync_poller.status() | {"drift_correction": drift_correction}
+
+    @bp.route("sync/history")
+    @bp.route("zones/<zone>/sync/history")
+    def get_sync_history(zone=None):
+        schedctrl = get_zone(zone)
+        if schedctrl.sync_poller is None:
+            return []
+        n_samples = request.args.get("n_samples", 60, int)
+        history = list(schedctrl.sync_poller.history)[-n_samples:]
+        return [asdict(sample) for sample in history]
+
     @bp.route("play_track", methods=["PUT", "POST"])
-    def play_track():
+    @bp.route("zones/<zone>/play_track", methods=["PUT", "POST"])
+    def play_track(zone=None):
+        schedctrl = get_zone(zone)
         track_id = request.args.get("track_id", "", str)
         try:
             schedctrl.play_track(track_id)
@@ -44,7 +158,9 @@ def construct_api_blueprint(schedctrl: SchedControl) -> Blueprint:
         return track_id
 
     @bp.route("schedule_track", methods=["PUT", "POST"])
-    def schedule_track():
+    @bp.route("zones/<zone>/schedule_track", methods=["PUT", "POST"])
+    def schedule_track(zone=None):
+        schedctrl = get_zone(zone)
         track_id = request.args.get("track_id", "", str)
         interval = request.args.get("interval", 10, int)
 
@@ -52,6 +168,65 @@ def construct_api_blueprint(schedctrl: SchedControl) -> Blueprint:
             schedctrl.schedule_track(track_id, interval)
         except KeyError:
             return "invalid track name", 404
+        except ValueError as e:
+            return str(e), 400
         return track_id
 
+    def cue_time_args(schedctrl: SchedControl) -> dict:
+        """time of a cue from the request: at (iso time), interval (seconds) or append"""
+        args = {}
+        if (at := request.args.get("at")) is not None:
+            args["when"] = parse_cue_time(at, schedctrl.clock.now())
+        if (interval := request.args.get("interval")) is not None:
+            args["in_seconds"] = float(interval)
+        args["append"] = request.args.get(
+            "append", False, lambda v: v.lower() in ("1", "true", "yes")
+        )
+        return args
+
+    @bp.route("queue")
+    @bp.route("zones/<zone>/queue")
+    def get_queue(zone=None):
+        schedctrl = get_zone(zone)
+        n_cues = request.args.get("n_cues", None, int)
+        return [
+            cue.as_dict() | {"title": schedctrl.tracks[cue.track_id].title}
+            for cue in schedctrl.cue_queue.upcoming(n_cues)
+        ]
+
+    @bp.route("queue", methods=["PUT", "POST"])
+    @bp.route("zones/<zone>/queue", methods=["PUT", "POST"])
+    def queue_track(zone=None):
+        schedctrl = get_zone(zone)
+        track_id = request.args.get("track_id", "", str)
+        try:
+            cue = schedctrl.queue_track(track_id, **cue_time_args(schedctrl))
+        except KeyError:
+            return "invalid track name", 404
+        except ValueError as e:
+            return str(e), 400
+        return cue.as_dict()
+
+    @bp.route("queue/<cue_id>", methods=["PUT", "POST"])
+    @bp.route("zones/<zone>/queue/<cue_id>", methods=["PUT", "POST"])
+    def reschedule_cue(cue_id, zone=None):
+        schedctrl = get_zone(zone)
+        try:
+            cue = schedctrl.reschedule_cue(cue_id, **cue_time_args(schedctrl))
+        except KeyError:
+            return f"no cue {cue_id}", 404
+        except ValueError as e:
+            return str(e), 400
+        return cue.as_dict()
+
+    @bp.route("queue/<cue_id>", methods=["DELETE"])
+    @bp.route("zones/<zone>/queue/<cue_id>", methods=["DELETE"])
+    def cancel_cue(cue_id, zone=None):
+        schedctrl = get_zone(zone)
+        try:
+            cue = schedctrl.cancel_cue(cue_id)
+        except KeyError:
+            return f"no cue {cue_id}", 404
+        return cue.as_dict()
+
     return bp
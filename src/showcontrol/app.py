@@ -3,16 +3,57 @@ import os
 from flask import Flask
 from xdg import xdg_state_home
 
-from showcontrol.config import find_config_files, get_config, read_config_option
-from showcontrol.schedcontrol import SchedControl
+from showcontrol.config import (
+    ConfigError,
+    find_config_files,
+    get_config,
+    read_config_option,
+)
+from showcontrol.dispatcher import Dispatcher
+from showcontrol.failover import Failover, read_failover_nodes
+from showcontrol.state import StateStore
 from .showcontrol import construct_showcontrol_bluperint
 from .api import construct_api_blueprint
 from pathlib import Path
 import atexit
 import click
+import socket
+
+
+def setup_failover(dispatcher: Dispatcher, node_name: str | None = None):
+    """attaches a failover to the dispatcher if the config contains a failover section
+
+    Args:
+        dispatcher (Dispatcher): engine of this instance
+        node_name (str | None, optional): name of this instance in the failover node list. Defaults to the hostname.
+    """
+    failover_config = read_config_option(dispatcher.config, "failover", dict, None)
+    if failover_config is None:
+        return
+
+    if node_name is None:
+        node_name = socket.gethostname()
+    nodes = read_failover_nodes(failover_config)
+    try:
+        node = next(n for n in nodes if n.name == node_name)
+    except StopIteration:
+        raise ConfigError(f"node {node_name} not found in failover config")
+    peer = next(n for n in nodes if n is not node)
+
+    dispatcher.attach_failover(
+        Failover(
+            node,
+            peer,
+            interval=float(failover_config.get("interval", 0.2)),
+            timeout=float(failover_config.get("timeout", 1.0)),
+            clock=dispatcher.clock,
+        )
+    )
 
 
-def create_app(config_dir: Path | None = None, test_config=None) -> Flask:
+def create_app(
+    config_dir: Path | None = None, test_config=None, node_name: str | None = None
+) -> Flask:
     # create and configure the app
     app = Flask(
         __name__,
@@ -46,20 +87,27 @@ def create_app(config_dir: Path | None = None, test_config=None) -> Flask:
 
     find_config_files(config_dir)
     # config = get_config()
-    schedctrl = SchedControl()
+    # pause state and queued cues survive a restart
+    state = StateStore(
+        app.config["DATABASE"],
+        read_config_option(get_config(), "state_flush_interval", float, 0.5),
+    )
+    dispatcher = Dispatcher(state=state)
+    setup_failover(dispatcher, node_name)
 
-    schedctrl.start_scheduler()
+    dispatcher.start()
 
     from . import auth
 
     app.register_blueprint(auth.bp)
 
-    app.register_blueprint(construct_showcontrol_bluperint(schedctrl))
-    app.register_blueprint(construct_api_blueprint(schedctrl), url_prefix="/api")
+    app.register_blueprint(construct_showcontrol_bluperint(dispatcher))
+    app.register_blueprint(construct_api_blueprint(dispatcher), url_prefix="/api")
     app.add_url_rule("/", endpoint="index")
     app.add_url_rule("/tracks", endpoint="tracks")
+    app.add_url_rule("/services", endpoint="services")
 
-    atexit.register(schedctrl.stop_scheduler)
+    atexit.register(dispatcher.stop)
 
     return app
 
@@ -75,10 +123,24 @@ def create_app(config_dir: Path | None = None, test_config=None) -> Flask:
     help="path to configfile",
 )
 @click.option("-d", "--dev", is_flag=True, help="enable flask dev mode")
+@click.option(
+    "-n",
+    "--node",
+    "node_name",
+    default=None,
+    help="name of this instance in the failover config, defaults to the hostname",
+)
+@click.option(
+    "-p",
+    "--http-port",
+    type=int,
+    default=None,
+    help="overrides http_port of the config",
+)
 @click.version_option()
-def run(config_dir: Path | None, dev):
+def run(config_dir: Path | None, dev, node_name: str | None, http_port: int | None):
 
-    app = create_app(config_dir=config_dir)
+    app = create_app(config_dir=config_dir, node_name=node_name)
 
     """can be used to run this app, recommended way is `flask --app showcontrol.app run`"""
     # global app
@@ -86,7 +148,11 @@ def run(config_dir: Path | None, dev):
     config = get_config()
     app.run(
         host=read_config_option(config, "listen_ip", str, "127.0.0.1"),
-        port=read_config_option(config, "http_port", int, 8080),
+        port=(
+            http_port
+            if http_port is not None
+            else read_config_option(config, "http_port", int, 8080)
+        ),
         debug=dev,
     )
 
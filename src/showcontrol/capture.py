@@ -0,0 +1,428 @@
+"""Capture and replay of the cue traffic showcontrol sends.
+
+In capture mode every OSC message to reaper and every datagram to the video players is recorded with its
+zone, destination and a monotonic timestamp in nanoseconds. The senders only append to an in-memory list,
+a background thread writes the records to an append-only binary file, so capturing never waits for the disk.
+Every start of showcontrol creates a new file in capture_dir.
+
+File format, all integers little endian:
+
+    header  magic b"SCCAP01\\n", wall clock ns and monotonic ns of the start (<qq)
+    record  ns since the start (<q), channel (<H), payload length (<H), payload
+
+Channel 0xFFFF defines the next channel, its payload is the json list [zone, sink, host, port]. A file cut
+off by a crash can be read up to its last complete record.
+
+    showcontrol_replay capture.sccap --list
+    showcontrol_replay capture.sccap --speed 10 -m 192.168.1.10:8000=127.0.0.1:9000
+
+replays a capture at the original timing or faster, against the emulators (see showcontrol.emulators) or
+the real devices, and reports how late every datagram was sent.
+
+config example:
+
+    # directory of the captures, relative to the config dir. Defaults to no capture
+    capture_dir: captures
+    # seconds between two writes of the capture
+    capture_flush_interval: 0.5
+"""
+
+from collections.abc import Iterable, Iterator
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
+from threading import Event, Lock, Thread
+import json
+import logging
+import socket
+import statistics
+import struct
+import time
+
+import click
+from pythonosc.osc_message import OscMessage, ParseError
+from pythonosc.udp_client import SimpleUDPClient
+
+from showcontrol.metrics import metrics
+
+log = logging.getLogger(__name__)
+
+magic = b"SCCAP01\n"
+header_struct = struct.Struct("<qq")
+record_struct = struct.Struct("<qHH")
+define_channel = 0xFFFF
+
+# records waiting for the writer before new ones are dropped
+max_pending = 100000
+
+
+@dataclass(frozen=True)
+class CapturedDatagram:
+    # ns since the start of the capture
+    offset_ns: int
+    # wall clock of the capturing machine
+    time_ns: int
+    zone: str
+    sink: str
+    host: str
+    port: int
+    data: bytes
+
+    @property
+    def destination(self) -> str:
+        return f"{self.host}:{self.port}"
+
+    def message(self) -> str:
+        """the payload as text, osc messages as address and arguments"""
+        if self.sink == "reaper":
+            try:
+                message = OscMessage(self.data)
+                return f"{message.address} {message.params}"
+            except ParseError:
+                return repr(self.data)
+        return self.data.decode("utf-8", errors="replace").strip()
+
+    def __str__(self) -> str:
+        time_str = datetime.fromtimestamp(self.time_ns / 1e9).astimezone()
+        return f"{time_str.isoformat(timespec='milliseconds')}\t{self.zone}\t{self.sink:<6}\t{self.destination:<21}\t{self.message()}"
+
+
+class Capture(object):
+    """Append-only capture file with a background writer
+
+    Args:
+        path (Path | str): file the capture is appended to
+        flush_interval (float, optional): seconds between two writes. Defaults to 0.5.
+    """
+
+    def __init__(self, path: Path | str, flush_interval: float = 0.5):
+        self.path = Path(path)
+        self.flush_interval = flush_interval
+        self.n_captured = 0
+        self.n_dropped = 0
+
+        # (zone, sink, host, port): channel
+        self._channels: dict[tuple[str, str, str, int], int] = {}
+        # (monotonic ns, channel, payload) in the order they were sent
+        self._pending: list[tuple[int, int, bytes]] = []
+        self._lock = Lock()
+        self._file_lock = Lock()
+        self._stop = Event()
+        self._thread: Thread | None = None
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._start_ns = time.monotonic_ns()
+        # a capture is never appended to another one
+        self._file = open(self.path, "xb")
+        self._file.write(magic + header_struct.pack(time.time_ns(), self._start_ns))
+        self._file.flush()
+
+    def record(
+        self,
+        zone: str,
+        sink: str,
+        destination: tuple[str, int],
+        data: bytes,
+        timestamp_ns: int | None = None,
+    ):
+        """queues a datagram that was sent, called by the senders
+
+        Args:
+            zone (str): zone that sent the datagram
+            sink (str): reaper or video
+            destination (tuple[str, int]): host and port
+            data (bytes): datagram payload
+            timestamp_ns (int, optional): time.monotonic_ns() of the send. Defaults to now.
+        """
+        if timestamp_ns is None:
+            timestamp_ns = time.monotonic_ns()
+        key = (zone, sink, destination[0], destination[1])
+        with self._lock:
+            if len(self._pending) >= max_pending:
+                self.n_dropped += 1
+                metrics.increment("capture_dropped")
+                return
+            channel = self._channels.get(key)
+            if channel is None:
+                channel = len(self._channels)
+                self._channels[key] = channel
+                self._pending.append(
+                    (timestamp_ns, define_channel, json.dumps(key).encode())
+                )
+            self._pending.append((timestamp_ns, channel, data))
+
+    def attach(self, schedctrl):
+        """captures everything a zone sends to reaper and the video players
+
+        Args:
+            schedctrl (SchedControl): zone to capture
+        """
+        schedctrl.reaper.close()
+        schedctrl.reaper = CapturingUDPClient(
+            schedctrl.reaper_hostname, schedctrl.reaper_port, self, schedctrl.name
+        )
+        delivery = schedctrl.video_delivery
+        delivery.socket = CapturingSocket(delivery.socket, self, schedctrl.name)
+
+    def flush(self) -> int:
+        """writes the pending records
+
+        Returns:
+            int: number of written records
+        """
+        with self._file_lock:
+            with self._lock:
+                pending, self._pending = self._pending, []
+            if not pending or self._file is None:
+                return 0
+            self._file.write(
+                b"".join(
+                    record_struct.pack(t - self._start_ns, channel, len(data)) + data
+                    for t, channel, data in pending
+                )
+            )
+            self._file.flush()
+        n_datagrams = sum(1 for _, channel, _ in pending if channel != define_channel)
+        self.n_captured += n_datagrams
+        metrics.increment("capture_datagrams", n_datagrams)
+        return len(pending)
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = Thread(target=self._run, name="Capture", daemon=True)
+        self._thread.start()
+        log.info(f"capturing the cue traffic to {self.path}")
+
+    def stop(self):
+        """stops the writer thread and writes the pending records"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self.flush()
+
+    def close(self):
+        self.stop()
+        with self._file_lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+    def _run(self):
+        while not self._stop.wait(self.flush_interval):
+            try:
+                self.flush()
+            except OSError as e:
+                log.error(f"writing the capture {self.path} failed: {e}")
+
+
+class CapturingUDPClient(SimpleUDPClient):
+    """SimpleUDPClient that records every message it sent
+
+    Args:
+        address (str): host of reaper
+        port (int): port of reaper
+        capture (Capture):
+        zone (str): name of the zone
+    """
+
+    def __init__(self, address: str, port: int, capture: Capture, zone: str):
+        super().__init__(address, port)
+        self.capture = capture
+        self.zone = zone
+
+    def send(self, content):
+        timestamp_ns = time.monotonic_ns()
+        super().send(content)
+        self.capture.record(
+            self.zone,
+            "reaper",
+            (self._address, self._port),
+            content.dgram,
+            timestamp_ns,
+        )
+
+
+class CapturingSocket(object):
+    """Wraps the udp socket of a video delivery and records every datagram it sent, everything but sendto
+    is passed to the socket
+
+    Args:
+        sock (socket.socket): socket of the delivery
+        capture (Capture):
+        zone (str): name of the zone
+    """
+
+    def __init__(self, sock: socket.socket, capture: Capture, zone: str):
+        self.socket = sock
+        self.capture = capture
+        self.zone = zone
+
+    def sendto(self, data: bytes, address: tuple[str, int]) -> int:
+        timestamp_ns = time.monotonic_ns()
+        n_bytes = self.socket.sendto(data, address)
+        self.capture.record(self.zone, "video", address, data, timestamp_ns)
+        return n_bytes
+
+    def __getattr__(self, name):
+        return getattr(self.socket, name)
+
+
+def read_capture(path: Path | str) -> Iterator[CapturedDatagram]:
+    """the datagrams of a capture file in the order they were sent
+
+    Raises:
+        ValueError: raised when the file is no capture
+    """
+    with open(path, "rb") as f:
+        data = f.read()
+    if not data.startswith(magic):
+        raise ValueError(f"{path} is no showcontrol capture")
+    start_wall_ns, _ = header_struct.unpack_from(data, len(magic))
+    offset = len(magic) + header_struct.size
+
+    channels: list[tuple[str, str, str, int]] = []
+    while offset + record_struct.size <= len(data):
+        offset_ns, channel, length = record_struct.unpack_from(data, offset)
+        offset += record_struct.size
+        if offset + length > len(data):
+            log.warning(f"{path} ends with an incomplete record")
+            break
+        payload = data[offset : offset + length]
+        offset += length
+        if channel == define_channel:
+            channels.append(tuple(json.loads(payload)))
+            continue
+        zone, sink, host, port = channels[channel]
+        yield CapturedDatagram(
+            offset_ns, start_wall_ns + offset_ns, zone, sink, host, port, payload
+        )
+
+
+def replay(
+    datagrams: Iterable[CapturedDatagram],
+    speed: float = 1.0,
+    destinations: dict[tuple[str, int], tuple[str, int]] | None = None,
+) -> list[float]:
+    """sends the datagrams of a capture again with their original spacing
+
+    Args:
+        datagrams (Iterable[CapturedDatagram]): usually read_capture()
+        speed (float, optional): replay speed, 2 replays twice as fast. 0 sends without waiting. Defaults to 1.0.
+        destinations (dict, optional): (host, port) of the capture: (host, port) to send to instead,
+            e.g. the address of an emulator. Defaults to the captured destinations.
+
+    Returns:
+        list[float]: seconds every datagram was sent after its due time
+    """
+    destinations = {} if destinations is None else destinations
+    lateness = []
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
+        # the video commands may have been broadcast
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_BROADCAST, 1)
+        start_ns = time.monotonic_ns()
+        first_ns = None
+        for datagram in datagrams:
+            if first_ns is None:
+                first_ns = datagram.offset_ns
+            due_ns = start_ns
+            if speed:
+                due_ns += int((datagram.offset_ns - first_ns) / speed)
+            # sleep most of the time, spin for the last millisecond
+            remaining = due_ns - time.monotonic_ns()
+            if remaining > 1_000_000:
+                time.sleep((remaining - 1_000_000) / 1e9)
+            while time.monotonic_ns() < due_ns:
+                pass
+            destination = (datagram.host, datagram.port)
+            try:
+                sock.sendto(datagram.data, destinations.get(destination, destination))
+            except OSError as e:
+                log.error(f"sending to {datagram.destination} failed: {e}")
+            lateness.append((time.monotonic_ns() - due_ns) / 1e9)
+    return lateness
+
+
+def parse_destination(value: str) -> tuple[str, int]:
+    host, _, port = value.rpartition(":")
+    return host, int(port)
+
+
+@click.command(
+    help="list a capture of the cue traffic or send it again at the original or an accelerated timing"
+)
+@click.argument(
+    "capture_file",
+    type=click.Path(exists=True, dir_okay=False, path_type=Path),
+)
+@click.option(
+    "-s",
+    "--speed",
+    type=float,
+    default=1.0,
+    help="replay speed, 2 replays twice as fast, 0 as fast as possible",
+)
+@click.option(
+    "-m",
+    "--map",
+    "mappings",
+    multiple=True,
+    help="send to another destination instead, e.g. 192.168.1.10:8000=127.0.0.1:9000",
+)
+@click.option(
+    "-z", "--zone", "zones", multiple=True, help="only datagrams of this zone"
+)
+@click.option(
+    "--sink",
+    "sinks",
+    type=click.Choice(["reaper", "video"]),
+    multiple=True,
+    help="only datagrams to reaper or to the video players",
+)
+@click.option(
+    "-l", "--list", "list_only", is_flag=True, help="print instead of sending"
+)
+def main(
+    capture_file: Path,
+    speed: float,
+    mappings: tuple[str, ...],
+    zones: tuple[str, ...],
+    sinks: tuple[str, ...],
+    list_only: bool,
+):
+    try:
+        destinations = dict(
+            (parse_destination(a), parse_destination(b))
+            for a, _, b in (mapping.partition("=") for mapping in mappings)
+        )
+    except ValueError:
+        raise click.BadParameter("expected host:port=host:port", param_hint="--map")
+
+    datagrams = [
+        datagram
+        for datagram in read_capture(capture_file)
+        if (not zones or datagram.zone in zones)
+        and (not sinks or datagram.sink in sinks)
+    ]
+    if list_only:
+        for datagram in datagrams:
+            click.echo(str(datagram))
+        return
+
+    t_start = time.perf_counter()
+    lateness = replay(datagrams, speed, destinations)
+    t_elapsed = time.perf_counter() - t_start
+    if lateness:
+        click.echo(
+            f"replayed {len(lateness)} datagrams in {t_elapsed:.3f}s, "
+            f"lateness mean {statistics.mean(lateness) * 1e3:.3f}ms max {max(lateness) * 1e3:.3f}ms",
+            err=True,
+        )
+    else:
+        click.echo("no datagrams to replay", err=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,248 @@
+"""The tracks of a tracks dir, read once and shared by the engine, the api and the schedule generator.
+
+Every track file becomes a Track. The TrackCatalog indexes the tracks by name, audio index and video index
+and refuses duplicates on every index. Its version is increased on every change, so anything computed from
+the tracks can be cached until the version changes.
+
+track file example:
+
+    name: brunnen
+    title: Brunnen der Sonne
+    title_en: Well of the Sun
+    audio_index: 2
+    video_index: 1
+    duration:
+      minutes: 16
+      seconds: 14
+    description: >
+      ...
+"""
+
+from collections.abc import Iterable, Iterator
+from pathlib import Path
+import logging
+
+from showcontrol import config as showcontrol_config
+from showcontrol.config import ConfigError, read_config_file
+
+log = logging.getLogger(__name__)
+
+
+class Track(object):
+    """A track, duration is in seconds. Tracks without a video have no video_index"""
+
+    __slots__ = (
+        "name",
+        "title",
+        "title_en",
+        "audio_index",
+        "video_index",
+        "duration",
+        "description",
+        "extra",
+    )
+
+    def __init__(
+        self,
+        name: str,
+        title: str,
+        audio_index: int,
+        video_index: int | None,
+        duration: float,
+        title_en: str | None = None,
+        description: str | None = None,
+        extra: dict | None = None,
+    ):
+        self.name = name
+        self.title = title
+        self.title_en = title_en
+        self.audio_index = audio_index
+        self.video_index = video_index
+        self.duration = duration
+        self.description = description
+        # other keys of the track file, kept for as_dict
+        self.extra = extra or {}
+
+    @classmethod
+    def from_dict(cls, track: dict, source: str = "track") -> "Track":
+        """a track as read from a track file
+
+        Raises:
+            ConfigError: raised when name or audio_index are missing
+        """
+        if not isinstance(track, dict):
+            raise ConfigError(f"{source} is no track")
+        missing = [key for key in ("name", "audio_index") if key not in track]
+        if missing:
+            raise ConfigError(f"{source} has no {', '.join(missing)}")
+        duration = track.get("duration") or {}
+        known = {
+            "name",
+            "title",
+            "title_en",
+            "audio_index",
+            "video_index",
+            "duration",
+            "description",
+        }
+        return cls(
+            track["name"],
+            track.get("title", track["name"]),
+            track["audio_index"],
+            track.get("video_index"),
+            duration.get("minutes", 0) * 60 + duration.get("seconds", 0),
+            title_en=track.get("title_en"),
+            description=track.get("description"),
+            extra={key: value for key, value in track.items() if key not in known},
+        )
+
+    def as_dict(self) -> dict:
+        """the track in the layout of a track file"""
+        minutes, seconds = divmod(self.duration, 60)
+        track = {
+            "name": self.name,
+            "title": self.title,
+            "audio_index": self.audio_index,
+            "duration": {"minutes": int(minutes), "seconds": seconds},
+        }
+        if self.video_index is not None:
+            track["video_index"] = self.video_index
+        if self.title_en is not None:
+            track["title_en"] = self.title_en
+        if self.description is not None:
+            track["description"] = self.description
+        return track | self.extra
+
+    def __repr__(self) -> str:
+        return (
+            f"Track({self.name!r}, audio_index={self.audio_index}, video_index={self.video_index}, "
+            f"duration={self.duration})"
+        )
+
+
+class TrackCatalog(object):
+    """Tracks by name, with indexes by audio index and video index
+
+    Looking up a name works like the dict of read_tracks: catalog[name], name in catalog, iterating yields the
+    names in the order the tracks were added.
+
+    Args:
+        tracks (Iterable[Track], optional): Defaults to no tracks.
+    """
+
+    def __init__(self, tracks: Iterable[Track] = ()):
+        self._by_name: dict[str, Track] = {}
+        self._by_audio_index: dict[int, Track] = {}
+        self._by_video_index: dict[int, Track] = {}
+        # increased on every change
+        self.version = 0
+        self._sorted: tuple[int, list[Track]] | None = None
+        for track in tracks:
+            self.add(track)
+
+    def add(self, track: Track):
+        """
+        Raises:
+            ConfigError: raised when the name, audio index or video index is already used by another track
+        """
+        for index, key, what in (
+            (self._by_name, track.name, "name"),
+            (self._by_audio_index, track.audio_index, "audio_index"),
+            (self._by_video_index, track.video_index, "video_index"),
+        ):
+            if key is not None and key in index:
+                raise ConfigError(
+                    f"{what} {key} of track {track.name} is already used by track {index[key].name}"
+                )
+        self._by_name[track.name] = track
+        self._by_audio_index[track.audio_index] = track
+        if track.video_index is not None:
+            self._by_video_index[track.video_index] = track
+        self.version += 1
+
+    def remove(self, name: str) -> Track:
+        track = self._by_name.pop(name)
+        del self._by_audio_index[track.audio_index]
+        self._by_video_index.pop(track.video_index, None)
+        self.version += 1
+        return track
+
+    def replace(self, tracks: Iterable[Track]):
+        """replaces all tracks at once, nothing is changed if the new tracks are not unique"""
+        catalog = TrackCatalog(tracks)
+        self._by_name = catalog._by_name
+        self._by_audio_index = catalog._by_audio_index
+        self._by_video_index = catalog._by_video_index
+        self.version += 1
+
+    def reload(self, track_dir: Path | str):
+        """reads the tracks dir again"""
+        self.replace(read_track_files(track_dir))
+        log.info(f"reloaded {len(self)} tracks from {track_dir}")
+
+    def by_audio_index(self, audio_index: int) -> Track:
+        return self._by_audio_index[audio_index]
+
+    def by_video_index(self, video_index: int) -> Track:
+        return self._by_video_index[video_index]
+
+    def duration(self, name: str) -> float:
+        """duration of a track in seconds, 0 if the track is unknown"""
+        track = self._by_name.get(name)
+        return 0 if track is None else track.duration
+
+    def sorted_by_audio_index(self) -> list[Track]:
+        """the tracks in the order of the reaper project, cached until the catalog changes"""
+        if self._sorted is None or self._sorted[0] != self.version:
+            self._sorted = (
+                self.version,
+                sorted(self._by_name.values(), key=lambda t: t.audio_index),
+            )
+        return self._sorted[1]
+
+    def __getitem__(self, name: str) -> Track:
+        return self._by_name[name]
+
+    def get(self, name: str, default=None) -> Track | None:
+        return self._by_name.get(name, default)
+
+    def __contains__(self, name) -> bool:
+        return name in self._by_name
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._by_name)
+
+    def __len__(self) -> int:
+        return len(self._by_name)
+
+    def keys(self):
+        return self._by_name.keys()
+
+    def values(self):
+        return self._by_name.values()
+
+    def items(self):
+        return self._by_name.items()
+
+
+def read_track_files(track_dir: Path | str) -> Iterator[Track]:
+    for track_file in Path(track_dir).glob("*.yml"):
+        yield Track.from_dict(read_config_file(track_file), str(track_file))
+
+
+def read_catalog(track_dir: Path | str | None = None) -> TrackCatalog:
+    """Reads all track files of a tracks dir
+
+    Args:
+        track_dir (Path | str, optional): Defaults to the tracks dir of the config.
+
+    Raises:
+        ConfigError: raised when a track file is invalid or a name, audio index or video index is not unique
+    """
+    if track_dir is None:
+        if showcontrol_config.config_paths is None:
+            raise ConfigError(
+                "no config paths found, call find_config_files() before trying to read a config file"
+            )
+        track_dir = showcontrol_config.config_paths.tracks_dir
+    return TrackCatalog(read_track_files(track_dir))
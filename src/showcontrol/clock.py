@@ -0,0 +1,167 @@
+from datetime import datetime, timedelta, timezone
+from collections import deque
+from collections.abc import Callable
+from threading import Event, Thread
+import logging
+import time
+
+log = logging.getLogger(__name__)
+
+
+class SystemClock(object):
+    """Clock backed by the operating system. All timing in showcontrol goes through a clock object,
+    so it can be replaced by a ManualClock for simulations and tests."""
+
+    def now(self) -> datetime:
+        return datetime.now().astimezone()
+
+    def time(self) -> float:
+        return time.time()
+
+    def monotonic(self) -> float:
+        return time.monotonic()
+
+    def utcoffset(self) -> float:
+        return self.now().utcoffset().total_seconds()
+
+    def sleep(self, seconds: float):
+        time.sleep(seconds)
+
+
+class ManualClock(SystemClock):
+    """Clock that only moves when told to. Wall clock and monotonic clock can be moved independently,
+    which allows simulating NTP steps and DST transitions.
+
+    Args:
+        start (datetime, optional): initial wall clock time, has to be timezone aware. Defaults to the current time.
+    """
+
+    def __init__(self, start: datetime | None = None):
+        if start is None:
+            start = datetime.now().astimezone()
+        if start.tzinfo is None:
+            raise ValueError("start time of ManualClock has to be timezone aware")
+        self._wall = start
+        self._monotonic = 0.0
+
+    def now(self) -> datetime:
+        return self._wall
+
+    def time(self) -> float:
+        return self._wall.timestamp()
+
+    def monotonic(self) -> float:
+        return self._monotonic
+
+    def utcoffset(self) -> float:
+        return self._wall.utcoffset().total_seconds()
+
+    def sleep(self, seconds: float):
+        self.advance(seconds)
+
+    def advance(self, seconds: float):
+        """lets time pass, both clocks move forward"""
+        self._wall += timedelta(seconds=seconds)
+        self._monotonic += seconds
+
+    def set(self, when: datetime):
+        """moves time forward to when, both clocks move forward"""
+        self.advance((when - self._wall).total_seconds())
+
+    def step(self, seconds: float):
+        """steps only the wall clock, like ntpd or a manual `date -s` would"""
+        self._wall += timedelta(seconds=seconds)
+
+    def set_utcoffset(self, hours: float):
+        """changes the timezone offset of the wall clock without moving it, like a DST transition"""
+        self._wall = self._wall.astimezone(timezone(timedelta(hours=hours)))
+
+
+class ClockWatchdog(object):
+    """Compares the progress of the wall clock against the monotonic clock and reports steps.
+
+    Wall clock steps (NTP, manual changes) and utc offset changes (DST) are reported to the callback
+    as `on_step(step_seconds, event)`.
+
+    Args:
+        on_step (Callable): called with the size of the wall clock step in seconds and the event dict
+        clock (SystemClock, optional): clock to watch. Defaults to SystemClock().
+        threshold (float, optional): minimum deviation in seconds that is reported as a step. Defaults to 2.0.
+        interval (float, optional): seconds between two checks. Defaults to 1.0.
+        max_events (int, optional): number of events that are kept in self.events. Defaults to 50.
+    """
+
+    def __init__(
+        self,
+        on_step: Callable[[float, dict], None],
+        clock: SystemClock | None = None,
+        threshold: float = 2.0,
+        interval: float = 1.0,
+        max_events: int = 50,
+    ):
+        self.on_step = on_step
+        self.clock = SystemClock() if clock is None else clock
+        self.threshold = threshold
+        self.interval = interval
+        self.events = deque(maxlen=max_events)
+
+        self._stop = Event()
+        self._thread: Thread | None = None
+        self.reset()
+
+    def reset(self):
+        """takes new reference readings of all clocks"""
+        self._last_wall = self.clock.time()
+        self._last_monotonic = self.clock.monotonic()
+        self._last_offset = self.clock.utcoffset()
+
+    def check(self) -> dict | None:
+        """compares the clocks against the last readings, reports and returns the event if a step was detected"""
+        wall = self.clock.time()
+        monotonic = self.clock.monotonic()
+        offset = self.clock.utcoffset()
+
+        step = (wall - self._last_wall) - (monotonic - self._last_monotonic)
+        offset_change = offset - self._last_offset
+
+        self._last_wall = wall
+        self._last_monotonic = monotonic
+        self._last_offset = offset
+
+        if abs(step) < self.threshold and offset_change == 0:
+            return None
+
+        event = {
+            "time": self.clock.now().isoformat(),
+            "kind": "step" if abs(step) >= self.threshold else "utcoffset",
+            "step": step,
+            "utcoffset_change": offset_change,
+        }
+        self.events.append(event)
+        log.warning(
+            f"detected clock {event['kind']}: wall clock moved by {step:+.3f}s relative to the monotonic clock, utc offset changed by {offset_change:+.0f}s"
+        )
+
+        try:
+            self.on_step(step, event)
+        except Exception as e:
+            log.error(f"handling clock step failed: {e}")
+        return event
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self.reset()
+        self._thread = Thread(target=self._run, name="ClockWatchdog", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.check()
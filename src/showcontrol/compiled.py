@@ -0,0 +1,244 @@
+"""Compiled schedules: a binary copy of schedule.yml that is loaded without parsing.
+
+showcontrol_schedule_generator writes it next to the schedule (schedule.yml -> schedule.sched). showcontrol
+loads the compiled schedule if it exists and is not older than the yaml file, otherwise the yaml file.
+
+The file is memory mapped, its arrays are used in place:
+
+    header     magic, version, number of tracks, weekly and dated records, size of the track table
+    tracks     track names, utf-8, separated by null bytes
+    weekly     uint32 seconds of the week (monday 00:00 is 0), uint16 track ordinal
+    dated      uint32 seconds since 1970-01-01 in local time, uint16 track ordinal
+
+All numbers are little endian, every array starts on a multiple of 4 bytes.
+"""
+
+from collections.abc import Iterator
+from datetime import datetime, timedelta
+from pathlib import Path
+import logging
+import mmap
+import struct
+import sys
+
+from showcontrol.config import ConfigError, read_schedule
+from showcontrol.export import ScheduleEntry, ScheduleWriter
+
+log = logging.getLogger(__name__)
+
+magic = b"SCSCHED\0"
+version = 1
+compiled_suffix = ".sched"
+
+# magic, version, reserved, n_tracks, n_weekly, n_dated, size of the track table
+header = struct.Struct("<8sHHIIII")
+
+epoch = datetime(1970, 1, 1)
+seconds_per_day = 24 * 3600
+
+
+def compiled_path(schedule_path: Path) -> Path:
+    return Path(schedule_path).with_suffix(compiled_suffix)
+
+
+def _padded(size: int) -> int:
+    return (size + 3) // 4 * 4
+
+
+def compile_schedule(entries: list[ScheduleEntry], path: Path | str):
+    """writes the entries of a schedule to a compiled schedule"""
+    ordinals: dict[str, int] = {}
+    weekly: list[tuple[int, int]] = []
+    dated: list[tuple[int, int]] = []
+    for entry in entries:
+        ordinal = ordinals.setdefault(entry.track_id, len(ordinals))
+        seconds = entry.hour * 3600 + entry.minute * 60 + entry.second
+        if entry.day is not None:
+            midnight = datetime(entry.day.year, entry.day.month, entry.day.day)
+            dated.append((int((midnight - epoch).total_seconds()) + seconds, ordinal))
+        else:
+            weekly.extend(
+                (day * seconds_per_day + seconds, ordinal) for day in entry.days
+            )
+    if len(ordinals) > 0xFFFF:
+        raise ValueError("a compiled schedule holds at most 65535 tracks")
+    weekly.sort()
+    dated.sort()
+
+    names = b"\0".join(name.encode() for name in ordinals)
+    with open(path, "wb") as f:
+        f.write(
+            header.pack(
+                magic, version, 0, len(ordinals), len(weekly), len(dated), len(names)
+            )
+        )
+        f.write(names.ljust(_padded(len(names)), b"\0"))
+        for records in (weekly, dated):
+            f.write(struct.pack(f"<{len(records)}I", *(t for t, _ in records)))
+            tracks = struct.pack(f"<{len(records)}H", *(o for _, o in records))
+            f.write(tracks.ljust(_padded(len(tracks)), b"\0"))
+
+
+class CompiledSchedule(object):
+    """A memory mapped compiled schedule, the records are memoryviews of the file. The header, the track
+    table and the track ordinals are checked when the file is opened, the records can be read without checks
+
+    Raises:
+        ConfigError: raised when the file is no compiled schedule, is corrupt or has an unsupported version
+    """
+
+    def __init__(self, path: Path | str):
+        self.path = Path(path)
+        with open(self.path, "rb") as f:
+            try:
+                self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError:
+                raise ConfigError(f"compiled schedule {self.path} is empty")
+        try:
+            self._load()
+        except (struct.error, ValueError, TypeError) as e:
+            self.close()
+            raise ConfigError(f"compiled schedule {self.path} is corrupt: {e}")
+        except Exception:
+            self.close()
+            raise
+
+    def _load(self):
+        if len(self._mmap) < header.size:
+            raise ConfigError(f"compiled schedule {self.path} is truncated")
+        file_magic, file_version, _, n_tracks, n_weekly, n_dated, names_size = (
+            header.unpack_from(self._mmap)
+        )
+        if file_magic != magic:
+            raise ConfigError(f"{self.path} is no compiled schedule")
+        if file_version != version:
+            raise ConfigError(
+                f"compiled schedule {self.path} has version {file_version}, supported is {version}"
+            )
+        offset = header.size + _padded(names_size)
+        expected_size = (
+            offset
+            + 4 * (n_weekly + n_dated)
+            + _padded(2 * n_weekly)
+            + _padded(2 * n_dated)
+        )
+        if len(self._mmap) < expected_size:
+            raise ConfigError(f"compiled schedule {self.path} is truncated")
+
+        names = self._mmap[header.size : header.size + names_size]
+        try:
+            self.tracks = names.decode().split("\0") if names_size else []
+        except UnicodeDecodeError:
+            raise ConfigError(
+                f"compiled schedule {self.path} has a corrupt track table"
+            )
+        if len(self.tracks) != n_tracks:
+            raise ConfigError(
+                f"compiled schedule {self.path} has {len(self.tracks)} track names, expected {n_tracks}"
+            )
+
+        view = memoryview(self._mmap)
+        self._views = [view]
+        self.weekly_times, offset = self._array(view, offset, n_weekly, "I")
+        self.weekly_tracks, offset = self._array(view, offset, n_weekly, "H")
+        self.dated_times, offset = self._array(view, offset, n_dated, "I")
+        self.dated_tracks, offset = self._array(view, offset, n_dated, "H")
+
+        for ordinals in (self.weekly_tracks, self.dated_tracks):
+            if len(ordinals) and max(ordinals) >= n_tracks:
+                raise ConfigError(
+                    f"compiled schedule {self.path} refers to tracks beyond its track table"
+                )
+        if max(self.weekly_times, default=0) >= 7 * seconds_per_day:
+            raise ConfigError(
+                f"compiled schedule {self.path} has weekly records beyond the end of the week"
+            )
+
+    def _array(self, view: memoryview, offset: int, n: int, fmt: str):
+        size = n * struct.calcsize(fmt)
+        array = view[offset : offset + size].cast(fmt)
+        if sys.byteorder != "little":
+            # a copy in native byte order, the file is little endian
+            array = memoryview(
+                struct.pack(f"={n}{fmt}", *struct.unpack(f"<{n}{fmt}", array.tobytes()))
+            ).cast(fmt)
+        self._views.append(array)
+        return array, offset + _padded(size)
+
+    def __len__(self) -> int:
+        return len(self.weekly_times) + len(self.dated_times)
+
+    def entries(self) -> Iterator[ScheduleEntry]:
+        """weekly entries with all days of the same time and track in one entry, then the dated entries"""
+        # time of day, track ordinal: days
+        weekly: dict[tuple[int, int], list[int]] = {}
+        for t, ordinal in zip(self.weekly_times, self.weekly_tracks):
+            day, seconds = divmod(t, seconds_per_day)
+            weekly.setdefault((seconds, ordinal), []).append(day)
+        for (seconds, ordinal), days in sorted(weekly.items()):
+            yield ScheduleEntry(
+                self.tracks[ordinal],
+                seconds // 3600,
+                seconds // 60 % 60,
+                seconds % 60,
+                tuple(days),
+            )
+        for t, ordinal in zip(self.dated_times, self.dated_tracks):
+            start = epoch + timedelta(seconds=t)
+            yield ScheduleEntry(
+                self.tracks[ordinal],
+                start.hour,
+                start.minute,
+                start.second,
+                day=start.date(),
+            )
+
+    def close(self):
+        for view in reversed(getattr(self, "_views", [])):
+            view.release()
+        self._views = []
+        self._mmap.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+class CompiledScheduleWriter(ScheduleWriter):
+    """writes the compiled schedule when the timeline is complete"""
+
+    def open(self):
+        self.entries: list[ScheduleEntry] = []
+
+    def write(self, entry: ScheduleEntry):
+        self.entries.append(entry)
+
+    def close(self):
+        compile_schedule(self.entries, self.path)
+
+
+def load_schedule(schedule_path: Path) -> list[dict]:
+    """The entries of a schedule, from its compiled schedule if there is an up to date one
+
+    Raises:
+        ConfigError: raised when there is neither a compiled nor a yaml schedule
+    """
+    schedule_path = Path(schedule_path)
+    path = compiled_path(schedule_path)
+    if path.is_file():
+        if (
+            schedule_path.is_file()
+            and path.stat().st_mtime < schedule_path.stat().st_mtime
+        ):
+            log.warning(
+                f"compiled schedule {path} is older than {schedule_path}, loading the yaml schedule"
+            )
+        else:
+            try:
+                with CompiledSchedule(path) as compiled:
+                    return [entry.as_dict() for entry in compiled.entries()]
+            except ConfigError as e:
+                log.warning(f"{e}, loading the yaml schedule")
+    return read_schedule(schedule_path)
@@ -1,6 +1,6 @@
 from pathlib import Path
 import os
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 import logging
 from typing import TypeVar
 from collections.abc import Callable
@@ -45,6 +45,22 @@ class ConfigPaths:
     blocks_dir: Path
 
 
+@dataclass
+class ZoneConfig:
+    name: str
+    config: dict
+    tracks_dir: Path
+    schedule_file_path: Path
+
+
+@dataclass
+class SystemConfig:
+    name: str
+    ip: str
+    user: str | None = None
+    services: list[str] = field(default_factory=list)
+
+
 config_paths: ConfigPaths | None = None
 
 
@@ -200,3 +216,90 @@ def read_schedule(schedule_path: Path | None = None) -> dict:
     if not (schedule_path.exists() and schedule_path.is_file()):
         raise ConfigError("No Schedule File found")
     return read_config_file(schedule_path)
+
+
+def read_zones(config: dict) -> list[ZoneConfig]:
+    """Reads the zones of the installation. Every zone has its own reaper, video players, tracks and schedule.
+
+    Options of a zone entry override the global options, tracks and schedule paths are relative to the config dir.
+    If the config has no zones section, the global options form a single zone named default.
+
+    Args:
+        config (dict): contents of the config file
+
+    Raises:
+        ConfigError: raised when the zones are invalid
+
+    Returns:
+        list[ZoneConfig]: all zones, the first one is the default zone
+    """
+    if config_paths is None:
+        raise ConfigError(
+            "no config paths found, call find_config_files() before trying to read a config file"
+        )
+    config_dir = config_paths.config_file_path.parent
+    global_config = {k: v for k, v in config.items() if k != "zones"}
+
+    if "zones" not in config:
+        return [
+            ZoneConfig(
+                "default",
+                global_config,
+                config_paths.tracks_dir,
+                config_paths.schedule_file_path,
+            )
+        ]
+
+    zones = []
+    for zone in config["zones"]:
+        if "name" not in zone:
+            raise ConfigError("every zone needs a name")
+        if zone["name"] in [z.name for z in zones]:
+            raise ConfigError(f"zone name {zone['name']} is not unique")
+        if str(zone["name"]).startswith("_"):
+            # the jobstores of the zones share the scheduler with internal ones like the heartbeat
+            raise ConfigError(f"zone name {zone['name']} is reserved, it must not start with _")
+        zone_config = global_config | {
+            k: v for k, v in zone.items() if k not in ("name", "tracks", "schedule")
+        }
+        zones.append(
+            ZoneConfig(
+                zone["name"],
+                zone_config,
+                config_dir / zone.get("tracks", tracks_dirname),
+                config_dir / zone.get("schedule", schedule_filename),
+            )
+        )
+    if not zones:
+        raise ConfigError("zones section is empty")
+    return zones
+
+
+def read_systems(config: dict, service: str | None = None) -> list[SystemConfig]:
+    """Reads the hosts of the installation from the system section of the config
+
+    Args:
+        config (dict): contents of the config file
+        service (str, optional): only return hosts running this service. Defaults to None.
+
+    Raises:
+        ConfigError: raised when a host has no name or ip
+
+    Returns:
+        list[SystemConfig]: the hosts in the order of the config
+    """
+    systems = []
+    for system in config.get("system") or []:
+        if "name" not in system or "ip" not in system:
+            raise ConfigError("every system entry needs a name and an ip")
+        systems.append(
+            SystemConfig(
+                system["name"],
+                str(system["ip"]),
+                system.get("user"),
+                list(system.get("services") or []),
+            )
+        )
+    if service is not None:
+        systems = [s for s in systems if service in s.services]
+    return systems
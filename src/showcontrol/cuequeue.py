@@ -0,0 +1,285 @@
+"""Ad-hoc cues: tracks queued by operators or automated systems next to the schedule.
+
+Every zone has a CueQueue. A cue is queued at an absolute time, a number of seconds from now or appended
+after the track that is playing and all queued cues, so appended tracks play back to back. Every cue gets an
+id, so it can be listed, moved and cancelled:
+
+    GET    /api/queue                              queued cues in the order they fire
+    POST   /api/queue?track_id=brunnen&at=14:30    at 14:30 today, or at=2026-05-01T14:30:00
+    POST   /api/queue?track_id=brunnen&interval=60 in 60 seconds
+    POST   /api/queue?track_id=brunnen&append=true after the current track and the queued cues
+    PUT    /api/queue/<id>?interval=120            moves a cue, with at, interval or append
+    DELETE /api/queue/<id>                         cancels a cue
+
+The cues are kept in a heap ordered by fire time. Cancelled and moved cues stay in the heap until they reach
+its top or the heap is compacted, so queueing, moving and cancelling are O(log n) with thousands of cues.
+All cues of a zone are fired by a single job, its CueQueueTrigger fires at the time of the first cue.
+"""
+
+from collections.abc import Callable, Iterator
+from dataclasses import dataclass, replace
+from datetime import datetime, time, timedelta, timezone
+from threading import Lock
+import heapq
+import itertools
+import logging
+import uuid
+
+from apscheduler.triggers.base import BaseTrigger
+
+log = logging.getLogger(__name__)
+
+# fire time of the queue job while no cue is queued, the job is kept so queueing a cue never races with
+# the scheduler removing it
+idle_time = datetime(9000, 1, 1, tzinfo=timezone.utc)
+
+# stale heap entries before the heaps are rebuilt
+min_compact = 64
+
+
+@dataclass(frozen=True)
+class QueuedCue:
+    id: str
+    track_id: str
+    time: datetime
+    # seconds
+    duration: float
+    # queued in seconds from now or appended, moved along when the wall clock is stepped. Cues at an
+    # absolute time keep their wall clock time
+    relative: bool = False
+
+    @property
+    def end(self) -> datetime:
+        return self.time + timedelta(seconds=self.duration)
+
+    def as_dict(self) -> dict:
+        return {
+            "id": self.id,
+            "track_id": self.track_id,
+            "time": self.time.isoformat(timespec="seconds"),
+            "end": self.end.isoformat(timespec="seconds"),
+            "duration": self.duration,
+            "relative": self.relative,
+        }
+
+
+class CueQueue(object):
+    """Queued cues of a zone, ordered by fire time
+
+    Args:
+        duration (Callable[[str], float]): duration of a track in seconds, used for appended cues
+    """
+
+    def __init__(self, duration: Callable[[str], float]):
+        self.duration = duration
+        self._lock = Lock()
+        # id: cue, only cues that are still queued
+        self._cues: dict[str, QueuedCue] = {}
+        # (time, seq, cue) and (-end, seq, cue), entries of cancelled or moved cues are stale
+        self._by_time: list[tuple[datetime, int, QueuedCue]] = []
+        self._by_end: list[tuple[float, int, QueuedCue]] = []
+        self._seq = itertools.count()
+
+    def __len__(self) -> int:
+        return len(self._cues)
+
+    def __contains__(self, cue_id: str) -> bool:
+        return cue_id in self._cues
+
+    def get(self, cue_id: str) -> QueuedCue | None:
+        return self._cues.get(cue_id)
+
+    def add(
+        self,
+        track_id: str,
+        when: datetime,
+        cue_id: str | None = None,
+        relative: bool = False,
+    ) -> QueuedCue:
+        """queues a track at when
+
+        Args:
+            track_id (str): track to play
+            when (datetime): timezone aware fire time
+            cue_id (str, optional): Defaults to a new random id.
+            relative (bool, optional): when was computed from the current time, see QueuedCue.
+                Defaults to False.
+        """
+        if when.tzinfo is None:
+            raise ValueError("time of a cue has to be timezone aware")
+        cue = QueuedCue(
+            uuid.uuid4().hex[:12] if cue_id is None else cue_id,
+            track_id,
+            when,
+            self.duration(track_id),
+            relative,
+        )
+        with self._lock:
+            if cue.id in self._cues:
+                raise ValueError(f"cue {cue.id} is already queued")
+            self._push(cue)
+        return cue
+
+    def cancel(self, cue_id: str) -> QueuedCue:
+        """
+        Raises:
+            KeyError: raised when no cue with this id is queued
+        """
+        with self._lock:
+            cue = self._cues.pop(cue_id)
+            self._compact()
+        return cue
+
+    def reschedule(
+        self, cue_id: str, when: datetime, relative: bool = False
+    ) -> QueuedCue:
+        """moves a cue to when, it keeps its id
+
+        Raises:
+            KeyError: raised when no cue with this id is queued
+        """
+        if when.tzinfo is None:
+            raise ValueError("time of a cue has to be timezone aware")
+        with self._lock:
+            cue = replace(self._cues[cue_id], time=when, relative=relative)
+            self._push(cue)
+            self._compact()
+        return cue
+
+    def tail(self) -> datetime | None:
+        """end of the queued cue that ends last, None if the queue is empty"""
+        with self._lock:
+            while self._by_end and self._is_stale(self._by_end[0][2]):
+                heapq.heappop(self._by_end)
+            return self._by_end[0][2].end if self._by_end else None
+
+    def next_time(self, after: datetime | None = None) -> datetime | None:
+        """fire time of the first cue, or of the first cue later than after"""
+        with self._lock:
+            for cue in self._ordered():
+                if after is None or cue.time > after:
+                    return cue.time
+        return None
+
+    def pop_due(self, now: datetime) -> list[QueuedCue]:
+        """removes and returns the cues with a fire time up to now, in order"""
+        due = []
+        with self._lock:
+            while self._by_time and self._by_time[0][0] <= now:
+                _, _, cue = heapq.heappop(self._by_time)
+                if not self._is_stale(cue):
+                    del self._cues[cue.id]
+                    due.append(cue)
+            self._compact()
+        return due
+
+    def due(self, now: datetime) -> list[QueuedCue]:
+        """the cues with a fire time up to now, in order, without removing them"""
+        with self._lock:
+            return list(
+                itertools.takewhile(lambda cue: cue.time <= now, self._ordered())
+            )
+
+    def upcoming(self, n: int | None = None) -> list[QueuedCue]:
+        """the first n cues in the order they fire, all cues if n is None"""
+        with self._lock:
+            if n is None:
+                return sorted(self._cues.values(), key=lambda cue: cue.time)
+            return list(itertools.islice(self._ordered(), n))
+
+    def shift(self, seconds: float) -> list[QueuedCue]:
+        """moves the relative cues, used when the wall clock was stepped
+
+        Returns:
+            list[QueuedCue]: the moved cues
+        """
+        step = timedelta(seconds=seconds)
+        with self._lock:
+            shifted = [
+                replace(cue, time=cue.time + step)
+                for cue in self._cues.values()
+                if cue.relative
+            ]
+            for cue in shifted:
+                self._push(cue)
+            self._compact()
+        return shifted
+
+    def clear(self):
+        with self._lock:
+            self._cues.clear()
+            self._by_time.clear()
+            self._by_end.clear()
+
+    def _push(self, cue: QueuedCue):
+        self._cues[cue.id] = cue
+        seq = next(self._seq)
+        heapq.heappush(self._by_time, (cue.time, seq, cue))
+        heapq.heappush(self._by_end, (-cue.end.timestamp(), seq, cue))
+
+    def _is_stale(self, cue: QueuedCue) -> bool:
+        return self._cues.get(cue.id) is not cue
+
+    def _ordered(self) -> Iterator[QueuedCue]:
+        """the queued cues in order, only the part of the heap that is needed is sorted"""
+        heap = self._by_time
+        if not heap:
+            return
+        frontier = [(heap[0], 0)]
+        while frontier:
+            (_, _, cue), i = heapq.heappop(frontier)
+            if not self._is_stale(cue):
+                yield cue
+            for child in (2 * i + 1, 2 * i + 2):
+                if child < len(heap):
+                    heapq.heappush(frontier, (heap[child], child))
+
+    def _compact(self):
+        """rebuilds the heaps when most of their entries are stale"""
+        n_stale = max(len(self._by_time), len(self._by_end)) - len(self._cues)
+        if n_stale < min_compact or n_stale < len(self._cues):
+            return
+        self._by_time = [
+            entry for entry in self._by_time if not self._is_stale(entry[2])
+        ]
+        self._by_end = [entry for entry in self._by_end if not self._is_stale(entry[2])]
+        heapq.heapify(self._by_time)
+        heapq.heapify(self._by_end)
+
+
+class CueQueueTrigger(BaseTrigger):
+    """Fires at the time of the first queued cue. While the queue is empty it returns idle_time instead of
+    None, so the scheduler keeps the job
+
+    Args:
+        queue (CueQueue):
+    """
+
+    def __init__(self, queue: CueQueue):
+        self.queue = queue
+
+    def get_next_fire_time(self, previous_fire_time, now):
+        # the cues due at previous_fire_time are popped when the job runs, never fire twice for them
+        next_time = self.queue.next_time(previous_fire_time)
+        return idle_time if next_time is None else next_time
+
+    def __str__(self):
+        return f"cue queue[{len(self.queue)}]"
+
+    def __repr__(self):
+        return f"<{self.__class__.__name__} ({len(self.queue)} cues)>"
+
+
+def parse_cue_time(value: str, now: datetime) -> datetime:
+    """an absolute time of a cue: an iso datetime or a time of today, HH:MM or HH:MM:SS, in the timezone of now
+
+    Raises:
+        ValueError: raised when value is no valid time
+    """
+    try:
+        when = datetime.fromisoformat(value)
+    except ValueError:
+        when = datetime.combine(now.date(), time.fromisoformat(value))
+    if when.tzinfo is None:
+        when = when.replace(tzinfo=now.tzinfo)
+    return when
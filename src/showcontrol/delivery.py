@@ -0,0 +1,204 @@
+"""Delivery modes for the json commands sent to the video players.
+
+broadcast (default) sends every command once to the subnet broadcast address, multicast once to a group
+the players joined, unicast sends one datagram to every player. Only unicast can target a subset of the players.
+
+config example:
+
+    video_delivery: multicast
+    multicast_group: 239.25.19.1
+    multicast_ttl: 1
+    multicast_interface: 172.25.19.1
+
+    video_delivery: unicast
+    # names of system entries, defaults to every system running the mpv service
+    video_players:
+      - syncplayer-01
+      - syncplayer-02
+"""
+
+from abc import ABC, abstractmethod
+from collections.abc import Iterable
+import logging
+import socket
+
+from showcontrol.config import ConfigError, read_config_option, read_systems
+
+log = logging.getLogger(__name__)
+
+video_service_name = "mpv"
+
+
+class VideoDelivery(ABC):
+    """Sends a datagram to the video players listening on a port. Subclasses define the destinations."""
+
+    mode = ""
+    # commands can be sent to a subset of the players
+    can_target = False
+
+    def __init__(self):
+        self.socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+
+    @abstractmethod
+    def destinations(
+        self, port: int, targets: Iterable[str] | None = None
+    ) -> list[tuple[str, int]]:
+        pass
+
+    def send(
+        self, message: bytes, ports: Iterable[int], targets: Iterable[str] | None = None
+    ) -> int:
+        """sends message to all players on all ports, the destinations are resolved before the first datagram is sent
+
+        Args:
+            message (bytes): datagram payload
+            ports (Iterable[int]): ports the message is sent to
+            targets (Iterable[str], optional): names of the players to send to. Defaults to None (all players).
+
+        Returns:
+            int: number of datagrams sent
+        """
+        destinations = [d for port in ports for d in self.destinations(port, targets)]
+        n_sent = 0
+        for destination in destinations:
+            try:
+                self.socket.sendto(message, destination)
+                n_sent += 1
+            except OSError as e:
+                log.error(f"sending to {destination[0]}:{destination[1]} failed: {e}")
+        return n_sent
+
+    def close(self):
+        self.socket.close()
+
+
+class BroadcastDelivery(VideoDelivery):
+    mode = "broadcast"
+
+    def __init__(self, broadcast_ip: str):
+        super().__init__()
+        self.broadcast_ip = broadcast_ip
+        self.socket.setsockopt(socket.SOL_SOCKET, socket.SO_BROADCAST, 1)
+
+    def destinations(self, port, targets=None):
+        if targets is not None:
+            raise ValueError("broadcast delivery cannot target single players")
+        return [(self.broadcast_ip, port)]
+
+
+class MulticastDelivery(VideoDelivery):
+    """Sends to a multicast group
+
+    Args:
+        group (str): multicast group address
+        ttl (int, optional): hops the datagrams may take, 1 keeps them on the local segment. Defaults to 1.
+        interface (str, optional): address of the interface to send on. Defaults to the interface of the default route.
+    """
+
+    mode = "multicast"
+
+    def __init__(self, group: str, ttl: int = 1, interface: str | None = None):
+        super().__init__()
+        self.group = group
+        self.ttl = ttl
+        self.interface = interface
+        self.socket.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_TTL, ttl)
+        # players running on the same host have to receive the commands too
+        self.socket.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_LOOP, 1)
+        if interface is not None:
+            self.socket.setsockopt(
+                socket.IPPROTO_IP, socket.IP_MULTICAST_IF, socket.inet_aton(interface)
+            )
+
+    def destinations(self, port, targets=None):
+        if targets is not None:
+            raise ValueError("multicast delivery cannot target single players")
+        return [(self.group, port)]
+
+
+class UnicastDelivery(VideoDelivery):
+    """Sends one datagram to every player
+
+    Host names are resolved once when the delivery is created, a player that could not be resolved is
+    retried by name on every send.
+
+    Args:
+        players (dict[str, str]): name: host of every player
+    """
+
+    mode = "unicast"
+    can_target = True
+
+    def __init__(self, players: dict[str, str]):
+        super().__init__()
+        self.players = {name: self._resolve(host) for name, host in players.items()}
+
+    @staticmethod
+    def _resolve(host: str) -> str:
+        try:
+            return socket.gethostbyname(host)
+        except OSError as e:
+            log.warning(f"could not resolve video player {host}: {e}")
+            return host
+
+    def destinations(self, port, targets=None):
+        if targets is None:
+            return [(host, port) for host in self.players.values()]
+        try:
+            return [(self.players[name], port) for name in targets]
+        except KeyError as e:
+            raise ValueError(f"unknown video player {e}")
+
+
+def read_video_players(config: dict) -> dict[str, str]:
+    """name: host of the video players, the systems listed in video_players or all systems running mpv
+
+    Raises:
+        ConfigError: raised when a player of video_players is not in the system section
+    """
+    names = read_config_option(config, "video_players", list)
+    systems = {
+        s.name: s.ip
+        for s in read_systems(config, None if names else video_service_name)
+    }
+    if names is None:
+        names = list(systems)
+    missing = [name for name in names if name not in systems]
+    if missing:
+        raise ConfigError(f"video players {missing} not found in system")
+    return {name: systems[name] for name in names}
+
+
+def create_video_delivery(config: dict) -> VideoDelivery:
+    """creates the delivery selected by the video_delivery option of config
+
+    Raises:
+        ConfigError: raised when the options of the delivery mode are missing or invalid
+    """
+    mode = read_config_option(config, "video_delivery", str, "broadcast")
+
+    if mode == "broadcast":
+        broadcast_ip = read_config_option(config, "broadcast_ip", str)
+        if broadcast_ip is None:
+            raise ConfigError("broadcast delivery needs a broadcast_ip")
+        return BroadcastDelivery(broadcast_ip)
+
+    if mode == "multicast":
+        group = read_config_option(config, "multicast_group", str)
+        if group is None:
+            raise ConfigError("multicast delivery needs a multicast_group")
+        return MulticastDelivery(
+            group,
+            read_config_option(config, "multicast_ttl", int, 1),
+            read_config_option(config, "multicast_interface", str),
+        )
+
+    if mode == "unicast":
+        players = read_video_players(config)
+        if not players:
+            raise ConfigError(
+                f"unicast delivery needs video_players or systems running {video_service_name}"
+            )
+        return UnicastDelivery(players)
+
+    raise ConfigError(f"invalid video_delivery {mode}")
@@ -0,0 +1,294 @@
+"""One scheduler driving the engines of all zones of an installation.
+
+Every zone has its own reaper, video players, tracks and schedule. The zones share the scheduler thread,
+the clock watchdog, the failover and the web frontend of a single showcontrol process.
+
+config example:
+
+    broadcast_ip: 192.168.1.255
+    zones:
+      - name: hall
+        reaper_hostname: 192.168.1.10
+      - name: foyer
+        reaper_hostname: 192.168.2.10
+        broadcast_ip: 192.168.2.255
+        tracks: tracks_foyer
+        schedule: schedule_foyer.yml
+"""
+
+from pathlib import Path
+import logging
+import os
+import time
+
+import apscheduler
+from apscheduler.schedulers import (
+    SchedulerAlreadyRunningError,
+    SchedulerNotRunningError,
+)
+from apscheduler.schedulers.background import BackgroundScheduler
+
+from showcontrol.capture import Capture
+from showcontrol.catalog import TrackCatalog, read_catalog
+from showcontrol.clock import ClockWatchdog, SystemClock
+from showcontrol import config as showcontrol_config
+from showcontrol.config import (
+    get_config,
+    read_config_option,
+    read_systems,
+    read_zones,
+)
+from showcontrol.failover import Failover
+from showcontrol.liveness import Heartbeat, SystemdNotifier
+from showcontrol.metrics import metrics
+from showcontrol.panels import PanelMonitor, read_panel_list
+from showcontrol.schedcontrol import SchedControl
+from showcontrol.services import ServiceHealth, ServiceTransport, SSHTransport
+from showcontrol.state import StateStore
+
+log = logging.getLogger(__name__)
+
+
+class Dispatcher(object):
+    """Owns the scheduler shared by the SchedControl of every zone in the config.
+
+    Args:
+        clock (SystemClock, optional): Defaults to SystemClock().
+        config (dict, optional): contents of the config file. Defaults to get_config().
+        service_transport (ServiceTransport, optional): transport of the service health check. Defaults to
+            ssh with the service_check_command of the config.
+        state (StateStore, optional): store the state of the zones is restored from and saved to. Defaults to
+            None (not saved).
+        notifier (SystemdNotifier, optional): readiness and watchdog notifications, see showcontrol.liveness.
+            Defaults to the NOTIFY_SOCKET of systemd.
+    """
+
+    def __init__(
+        self,
+        clock: SystemClock | None = None,
+        config: dict | None = None,
+        service_transport: ServiceTransport | None = None,
+        state: StateStore | None = None,
+        notifier: SystemdNotifier | None = None,
+    ):
+        self.config = get_config() if config is None else config
+        self.clock = SystemClock() if clock is None else clock
+        self.failover: Failover | None = None
+
+        self.sched = BackgroundScheduler()
+        self.zones: dict[str, SchedControl] = {}
+        # zones with the same tracks dir share its catalog
+        self.catalogs: dict[Path, TrackCatalog] = {}
+        for zone in read_zones(self.config):
+            tracks_dir = Path(zone.tracks_dir).resolve()
+            if tracks_dir not in self.catalogs:
+                self.catalogs[tracks_dir] = read_catalog(tracks_dir)
+            self.zones[zone.name] = SchedControl(
+                clock=self.clock,
+                zone=zone,
+                scheduler=self.sched,
+                catalog=self.catalogs[tracks_dir],
+            )
+
+        self.capture = self.setup_capture()
+
+        self.state = state
+        if state is not None:
+            self.restore_state()
+
+        # setup watchdog for wall clock steps
+        self.clock_watchdog = ClockWatchdog(
+            self.rearm_jobs,
+            clock=self.clock,
+            threshold=read_config_option(
+                self.config, "clock_step_threshold", float, 2.0
+            ),
+            interval=read_config_option(
+                self.config, "clock_watchdog_interval", float, 1.0
+            ),
+        )
+        self.panel_monitor = self.setup_panel_monitor()
+        self.service_health = self.setup_service_health(service_transport)
+        # the scheduler runs in real time, so the heartbeat uses the system clock even in simulations
+        self.heartbeat = Heartbeat(
+            self.sched,
+            notifier=notifier,
+            interval=read_config_option(self.config, "heartbeat_interval", float),
+            max_lateness=read_config_option(
+                self.config, "heartbeat_max_lateness", float, 1.0
+            ),
+        )
+
+    def setup_panel_monitor(self) -> PanelMonitor | None:
+        """creates the monitor of the loudspeaker panels if the config has a panel list, see showcontrol.panels"""
+        panel_list = read_config_option(self.config, "panel_list", str, None)
+        if panel_list is None:
+            return None
+        if showcontrol_config.config_paths is not None:
+            panel_list = (
+                showcontrol_config.config_paths.config_file_path.parent / panel_list
+            )
+        listen_ip = read_config_option(self.config, "listen_ip", str, "0.0.0.0")
+        return PanelMonitor(
+            read_panel_list(panel_list),
+            probes=read_config_option(self.config, "panel_probes", list, ["udp:9"]),
+            interval=read_config_option(self.config, "panel_interval", float, 10),
+            timeout=read_config_option(self.config, "panel_timeout", float, 1.0),
+            down_after=read_config_option(self.config, "panel_down_after", int, 1),
+            osc_address=(
+                listen_ip,
+                read_config_option(self.config, "panel_osc_port", int, 41234),
+            ),
+            osc_reply_port=read_config_option(
+                self.config, "panel_osc_reply_port", int, 41231
+            ),
+            clock=self.clock,
+        )
+
+    def setup_capture(self) -> Capture | None:
+        """captures the cue traffic of all zones if the config has a capture dir, see showcontrol.capture"""
+        capture_dir = read_config_option(self.config, "capture_dir", str, None)
+        if capture_dir is None:
+            return None
+        if showcontrol_config.config_paths is not None:
+            capture_dir = (
+                showcontrol_config.config_paths.config_file_path.parent / capture_dir
+            )
+        # a new file for every start
+        path = (
+            Path(capture_dir)
+            / f"showcontrol_{time.strftime('%Y%m%d-%H%M%S')}_{os.getpid()}.sccap"
+        )
+        capture = Capture(
+            path,
+            flush_interval=read_config_option(
+                self.config, "capture_flush_interval", float, 0.5
+            ),
+        )
+        for zone in self.zones.values():
+            capture.attach(zone)
+        return capture
+
+    def setup_service_health(
+        self, transport: ServiceTransport | None = None
+    ) -> ServiceHealth | None:
+        """creates the health check of the services in the system section, see showcontrol.services"""
+        systems = read_systems(self.config)
+        if not any(system.services for system in systems):
+            return None
+        if transport is None:
+            transport = SSHTransport(
+                read_config_option(
+                    self.config,
+                    "service_check_command",
+                    str,
+                    "systemctl --user is-active",
+                )
+            )
+        return ServiceHealth(
+            systems,
+            transport,
+            ttl=read_config_option(self.config, "service_check_ttl", float, 30),
+            timeout=read_config_option(self.config, "service_check_timeout", float, 5),
+            clock=self.clock,
+        )
+
+    def restore_state(self):
+        """attaches the StateStore to all zones and restores their state, in a single read of the store"""
+        t_start = time.perf_counter()
+        saved = self.state.load()
+        queue_grace = read_config_option(self.config, "state_queue_grace", float, 60)
+        for name, zone in self.zones.items():
+            zone.state = self.state
+            if name in saved:
+                zone.restore_state(saved[name], queue_grace)
+        t_elapsed = time.perf_counter() - t_start
+
+        metrics.set("state_restore_seconds", t_elapsed)
+        budget = read_config_option(self.config, "state_restore_budget", float, 0.5)
+        if t_elapsed > budget:
+            log.warning(
+                f"restoring the state took {t_elapsed:.3f}s, more than the budget of {budget}s"
+            )
+        else:
+            log.info(f"restored the state of {len(saved)} zones in {t_elapsed:.3f}s")
+
+    @property
+    def default_zone(self) -> SchedControl:
+        """the first zone of the config, used by the routes that don't name a zone"""
+        return next(iter(self.zones.values()))
+
+    def start(self):
+        try:
+            self.sched.start()
+        except SchedulerAlreadyRunningError:
+            pass
+        for zone in self.zones.values():
+            zone.start_scheduler()
+        self.clock_watchdog.start()
+        if self.failover is not None:
+            self.failover.start()
+        if self.panel_monitor is not None:
+            self.panel_monitor.start()
+        if self.state is not None:
+            self.state.start()
+        if self.capture is not None:
+            self.capture.start()
+        # the jobs of all zones are armed
+        self.heartbeat.start(status=f"{len(self.zones)} zones running")
+
+    def stop(self):
+        self.heartbeat.stop()
+        self.clock_watchdog.stop()
+        if self.failover is not None:
+            self.failover.stop()
+        if self.panel_monitor is not None:
+            self.panel_monitor.stop()
+        try:
+            self.sched.shutdown(wait=False)
+        except SchedulerNotRunningError:
+            pass
+        for zone in self.zones.values():
+            zone.stop_scheduler()
+        if self.state is not None:
+            self.state.close()
+        if self.capture is not None:
+            self.capture.close()
+
+    def is_running(self) -> bool:
+        return self.sched.state == apscheduler.schedulers.base.STATE_RUNNING
+
+    def rearm_jobs(self, step: float, event: dict | None = None):
+        """re-arms the jobs of all zones after the wall clock was stepped, see SchedControl.rearm_jobs"""
+        for zone in self.zones.values():
+            zone.rearm_jobs(step, event)
+
+    def attach_failover(self, failover: Failover):
+        """Runs this instance as one half of an active/standby pair. The standby mirrors the pause
+        state of every zone of the active instance and catches up on missed cues when it takes over
+        """
+        self.failover = failover
+        for zone in self.zones.values():
+            zone.failover = failover
+        failover.get_state = lambda: {
+            "paused": {name: zone.paused for name, zone in self.zones.items()}
+        }
+        failover.on_peer_state = self._mirror_peer_state
+        failover.on_takeover = self._take_over
+
+    def _mirror_peer_state(self, state: dict):
+        if self.sched.state == apscheduler.schedulers.base.STATE_STOPPED:
+            return
+        for name, paused in state.get("paused", {}).items():
+            zone = self.zones.get(name)
+            if zone is None or zone.paused == paused:
+                continue
+            log.info(
+                f"failover: active peer {'paused' if paused else 'resumed'} zone {name}"
+            )
+            zone.paused = paused
+
+    def _take_over(self, zone: str, track_id: str):
+        schedctrl = self.zones.get(zone)
+        if schedctrl is not None and schedctrl.is_running():
+            schedctrl.play_track(track_id, pause_scheduler=False)
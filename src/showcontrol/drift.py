@@ -0,0 +1,200 @@
+"""Correction of the drift between reaper and the video players during playback.
+
+After every poll of the SyncPoller the offset of the video players to reaper is checked. Small drift is
+corrected by running the players slightly faster or slower for a while, which is not visible. Only drift
+that would take too long to catch up on is corrected with an absolute seek. A player is corrected at most
+once per min_interval and a correction needs confirm consecutive polls over the threshold, so a single bad
+measurement never moves the video.
+
+With unicast delivery every player is corrected on its own, with broadcast and multicast all players are
+corrected together by the median of their offsets.
+
+config example (needs sync_poll_interval and reaper_feedback_port):
+
+    drift_correction: true
+    # seconds of drift that are tolerated
+    drift_threshold: 0.04
+    # drift above this is corrected with a seek
+    drift_seek_threshold: 1.0
+    # maximum deviation of the playback speed from 1
+    drift_max_speed_change: 0.02
+    drift_min_interval: 10
+    drift_seek_min_interval: 60
+"""
+
+from collections import deque
+from collections.abc import Callable
+from dataclasses import dataclass
+import logging
+import math
+import statistics
+
+from showcontrol.clock import SystemClock
+from showcontrol.metrics import metrics
+from showcontrol.syncmonitor import ReaperFeedback, SyncSample
+
+log = logging.getLogger(__name__)
+
+
+@dataclass
+class DriftState:
+    # consecutive polls over the threshold
+    n_over: int = 0
+    last_correction: float = -math.inf
+    last_seek: float = -math.inf
+    # monotonic time a speed correction ends at, None if the player runs at normal speed
+    speed_until: float | None = None
+
+
+class DriftCorrector(object):
+    """Corrects the drift of the video players to reaper, fed with the samples of a SyncPoller
+
+    Args:
+        send (Callable[[dict, list[str] | None], None]): sends a command to the players, the second argument
+            are the names of the players to send to, None for all players
+        reaper_feedback (ReaperFeedback): source of the position a seek goes to
+        targeted (bool): the players can be corrected one by one
+        name (str, optional): name of the zone, used in logs and metrics. Defaults to "default".
+        poll_interval (float, optional): seconds between two samples. Defaults to 1.0.
+        threshold (float, optional): Defaults to 0.04.
+        seek_threshold (float, optional): Defaults to 1.0.
+        max_speed_change (float, optional): Defaults to 0.02.
+        min_interval (float, optional): Defaults to 10.
+        seek_min_interval (float, optional): Defaults to 60.
+        confirm (int, optional): Defaults to 2.
+        clock (SystemClock, optional): Defaults to SystemClock().
+    """
+
+    def __init__(
+        self,
+        send: Callable[[dict, list[str] | None], None],
+        reaper_feedback: ReaperFeedback,
+        targeted: bool,
+        name: str = "default",
+        poll_interval: float = 1.0,
+        threshold: float = 0.04,
+        seek_threshold: float = 1.0,
+        max_speed_change: float = 0.02,
+        min_interval: float = 10,
+        seek_min_interval: float = 60,
+        confirm: int = 2,
+        clock: SystemClock | None = None,
+    ):
+        self.send = send
+        self.reaper_feedback = reaper_feedback
+        self.targeted = targeted
+        self.name = name
+        self.poll_interval = poll_interval
+        self.threshold = threshold
+        self.seek_threshold = seek_threshold
+        self.max_speed_change = max_speed_change
+        self.min_interval = min_interval
+        self.seek_min_interval = seek_min_interval
+        self.confirm = confirm
+        self.clock = SystemClock() if clock is None else clock
+
+        # player name: state, the key is None if all players are corrected together
+        self.states: dict[str | None, DriftState] = {}
+        self.corrections = deque(maxlen=100)
+        self.playlist_pos: int | None = None
+
+    def update(self, sample: SyncSample):
+        """checks the offsets of a sample and starts or ends corrections"""
+        now = self.clock.monotonic()
+        # mpv keeps the speed when the next video starts
+        self._restore_speeds(now, force=sample.playlist_pos != self.playlist_pos)
+        self.playlist_pos = sample.playlist_pos
+
+        if self.targeted:
+            drifts = dict(sample.reaper_offsets)
+        elif sample.reaper_offsets:
+            drifts = {None: statistics.median(sample.reaper_offsets.values())}
+        else:
+            drifts = {}
+
+        for key, state in self.states.items():
+            if key not in drifts:
+                state.n_over = 0
+
+        for key, drift in drifts.items():
+            metrics.set("drift_seconds", drift, zone=self.name, player=key or "all")
+            state = self.states.setdefault(key, DriftState())
+            if abs(drift) <= self.threshold:
+                state.n_over = 0
+                continue
+            state.n_over += 1
+            if (
+                state.n_over < self.confirm
+                or state.speed_until is not None
+                or now - state.last_correction < self.min_interval
+            ):
+                continue
+
+            if abs(drift) > self.seek_threshold:
+                if now - state.last_seek < self.seek_min_interval:
+                    continue
+                self._seek(key, drift)
+                state.last_seek = now
+            else:
+                state.speed_until = now + self._adjust_speed(key, drift)
+            state.last_correction = now
+            state.n_over = 0
+
+    def _targets(self, key: str | None) -> list[str] | None:
+        return None if key is None else [key]
+
+    def _record(self, key: str | None, kind: str, drift: float, **details):
+        correction = {
+            "time": self.clock.now().isoformat(),
+            "zone": self.name,
+            "player": key,
+            "kind": kind,
+            "drift": drift,
+        } | details
+        self.corrections.append(correction)
+        metrics.increment("drift_corrections", zone=self.name, kind=kind)
+        log.info(
+            f"zone {self.name}: {kind} correction of {key or 'all players'}, drift {drift * 1000:+.0f} ms {details}"
+        )
+
+    def _seek(self, key: str | None, drift: float):
+        position = self.reaper_feedback.position()
+        if position is None:
+            return
+        self.send({"command": ["seek", position, "absolute"]}, self._targets(key))
+        self._record(key, "seek", drift, position=position)
+
+    def _adjust_speed(self, key: str | None, drift: float) -> float:
+        """changes the speed so the drift is gone after a whole number of polls
+
+        Returns:
+            float: seconds until the speed has to be reset
+        """
+        n_polls = math.ceil(abs(drift) / (self.max_speed_change * self.poll_interval))
+        duration = n_polls * self.poll_interval
+        # a positive drift means the video is ahead of reaper
+        speed = 1 - drift / duration
+        self.send({"command": ["set_property", "speed", speed]}, self._targets(key))
+        metrics.set("drift_speed", speed, zone=self.name, player=key or "all")
+        self._record(key, "speed", drift, speed=speed, duration=duration)
+        return duration
+
+    def _restore_speeds(self, now: float, force: bool = False):
+        for key, state in self.states.items():
+            if state.speed_until is None or (now < state.speed_until and not force):
+                continue
+            self.send({"command": ["set_property", "speed", 1.0]}, self._targets(key))
+            metrics.set("drift_speed", 1.0, zone=self.name, player=key or "all")
+            state.speed_until = None
+
+    def status(self) -> dict:
+        return {
+            "enabled": True,
+            "targeted": self.targeted,
+            "active": [
+                key or "all"
+                for key, state in self.states.items()
+                if state.speed_until is not None
+            ],
+            "corrections": list(self.corrections),
+        }
@@ -0,0 +1,818 @@
+"""Local stand-ins for REAPER, the mpv syncplayers, the hosts and the JACK servers of the installation.
+
+The emulators listen on udp sockets on the local machine and record every datagram with a nanosecond
+timestamp (time.time_ns(), so timestamps of different emulators and processes on one machine can be
+compared). Packet loss, delay and reordering of the network can be emulated with a LinkImpairment.
+
+Loopback addresses can be used to emulate a whole venue network on one linux box: every syncplayer
+gets its own address out of 127.0.0.0/8, broadcasts to 127.255.255.255 reach all of them.
+"""
+
+from collections.abc import Iterable
+from dataclasses import dataclass
+from pathlib import Path
+from threading import Condition, Event, Lock, Thread
+import asyncio
+import heapq
+import json
+import logging
+import random
+import selectors
+import shutil
+import socket
+import struct
+import time
+
+import yaml
+
+from pythonosc.osc_message_builder import OscMessageBuilder
+from pythonosc.osc_packet import OscPacket, ParseError
+
+from showcontrol.config import config_file_filename, read_config_file
+from showcontrol.delivery import video_service_name
+from showcontrol.reaperosc import (
+    PatternConfig,
+    read_pattern_config,
+    trimmed_pattern_config,
+)
+from showcontrol.routing import RoutingGraph, port_name
+from showcontrol.services import ServiceTransport, TransportError
+
+log = logging.getLogger(__name__)
+
+# feedback reaper sends while the transport is running
+continuous_feedback_actions = [
+    "TIME",
+    "BEAT",
+    "SAMPLES",
+    "FRAMES",
+    "TRACK_VU",
+    "TRACK_VU_L",
+    "TRACK_VU_R",
+    "MASTER_VU",
+    "MASTER_VU_L",
+    "MASTER_VU_R",
+]
+
+# feedback that only changes when showcontrol sends something
+transport_feedback_actions = ["PLAY", "STOP", "PAUSE", "RECORD"]
+region_feedback_actions = [
+    "LAST_REGION_NAME",
+    "LAST_REGION_NUMBER",
+    "LAST_REGION_TIME",
+    "LAST_REGION_LENGTH",
+]
+
+# patterns of the reaper feedback showcontrol uses, used if the fake reaper is started without a pattern config
+default_patterns = trimmed_pattern_config()
+
+# device settings that define how many targets a wildcard in a pattern expands to
+wildcard_counts = {
+    "track": "DEVICE_TRACK_COUNT",
+    "send": "DEVICE_SEND_COUNT",
+    "recv": "DEVICE_RECEIVE_COUNT",
+    "fx": "DEVICE_FX_COUNT",
+    "fxparam": "DEVICE_FX_PARAM_COUNT",
+    "fxinstparam": "DEVICE_FX_INST_PARAM_COUNT",
+    "marker": "DEVICE_MARKER_COUNT",
+    "region": "DEVICE_REGION_COUNT",
+}
+
+
+@dataclass
+class LinkImpairment:
+    """Network conditions between showcontrol and an emulated device
+
+    Args:
+        delay (float): fixed delay in seconds
+        jitter (float): additional uniformly distributed delay in seconds
+        loss (float): probability that a datagram is lost
+        reorder (float): probability that a datagram is held back and delivered after the next one
+        seed (int, optional): seed for the random decisions, for reproducible runs
+    """
+
+    delay: float = 0.0
+    jitter: float = 0.0
+    loss: float = 0.0
+    reorder: float = 0.0
+    seed: int | None = None
+
+    def is_perfect(self) -> bool:
+        return not (self.delay or self.jitter or self.loss or self.reorder)
+
+
+@dataclass
+class Datagram:
+    timestamp_ns: int
+    sender: tuple[str, int]
+    port: int
+    data: bytes
+
+
+class UDPEmulator(object):
+    """Base class for all emulated devices: receives datagrams on one or more sockets,
+    applies the link impairment and hands them to self.handle() in a background thread.
+
+    Args:
+        name (str): name of the emulated device, used for the thread name
+        addresses (Iterable[tuple[str, int]]): addresses the emulator listens on
+        impairment (LinkImpairment, optional): network conditions. Defaults to a perfect network.
+    """
+
+    # maximum time a datagram is held back for reordering when no other datagram follows
+    max_hold = 0.05
+
+    def __init__(
+        self,
+        name: str,
+        addresses: Iterable[tuple[str, int]],
+        impairment: LinkImpairment | None = None,
+    ):
+        self.name = name
+        self.impairment = LinkImpairment() if impairment is None else impairment
+        self.received: list[Datagram] = []
+        self.n_dropped = 0
+        self.n_reordered = 0
+
+        self._rng = random.Random(self.impairment.seed)
+        self._pending = []
+        self._held = None
+        self._seq = 0
+        self._received_cond = Condition()
+        self._stop = Event()
+        self._thread: Thread | None = None
+
+        self._selector = selectors.DefaultSelector()
+        self.sockets = []
+        for address in addresses:
+            sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+            sock.bind(address)
+            sock.setblocking(False)
+            self._selector.register(sock, selectors.EVENT_READ)
+            self.sockets.append(sock)
+
+    def start(self):
+        if self._thread is not None:
+            return self
+        self._stop.clear()
+        self._thread = Thread(target=self._run, name=self.name, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def close(self):
+        self.stop()
+        for sock in self.sockets:
+            self._selector.unregister(sock)
+            sock.close()
+        self.sockets = []
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def handle(self, datagram: Datagram):
+        """called for every delivered datagram, override in subclasses"""
+        pass
+
+    def wait_for(self, n_datagrams: int, timeout: float = 1.0) -> bool:
+        """waits until at least n_datagrams were delivered, returns False on timeout"""
+        with self._received_cond:
+            return self._received_cond.wait_for(
+                lambda: len(self.received) >= n_datagrams, timeout
+            )
+
+    def clear(self):
+        with self._received_cond:
+            self.received.clear()
+        self.n_dropped = 0
+        self.n_reordered = 0
+
+    def _run(self):
+        while not self._stop.is_set():
+            timeout = 0.05
+            if self._pending:
+                timeout = max(0.0, min(timeout, self._pending[0][0] - time.monotonic()))
+
+            for key, _ in self._selector.select(timeout):
+                sock = key.fileobj
+                try:
+                    data, sender = sock.recvfrom(65536)
+                except (BlockingIOError, OSError):
+                    continue
+                datagram = Datagram(time.time_ns(), sender, sock.getsockname()[1], data)
+                self._impair(datagram)
+
+            self._release_pending()
+
+    def _impair(self, datagram: Datagram):
+        impairment = self.impairment
+        if impairment.is_perfect():
+            self._deliver(datagram)
+            return
+
+        if impairment.loss and self._rng.random() < impairment.loss:
+            self.n_dropped += 1
+            return
+
+        due = time.monotonic() + impairment.delay
+        if impairment.jitter:
+            due += self._rng.uniform(0, impairment.jitter)
+
+        if (
+            impairment.reorder
+            and self._held is None
+            and self._rng.random() < impairment.reorder
+        ):
+            self._held = (due, datagram)
+            self.n_reordered += 1
+            return
+
+        self._push(due, datagram)
+        if self._held is not None:
+            # the held back datagram overtakes nothing anymore, it is delivered right after this one
+            self._push(due, self._held[1])
+            self._held = None
+
+    def _push(self, due: float, datagram: Datagram):
+        self._seq += 1
+        heapq.heappush(self._pending, (due, self._seq, datagram))
+
+    def _release_pending(self):
+        now = time.monotonic()
+        if self._held is not None and self._held[0] + self.max_hold <= now:
+            self._push(self._held[0], self._held[1])
+            self._held = None
+
+        while self._pending and self._pending[0][0] <= now:
+            _, _, datagram = heapq.heappop(self._pending)
+            # the timestamp is the time the datagram arrives at the emulated device
+            datagram.timestamp_ns = time.time_ns()
+            self._deliver(datagram)
+
+    def _deliver(self, datagram: Datagram):
+        try:
+            self.handle(datagram)
+        except Exception as e:
+            log.error(f"{self.name} could not handle datagram {datagram.data!r}: {e}")
+        with self._received_cond:
+            self.received.append(datagram)
+            self._received_cond.notify_all()
+
+
+class FakeReaper(UDPEmulator):
+    """Emulates the part of REAPER's OSC control surface showcontrol talks to.
+
+    Understands /region, /stop, /play and /track/@/mute and keeps a play position, which runs at rate
+    (use rate != 1 to emulate a drifting audio clock). If feedback_address is set, feedback is sent there
+    for every action of the pattern config that has feedback patterns:
+
+    - transport, region and mute feedback whenever the state changes
+    - continuous feedback (time, beat, samples, frames, meters) every refresh_interval while playing
+    - a full refresh of all other feedback patterns when the transport starts, with the wildcards
+      expanded according to the DEVICE_*_COUNT settings
+
+    Args:
+        address (tuple[str, int], optional): address the fake reaper listens on. Defaults to ("127.0.0.1", 8000).
+        feedback_address (tuple[str, int], optional): address feedback is sent to. Defaults to None (no feedback).
+        patterns (PatternConfig | Path | str, optional): pattern config or path to a .ReaperOSC file. Defaults to the feedback showcontrol uses.
+        impairment (LinkImpairment, optional): network conditions. Defaults to a perfect network.
+        refresh_interval (float, optional): seconds between two continuous feedback updates. Defaults to 0.05.
+        rate (float, optional): speed of the play position relative to the wall clock. Defaults to 1.0.
+    """
+
+    def __init__(
+        self,
+        address: tuple[str, int] = ("127.0.0.1", 8000),
+        feedback_address: tuple[str, int] | None = None,
+        patterns: PatternConfig | Path | str | None = None,
+        impairment: LinkImpairment | None = None,
+        refresh_interval: float = 0.05,
+        rate: float = 1.0,
+    ):
+        super().__init__("FakeReaper", [address], impairment)
+        if patterns is None:
+            patterns = default_patterns
+        elif not isinstance(patterns, PatternConfig):
+            patterns = read_pattern_config(patterns)
+        self.patterns = patterns
+        self.feedback_address = feedback_address
+        self.refresh_interval = refresh_interval
+        self.rate = rate
+
+        # (timestamp_ns, address, args) of every osc message received
+        self.messages: list[tuple[int, str, list]] = []
+        self.n_feedback_sent = 0
+
+        self.region: int | None = None
+        self.playing = False
+        self.muted: dict[int, bool] = {}
+        self._position = 0.0
+        self._started_at = time.monotonic()
+
+        self._feedback_lock = Lock()
+        self._feedback_socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self._feedback_thread: Thread | None = None
+
+    def start(self):
+        super().start()
+        if self.feedback_address is not None and self._feedback_thread is None:
+            self._feedback_thread = Thread(
+                target=self._run_feedback, name="FakeReaperFeedback", daemon=True
+            )
+            self._feedback_thread.start()
+            self.send_full_refresh()
+        return self
+
+    def stop(self):
+        super().stop()
+        if self._feedback_thread is not None:
+            self._feedback_thread.join()
+            self._feedback_thread = None
+
+    def close(self):
+        super().close()
+        self._feedback_socket.close()
+
+    def position(self) -> float:
+        """current play position in seconds from the start of the current region"""
+        if not self.playing:
+            return self._position
+        return self._position + (time.monotonic() - self._started_at) * self.rate
+
+    def handle(self, datagram: Datagram):
+        try:
+            packet = OscPacket(datagram.data)
+        except ParseError:
+            log.warning(f"FakeReaper received invalid osc packet {datagram.data!r}")
+            return
+
+        for timed_message in packet.messages:
+            message = timed_message.message
+            args = list(message.params)
+            self.messages.append((datagram.timestamp_ns, message.address, args))
+            self._apply(message.address, args)
+
+    def _apply(self, address: str, args: list):
+        value = args[0] if args else 1
+        parts = address.strip("/").split("/")
+
+        if address == "/region":
+            self.region = int(value)
+            self._position = 0.0
+            self._started_at = time.monotonic()
+            self._send_feedback(region_feedback_actions)
+        elif address == "/stop" and value:
+            self.playing = False
+            self._position = 0.0
+            self._send_feedback(transport_feedback_actions)
+        elif address == "/play" and value:
+            if not self.playing:
+                self._started_at = time.monotonic()
+            self.playing = True
+            self._send_feedback(transport_feedback_actions)
+            self.send_full_refresh()
+        elif len(parts) == 3 and parts[0] == "track" and parts[2] == "mute":
+            track = int(parts[1])
+            self.muted[track] = bool(value)
+            self._send_feedback(["TRACK_MUTE"], track=track)
+
+    def _feedback_value(self, action: str, flag: str, track: int | None = None):
+        position = self.position()
+        values = {
+            "PLAY": int(self.playing),
+            "STOP": int(not self.playing),
+            "PAUSE": 0,
+            "RECORD": 0,
+            "TIME": position,
+            "SAMPLES": position * 48000,
+            "LAST_REGION_NUMBER": self.region or 0,
+            "LAST_REGION_NAME": f"region {self.region}",
+            "LAST_REGION_TIME": 0.0,
+            "LAST_REGION_LENGTH": 0.0,
+            "TRACK_MUTE": int(self.muted.get(track, False)),
+        }
+        value = values.get(action, 0)
+        if flag == "s":
+            if action == "TIME":
+                return f"{int(position // 60)}:{position % 60:06.3f}"
+            return str(value)
+        if flag in "nf":
+            return float(value)
+        return int(value)
+
+    def _expand(self, address: str, track: int | None = None) -> list[str]:
+        """replaces the wildcards of a pattern with all targets the device displays"""
+        if "@" not in address:
+            return [address]
+        parts = address.strip("/").split("/")
+        expanded = [""]
+        for i, part in enumerate(parts):
+            if part != "@":
+                expanded = [e + "/" + part for e in expanded]
+                continue
+            kind = parts[i - 1] if i > 0 else ""
+            if kind == "track" and track is not None:
+                targets = [track]
+            else:
+                count = self.patterns.get_int(wildcard_counts.get(kind, ""), 0)
+                targets = range(1, count + 1)
+            expanded = [f"{e}/{t}" for e in expanded for t in targets]
+        return expanded
+
+    def _build_feedback(self, actions: Iterable[str], track: int | None = None):
+        messages = []
+        for action in actions:
+            for pattern in self.patterns.actions.get(action, []):
+                flag, address = pattern[0], pattern[1:]
+                if flag not in "nfbts":
+                    continue
+                for expanded in self._expand(address, track):
+                    builder = OscMessageBuilder(expanded)
+                    builder.add_arg(self._feedback_value(action, flag, track))
+                    messages.append(builder.build().dgram)
+        return messages
+
+    def _send_feedback(self, actions: Iterable[str], track: int | None = None):
+        if self.feedback_address is None:
+            return
+        with self._feedback_lock:
+            for dgram in self._build_feedback(actions, track):
+                try:
+                    self._feedback_socket.sendto(dgram, self.feedback_address)
+                except OSError:
+                    return
+                self.n_feedback_sent += 1
+
+    def send_full_refresh(self):
+        """sends feedback for every action that is not sent continuously"""
+        actions = [
+            a for a in self.patterns.actions if a not in continuous_feedback_actions
+        ]
+        self._send_feedback(actions)
+
+    def _run_feedback(self):
+        while not self._stop.wait(self.refresh_interval):
+            if self.playing:
+                self._send_feedback(continuous_feedback_actions)
+
+
+class FakeSyncplayer(UDPEmulator):
+    """Emulates a syncplayer: an mpv instance whose JSON IPC is relayed to the video and info ports.
+
+    Understands playlist-play-index, set_property (pause, speed), seek and get_property. Replies to
+    get_property are sent back to the sender, like the relay on the info port does. Like the real players
+    a video starts paused on its first frame.
+
+    Args:
+        name (str): name of the player
+        address (str, optional): address the player listens on for unicast messages. Defaults to "127.0.0.1".
+        video_port (int, optional): Defaults to 12339.
+        info_port (int, optional): Defaults to 12340.
+        impairment (LinkImpairment, optional): network conditions. Defaults to a perfect network.
+        rate (float, optional): speed of the playback relative to the wall clock. Defaults to 1.0.
+        listen_broadcast (bool, optional): also listen on the wildcard address to receive broadcasts. Defaults to True.
+        multicast_group (str, optional): multicast group to join on the wildcard address. Defaults to None.
+        multicast_interface (str, optional): address of the interface to join the group on. Defaults to "127.0.0.1".
+    """
+
+    def __init__(
+        self,
+        name: str,
+        address: str = "127.0.0.1",
+        video_port: int = 12339,
+        info_port: int = 12340,
+        impairment: LinkImpairment | None = None,
+        rate: float = 1.0,
+        listen_broadcast: bool = True,
+        multicast_group: str | None = None,
+        multicast_interface: str = "127.0.0.1",
+    ):
+        addresses = [(address, video_port), (address, info_port)]
+        if listen_broadcast or multicast_group:
+            addresses += [("0.0.0.0", video_port), ("0.0.0.0", info_port)]
+        super().__init__(name, addresses, impairment)
+        self.address = address
+        self.video_port = video_port
+        self.info_port = info_port
+        self.rate = rate
+
+        if multicast_group is not None:
+            membership = struct.pack(
+                "4s4s",
+                socket.inet_aton(multicast_group),
+                socket.inet_aton(multicast_interface),
+            )
+            for sock in self.sockets[2:]:
+                sock.setsockopt(socket.IPPROTO_IP, socket.IP_ADD_MEMBERSHIP, membership)
+
+        self._reply_socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self._reply_socket.bind((address, 0))
+
+        # (timestamp_ns, port, command) of every command received
+        self.commands: list[tuple[int, int, list]] = []
+        self.playlist_pos = -1
+        self.paused = True
+        self.speed = 1.0
+        self._time_pos = 0.0
+        self._anchor = time.monotonic()
+
+    def close(self):
+        super().close()
+        self._reply_socket.close()
+
+    def clear(self):
+        super().clear()
+        self.commands.clear()
+
+    def time_pos(self) -> float:
+        if self.paused:
+            return self._time_pos
+        return (
+            self._time_pos + (time.monotonic() - self._anchor) * self.speed * self.rate
+        )
+
+    def _set_time_pos(self, time_pos: float):
+        self._time_pos = time_pos
+        self._anchor = time.monotonic()
+
+    def handle(self, datagram: Datagram):
+        for line in datagram.data.splitlines():
+            if not line.strip():
+                continue
+            request = json.loads(line)
+            command = request.get("command", [])
+            self.commands.append((datagram.timestamp_ns, datagram.port, command))
+            reply = self._execute(command)
+            if "request_id" in request:
+                reply["request_id"] = request["request_id"]
+                self._reply_socket.sendto(
+                    json.dumps(reply).encode("utf-8") + b"\n", datagram.sender
+                )
+
+    def _execute(self, command: list) -> dict:
+        if not command:
+            return {"error": "invalid parameter"}
+        name, args = command[0], command[1:]
+
+        if name == "playlist-play-index":
+            self.playlist_pos = int(args[0])
+            self._set_time_pos(0.0)
+        elif name == "set_property" and args[0] == "pause":
+            self._set_time_pos(self.time_pos())
+            self.paused = args[1] in ("yes", True)
+        elif name == "set_property" and args[0] == "speed":
+            self._set_time_pos(self.time_pos())
+            self.speed = float(args[1])
+        elif name == "seek":
+            mode = args[1] if len(args) > 1 else "relative"
+            offset = float(args[0])
+            self._set_time_pos(
+                offset if mode.startswith("absolute") else self.time_pos() + offset
+            )
+        elif name == "get_property":
+            properties = {
+                "time-pos": self.time_pos,
+                "playlist-pos": lambda: self.playlist_pos,
+                "pause": lambda: self.paused,
+                "speed": lambda: self.speed,
+            }
+            if args[0] not in properties:
+                return {"error": "property not found"}
+            return {"data": properties[args[0]](), "error": "success"}
+        else:
+            return {"error": "invalid parameter"}
+        return {"error": "success"}
+
+
+def syncplayer_fleet(
+    n_players: int = 8,
+    video_port: int = 12339,
+    info_port: int = 12340,
+    first_address: int = 11,
+    **kwargs,
+) -> list[FakeSyncplayer]:
+    """creates n_players fake syncplayers on the loopback addresses 127.0.0.11, 127.0.0.12, ...
+
+    keyword arguments are passed to all FakeSyncplayer instances
+    """
+    return [
+        FakeSyncplayer(
+            f"syncplayer-{i + 1:02}",
+            f"127.0.0.{first_address + i}",
+            video_port,
+            info_port,
+            **kwargs,
+        )
+        for i in range(n_players)
+    ]
+
+
+def receive_skew_ns(
+    players: Iterable[FakeSyncplayer], index: int, port: int | None = None
+) -> int | None:
+    """Returns the spread of the receive timestamps of the index-th command over all players in ns
+
+    Args:
+        players (Iterable[FakeSyncplayer]): players to compare
+        index (int): index of the command, counted per player
+        port (int, optional): only count commands received on this port. Defaults to None (all ports).
+
+    Returns:
+        int | None: difference between the latest and earliest receive timestamp, None if a player is missing the command
+    """
+    timestamps = []
+    for player in players:
+        commands = [c for c in player.commands if port is None or c[1] == port]
+        if len(commands) <= index:
+            return None
+        timestamps.append(commands[index][0])
+    return max(timestamps) - min(timestamps)
+
+
+class FakeServiceTransport(ServiceTransport):
+    """Answers service checks without contacting the hosts
+
+    Args:
+        states (dict[str, dict[str, str]], optional): host name: service: state, services that are not
+            listed are active. Defaults to None.
+        latency (float, optional): seconds a check takes. Defaults to 0.0.
+        unreachable (Iterable[str], optional): hosts that fail with a TransportError. Defaults to ().
+        hanging (Iterable[str], optional): hosts that never answer. Defaults to ().
+    """
+
+    def __init__(
+        self,
+        states: dict[str, dict[str, str]] | None = None,
+        latency: float = 0.0,
+        unreachable: Iterable[str] = (),
+        hanging: Iterable[str] = (),
+    ):
+        self.states = states or {}
+        self.latency = latency
+        self.unreachable = set(unreachable)
+        self.hanging = set(hanging)
+        self.n_checks = 0
+
+    async def check(self, system, services, timeout):
+        self.n_checks += 1
+        if system.name in self.hanging:
+            await asyncio.Event().wait()
+        await asyncio.sleep(self.latency)
+        if system.name in self.unreachable:
+            raise TransportError(f"connection to {system.ip} refused")
+        states = self.states.get(system.name, {})
+        return {service: states.get(service, "active") for service in services}
+
+
+class FakeNotifySocket(object):
+    """Stands in for the notify socket of systemd, records the messages of a SystemdNotifier
+
+    Args:
+        path (Path | str): path the unix datagram socket is bound to, pass it as address of the notifier
+    """
+
+    def __init__(self, path: Path | str):
+        self.path = str(path)
+        # (time.monotonic(), fields) of every message
+        self.messages: list[tuple[float, dict[str, str]]] = []
+        self._received_cond = Condition()
+        self._stop = Event()
+        self._thread: Thread | None = None
+        self.socket = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        self.socket.bind(self.path)
+        self.socket.settimeout(0.05)
+
+    def start(self):
+        if self._thread is not None:
+            return self
+        self._stop.clear()
+        self._thread = Thread(target=self._run, name="FakeNotifySocket", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def close(self):
+        self.stop()
+        self.socket.close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def times(self, field: str) -> list[float]:
+        """times of the messages that contain field, like WATCHDOG=1"""
+        key, _, value = field.partition("=")
+        with self._received_cond:
+            return [t for t, fields in self.messages if fields.get(key) == value]
+
+    def wait_for(self, field: str, n: int = 1, timeout: float = 1.0) -> bool:
+        """waits until n messages contained field, returns False on timeout"""
+        with self._received_cond:
+            return self._received_cond.wait_for(
+                lambda: len(self.times(field)) >= n, timeout
+            )
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                data = self.socket.recv(4096)
+            except (TimeoutError, OSError):
+                continue
+            fields = dict(
+                line.partition("=")[::2] for line in data.decode().splitlines()
+            )
+            with self._received_cond:
+                self.messages.append((time.monotonic(), fields))
+                self._received_cond.notify_all()
+
+
+def fake_jack_lsp(graph: RoutingGraph, properties: bool = True) -> list[str]:
+    """output of jack_lsp -c (-p) of a JACK server running the connections of a directed graph"""
+    connected: dict[str, list[str]] = {}
+    outputs = set()
+    for client, ports in graph.clients.items():
+        for port, destinations in ports.items():
+            source = port_name(client, port)
+            connected.setdefault(source, [])
+            if destinations:
+                outputs.add(source)
+            for destination in sorted(destinations):
+                connected[source].append(destination)
+                connected.setdefault(destination, []).append(source)
+
+    lines = []
+    for port, peers in connected.items():
+        lines.append(port)
+        lines += [f"   {peer}" for peer in peers]
+        if properties:
+            direction = "output" if port in outputs else "input"
+            lines.append(f"\tproperties: {direction},")
+    return lines
+
+
+def free_port() -> int:
+    """returns a udp port on the loopback interface that is currently unused"""
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def emulator_config(
+    config_dir: Path,
+    target_dir: Path,
+    reaper: FakeReaper,
+    players: list[FakeSyncplayer],
+) -> Path:
+    """Copies a config dir and points the copy at the emulators instead of the venue. The video player hosts
+    of the system section are replaced by the addresses of the player emulators in order
+
+    Args:
+        config_dir (Path): config dir to copy, tracks and schedules are used unchanged
+        target_dir (Path): where the copy is created
+        reaper (FakeReaper): reaper emulator
+        players (list[FakeSyncplayer]): syncplayer emulators, all have to use the same ports
+
+    Returns:
+        Path: the target dir
+    """
+    shutil.copytree(config_dir, target_dir, dirs_exist_ok=True)
+
+    config_file = target_dir / config_file_filename
+    config = read_config_file(config_file)
+    reaper_address = reaper.sockets[0].getsockname()
+    config.update(
+        reaper_hostname=reaper_address[0],
+        reaper_port=reaper_address[1],
+        broadcast_ip="127.255.255.255",
+        video_port=players[0].video_port,
+        info_port=players[0].info_port,
+    )
+    # the loudspeaker panels are not emulated
+    config.pop("panel_list", None)
+    # unicast delivery sends to the video player hosts of the system section
+    video_systems = [
+        system
+        for system in config.get("system") or []
+        if video_service_name in (system.get("services") or [])
+    ]
+    for system, player in zip(video_systems, players):
+        system["ip"] = player.address
+    with open(config_file, "w") as f:
+        yaml.safe_dump(config, f, sort_keys=False)
+    return target_dir
@@ -0,0 +1,382 @@
+"""Exports of a generated schedule.
+
+The schedule generator builds the timeline of a schedule once in memory and streams it through every
+writer in a single pass, no written file is read again:
+
+- yaml: schedule.yml as read by showcontrol
+- full: readable list of every entry (*_full_schedule.txt)
+- tracks: readable play times of every track (*_track_schedule.txt)
+- json: every entry with its track
+- ics: iCalendar for the front desk, weekly entries repeat every week
+- html: printable programme, one table per day
+
+    showcontrol_schedule_generator -r readable/ -e full -e ics -e html
+"""
+
+from abc import ABC, abstractmethod
+from collections.abc import Iterable
+from contextlib import ExitStack
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta, timezone
+from html import escape
+from pathlib import Path
+from typing import TextIO
+import json
+import logging
+
+from showcontrol.catalog import TrackCatalog
+from showcontrol.season import ScheduledPlay, weekday_names
+
+log = logging.getLogger(__name__)
+
+day_names = ["Mo", "Di", "Mi", "Do", "Fr", "Sa", "So"]
+
+# writer name: file name after hufoprogram_<date>_
+export_filenames = {
+    "full": "full_schedule.txt",
+    "tracks": "track_schedule.txt",
+    "json": "schedule.json",
+    "ics": "schedule.ics",
+    "html": "schedule.html",
+}
+
+
+@dataclass(frozen=True)
+class ScheduleEntry:
+    """one entry of a schedule, repeated on weekdays or played on a date"""
+
+    track_id: str
+    hour: int
+    minute: int
+    second: int
+    # day numbers, monday is 0. Empty for dated entries, they have a day
+    days: tuple[int, ...] = ()
+    day: date | None = None
+
+    @classmethod
+    def from_play(cls, play: ScheduledPlay) -> "ScheduleEntry":
+        start = play.start
+        return cls(
+            play.track_id, start.hour, start.minute, start.second, day=start.date()
+        )
+
+    @classmethod
+    def from_dict(cls, entry: dict) -> "ScheduleEntry":
+        """an entry as read from schedule.yml"""
+        if "date" in entry:
+            return cls(
+                entry["track_id"],
+                entry["hour"],
+                entry["minute"],
+                entry["second"],
+                day=entry["date"],
+            )
+        return cls(
+            entry["track_id"],
+            entry["hour"],
+            entry["minute"],
+            entry["second"],
+            tuple(int(d) for d in str(entry["day_of_week"]).split(",")),
+        )
+
+    def as_dict(self) -> dict:
+        """the entry as read from schedule.yml"""
+        entry = {
+            "track_id": self.track_id,
+            "command": "play",
+            "hour": self.hour,
+            "minute": self.minute,
+            "second": self.second,
+        }
+        if self.day is not None:
+            entry["date"] = self.day
+        else:
+            entry["day_of_week"] = ",".join(str(d) for d in self.days)
+        return entry
+
+    def time_str(self, seconds: bool = True) -> str:
+        if seconds:
+            return f"{self.hour:02}:{self.minute:02}:{self.second:02}"
+        return f"{self.hour:02}:{self.minute:02}"
+
+    def days_str(self) -> str:
+        if self.day is not None:
+            return self.day.isoformat()
+        return ",".join(day_names[d] for d in self.days)
+
+
+class ScheduleWriter(ABC):
+    """Base of the writers, entries are passed one by one between open and close"""
+
+    def __init__(self, path: Path, tracks: TrackCatalog):
+        self.path = Path(path)
+        self.tracks = tracks
+        self.file: TextIO | None = None
+
+    def open(self):
+        self.file = open(self.path, "w")
+
+    @abstractmethod
+    def write(self, entry: ScheduleEntry):
+        pass
+
+    def close(self):
+        self.file.close()
+        self.file = None
+
+
+class YAMLWriter(ScheduleWriter):
+    def write(self, entry: ScheduleEntry):
+        track = self.tracks[entry.track_id]
+        if entry.day is not None:
+            when = f"  date: {entry.day.isoformat()}\n"
+        else:
+            when = f"  day_of_week: {','.join(str(d) for d in entry.days)}\n"
+        self.file.write(
+            f"- track_id: {entry.track_id}\n"
+            f"  audio_index: {track.audio_index} # included for compatibility \n"
+            f"  video_index: {track.video_index}  # included for compatibility \n"
+            f"  command: play\n"
+            f"{when}"
+            f"  hour: {entry.hour}\n"
+            f"  minute: {entry.minute}\n"
+            f"  second: {entry.second}\n"
+        )
+
+
+class FullScheduleWriter(ScheduleWriter):
+    """every entry with its days, start and title"""
+
+    def write(self, entry: ScheduleEntry):
+        if entry.track_id in self.tracks:
+            title = self.tracks[entry.track_id].title
+            self.file.write(f"{entry.days_str():<20}\t{entry.time_str()}\t{title}\n")
+        else:
+            log.warning(f"track {entry.track_id} missing from tracks")
+            self.file.write(entry.time_str() + "\n")
+
+
+class TrackScheduleWriter(ScheduleWriter):
+    """the play times of every track grouped by days, written when the timeline is complete"""
+
+    def open(self):
+        super().open()
+        # track: days: play times, in the order of the tracks
+        self.runtimes: dict[str, dict] = {name: {} for name in self.tracks}
+
+    def write(self, entry: ScheduleEntry):
+        if entry.track_id not in self.runtimes:
+            log.warning(f"track {entry.track_id} missing from tracks")
+            return
+        days = entry.day if entry.day is not None else entry.days
+        self.runtimes[entry.track_id].setdefault(days, []).append(
+            entry.time_str(seconds=False)
+        )
+
+    def close(self):
+        for name, runtimes in self.runtimes.items():
+            self.file.write(self.tracks[name].title + "\n")
+            for days, times in runtimes.items():
+                if isinstance(days, date):
+                    label = days.isoformat()
+                else:
+                    label = ",".join(day_names[d] for d in days)
+                self.file.write(f"\t{label:<20}\t{', '.join(times)}\n")
+            self.file.write("\n")
+        super().close()
+
+
+class JSONWriter(ScheduleWriter):
+    """a json list of the entries, written entry by entry"""
+
+    def open(self):
+        super().open()
+        self.n_entries = 0
+        self.file.write("[")
+
+    def write(self, entry: ScheduleEntry):
+        track = self.tracks[entry.track_id]
+        record = {
+            "track_id": entry.track_id,
+            "title": track.title,
+            "audio_index": track.audio_index,
+            "video_index": track.video_index,
+            "start": entry.time_str(),
+            "duration": track.duration,
+        }
+        if entry.day is not None:
+            record["date"] = entry.day.isoformat()
+        else:
+            record["days"] = list(entry.days)
+        self.file.write(("," if self.n_entries else "") + "\n  " + json.dumps(record))
+        self.n_entries += 1
+
+    def close(self):
+        self.file.write("\n]\n")
+        super().close()
+
+
+def ics_escape(text: str) -> str:
+    return (
+        text.replace("\\", "\\\\")
+        .replace(";", "\\;")
+        .replace(",", "\\,")
+        .replace("\n", "\\n")
+    )
+
+
+def ics_fold(line: str) -> str:
+    """lines of an iCalendar file are folded after 75 octets"""
+    data = line.encode()
+    if len(data) <= 75:
+        return line + "\r\n"
+    parts = []
+    while data:
+        n = 75 if not parts else 74
+        # do not split a multibyte character
+        while n < len(data) and data[n] & 0xC0 == 0x80:
+            n -= 1
+        parts.append(data[:n].decode())
+        data = data[n:]
+    return "\r\n ".join(parts) + "\r\n"
+
+
+class ICSWriter(ScheduleWriter):
+    """Calendar with an event per entry. Times are floating local times of the venue, weekly entries start on
+    their first day after first_day and repeat every week
+
+    Args:
+        first_day (date, optional): first day of the weekly entries. Defaults to today.
+    """
+
+    def __init__(self, path: Path, tracks: TrackCatalog, first_day: date | None = None):
+        super().__init__(path, tracks)
+        self.first_day = date.today() if first_day is None else first_day
+
+    def open(self):
+        super().open()
+        self.n_entries = 0
+        self.stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+        self.file.write(
+            "BEGIN:VCALENDAR\r\n"
+            "VERSION:2.0\r\n"
+            "PRODID:-//showcontrol//schedule//EN\r\n"
+            "CALSCALE:GREGORIAN\r\n"
+        )
+
+    def write(self, entry: ScheduleEntry):
+        track = self.tracks[entry.track_id]
+        if entry.day is not None:
+            day = entry.day
+            rule = None
+        else:
+            # first day after first_day that is one of the days of the entry
+            day = min(
+                self.first_day + timedelta(days=(d - self.first_day.weekday()) % 7)
+                for d in entry.days
+            )
+            byday = ",".join(weekday_names[d][:2].upper() for d in entry.days)
+            rule = f"RRULE:FREQ=WEEKLY;BYDAY={byday}"
+        start = datetime(day.year, day.month, day.day, entry.hour, entry.minute)
+        start += timedelta(seconds=entry.second)
+        end = start + timedelta(seconds=track.duration)
+
+        lines = [
+            "BEGIN:VEVENT",
+            f"UID:{self.n_entries}-{entry.track_id}-{start.strftime('%Y%m%dT%H%M%S')}@showcontrol",
+            f"DTSTAMP:{self.stamp}",
+            f"DTSTART:{start.strftime('%Y%m%dT%H%M%S')}",
+            f"DTEND:{end.strftime('%Y%m%dT%H%M%S')}",
+            f"SUMMARY:{ics_escape(track.title)}",
+        ]
+        if track.description:
+            lines.append(f"DESCRIPTION:{ics_escape(track.description.strip())}")
+        if rule is not None:
+            lines.append(rule)
+        lines.append("END:VEVENT")
+        self.file.write("".join(ics_fold(line) for line in lines))
+        self.n_entries += 1
+
+    def close(self):
+        self.file.write("END:VCALENDAR\r\n")
+        super().close()
+
+
+class HTMLWriter(ScheduleWriter):
+    """printable programme with a table per weekday or date, written when the timeline is complete"""
+
+    def open(self):
+        super().open()
+        # weekday number or date: (start, title, minutes)
+        self.days: dict[int | date, list[tuple[str, str, int]]] = {}
+
+    def write(self, entry: ScheduleEntry):
+        track = self.tracks[entry.track_id]
+        row = (entry.time_str(seconds=False), track.title, track.duration)
+        for day in [entry.day] if entry.day is not None else entry.days:
+            self.days.setdefault(day, []).append(row)
+
+    def close(self):
+        self.file.write(
+            "<!DOCTYPE html>\n"
+            '<html>\n<head>\n<meta charset="utf-8">\n<title>Programm</title>\n'
+            "<style>\n"
+            "body { font-family: sans-serif; }\n"
+            "section { break-inside: avoid; }\n"
+            "td { padding: 0.1em 1em 0.1em 0; }\n"
+            "</style>\n</head>\n<body>\n"
+        )
+        # weekdays first, then dates
+        for day in sorted(self.days, key=lambda d: (isinstance(d, date), d)):
+            if isinstance(day, date):
+                heading = f"{day_names[day.weekday()]} {day.strftime('%d.%m.%Y')}"
+            else:
+                heading = weekday_names[day].capitalize()
+            self.file.write(f"<section>\n<h2>{escape(heading)}</h2>\n<table>\n")
+            for start, title, seconds in sorted(self.days[day]):
+                self.file.write(
+                    f"<tr><td>{start}</td><td>{escape(title)}</td>"
+                    f"<td>{seconds // 60}:{seconds % 60:02} min</td></tr>\n"
+                )
+            self.file.write("</table>\n</section>\n")
+        self.file.write("</body>\n</html>\n")
+        super().close()
+
+
+writer_classes = {
+    "yaml": YAMLWriter,
+    "full": FullScheduleWriter,
+    "tracks": TrackScheduleWriter,
+    "json": JSONWriter,
+    "ics": ICSWriter,
+    "html": HTMLWriter,
+}
+
+
+def export_schedule(
+    entries: Iterable[ScheduleEntry], writers: list[ScheduleWriter]
+) -> int:
+    """streams the entries through all writers in one pass
+
+    Returns:
+        int: number of entries
+    """
+    n_entries = 0
+    # the writers opened so far are closed when a later one fails to open
+    with ExitStack() as stack:
+        for writer in writers:
+            writer.open()
+            stack.callback(writer.close)
+        for entry in entries:
+            for writer in writers:
+                writer.write(entry)
+            n_entries += 1
+    return n_entries
+
+
+def export_paths(directory: Path, formats: Iterable[str], day: str) -> dict[str, Path]:
+    """file names of the exports in a directory, hufoprogram_<day>_<name>"""
+    return {
+        name: Path(directory) / f"hufoprogram_{day}_{export_filenames[name]}"
+        for name in formats
+    }
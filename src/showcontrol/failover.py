@@ -0,0 +1,284 @@
+"""Active/standby operation of two showcontrol instances.
+
+Both instances load the same config and send each other heartbeats over udp. Only the active instance
+dispatches scheduled cues, the standby fires its scheduler as well but suppresses every cue. When the
+heartbeats of the active instance stop for longer than the timeout, the standby takes over and catches
+up on the most recent cue of every zone the active instance did not report as dispatched. A starting
+instance listens for one timeout before it fires anything and catches up the same way when it becomes active.
+
+config example:
+
+    failover:
+      interval: 0.2
+      timeout: 1.0
+      nodes:
+        - name: showcontrol-a
+          address: 172.25.18.210:9200
+          priority: 1
+        - name: showcontrol-b
+          address: 172.25.18.211:9200
+"""
+
+from collections import deque
+from collections.abc import Callable
+from dataclasses import dataclass
+from threading import Event, Lock, Thread
+import json
+import logging
+import socket
+
+from showcontrol.clock import SystemClock
+from showcontrol.config import ConfigError
+
+log = logging.getLogger(__name__)
+
+
+@dataclass
+class FailoverNode:
+    name: str
+    host: str
+    port: int
+    priority: int = 0
+
+
+def read_failover_nodes(failover_config: dict) -> list[FailoverNode]:
+    """reads the node list of the failover config section"""
+    nodes = []
+    for node in failover_config.get("nodes", []):
+        host, _, port = str(node["address"]).rpartition(":")
+        if not host or not port.isdigit():
+            raise ConfigError(
+                f"invalid failover address {node['address']}, has to be host:port"
+            )
+        nodes.append(
+            FailoverNode(node["name"], host, int(port), int(node.get("priority", 0)))
+        )
+    if len(nodes) != 2:
+        raise ConfigError("failover needs exactly two nodes")
+    return nodes
+
+
+class Failover(object):
+    """Heartbeat exchange and role decision for one of two showcontrol instances.
+
+    Args:
+        node (FailoverNode): this instance
+        peer (FailoverNode): the other instance
+        interval (float, optional): seconds between two heartbeats. Defaults to 0.2.
+        timeout (float, optional): seconds without heartbeat after which the peer is considered dead. Defaults to 1.0.
+        catch_up_window (float, optional): a suppressed cue is only fired on takeover if it is not older than this. Defaults to 2 * timeout.
+        cue_match_window (float, optional): a cue reported by the peer within this many seconds of a suppressed cue of the same track counts as the same cue. Defaults to 30.
+        clock (SystemClock, optional): Defaults to SystemClock().
+    """
+
+    def __init__(
+        self,
+        node: FailoverNode,
+        peer: FailoverNode,
+        interval: float = 0.2,
+        timeout: float = 1.0,
+        catch_up_window: float | None = None,
+        cue_match_window: float = 30,
+        clock: SystemClock | None = None,
+    ):
+        self.node = node
+        self.peer = peer
+        self.interval = interval
+        self.timeout = timeout
+        self.catch_up_window = (
+            2 * timeout if catch_up_window is None else catch_up_window
+        )
+        self.cue_match_window = cue_match_window
+        self.clock = SystemClock() if clock is None else clock
+
+        # callbacks, set by the owner of the failover
+        # returns the local state sent with every heartbeat
+        self.get_state: Callable[[], dict] = lambda: {}
+        # called on the standby with the state of the active peer
+        self.on_peer_state: Callable[[dict], None] = lambda state: None
+        # called with the zone and track_id of a cue to catch up on after a takeover
+        self.on_takeover: Callable[[str, str], None] = lambda zone, track_id: None
+
+        self.role = "starting"
+        self.seq = 0
+        # zone: (track_id, wall time) of the last cue dispatched by this instance
+        self.last_cue: dict[str, tuple[str, float]] = {}
+        # (zone, track_id, wall time) of cues suppressed while standing by
+        self.suppressed = deque(maxlen=64)
+        self.events = deque(maxlen=50)
+
+        self.peer_seen: float | None = None
+        self.peer_heartbeat: dict = {}
+
+        self._lock = Lock()
+        self._started_at = self.clock.monotonic()
+        self._stop = Event()
+        self._thread: Thread | None = None
+        self._socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self._socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self._socket.bind((node.host, node.port))
+        self._socket.settimeout(interval / 2)
+
+    @property
+    def active(self) -> bool:
+        return self.role == "active"
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._started_at = self.clock.monotonic()
+        self._stop.clear()
+        self._thread = Thread(target=self._run, name="Failover", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self._socket.close()
+
+    def may_fire(self, zone: str, track_id: str) -> bool:
+        """called before a scheduled cue is dispatched, only the active instance may fire"""
+        with self._lock:
+            if self.active:
+                return True
+            self.suppressed.append((zone, track_id, self.clock.time()))
+        log.info(f"failover {self.role}: suppressed cue {track_id} in zone {zone}")
+        return False
+
+    def cue_fired(self, zone: str, track_id: str):
+        """called after a cue was dispatched, the peer is informed right away"""
+        with self._lock:
+            self.last_cue[zone] = (track_id, self.clock.time())
+        self.send_heartbeat()
+
+    def peer_alive(self) -> bool:
+        return (
+            self.peer_seen is not None
+            and self.clock.monotonic() - self.peer_seen < self.timeout
+        )
+
+    def status(self) -> dict:
+        return {
+            "node": self.node.name,
+            "role": self.role,
+            "peer": self.peer.name,
+            "peer_alive": self.peer_alive(),
+            "peer_role": self.peer_heartbeat.get("role"),
+            "last_cue": dict(self.last_cue),
+            "events": list(self.events),
+        }
+
+    def send_heartbeat(self):
+        self.seq += 1
+        heartbeat = {
+            "node": self.node.name,
+            "priority": self.node.priority,
+            "role": self.role,
+            "seq": self.seq,
+            "last_cue": dict(self.last_cue),
+            "state": self.get_state(),
+        }
+        try:
+            self._socket.sendto(
+                json.dumps(heartbeat).encode("utf-8"), (self.peer.host, self.peer.port)
+            )
+        except OSError as e:
+            log.debug(f"sending heartbeat failed: {e}")
+
+    def receive_heartbeat(self, data: bytes):
+        try:
+            heartbeat = json.loads(data)
+        except ValueError:
+            return
+        if heartbeat.get("node") != self.peer.name:
+            return
+        self.peer_seen = self.clock.monotonic()
+        self.peer_heartbeat = heartbeat
+        if heartbeat.get("role") == "active" and not self.active:
+            self.on_peer_state(heartbeat.get("state", {}))
+
+    def _outranks_peer(self) -> bool:
+        return (self.node.priority, self.node.name) > (
+            self.peer_heartbeat.get("priority", 0),
+            self.peer_heartbeat.get("node", ""),
+        )
+
+    def _set_role(self, role: str, reason: str):
+        if role == self.role:
+            return
+        log.warning(f"failover: {self.role} -> {role} ({reason})")
+        self.events.append(
+            {"time": self.clock.now().isoformat(), "role": role, "reason": reason}
+        )
+        self.role = role
+        if role == "active":
+            # cues suppressed while starting or standing by are not lost, whatever the reason of the takeover
+            self._catch_up()
+
+    def evaluate(self):
+        """decides the role of this instance from the heartbeats received so far"""
+        peer_alive = self.peer_alive()
+        peer_active = peer_alive and self.peer_heartbeat.get("role") == "active"
+
+        if self.role == "starting":
+            # listen for an active peer before dispatching anything, a restarted instance
+            # must not fire over the one that took over
+            if peer_active:
+                self._set_role("standby", "peer is active")
+            elif self.clock.monotonic() - self._started_at >= self.timeout:
+                if not peer_alive or self._outranks_peer():
+                    self._set_role("active", "no active peer")
+                else:
+                    self._set_role("standby", "peer has priority")
+        elif self.role == "active":
+            if peer_active and not self._outranks_peer():
+                self._set_role("standby", "both active, peer has priority")
+        elif self.role == "standby":
+            if not peer_alive:
+                self._set_role("active", "peer heartbeat lost")
+            elif not peer_active and self._outranks_peer():
+                self._set_role("active", "peer is not active")
+
+    def _catch_up(self):
+        """fires the most recent suppressed cue of every zone, unless the peer reported it as dispatched"""
+        with self._lock:
+            latest = {}
+            for zone, track_id, suppressed_at in self.suppressed:
+                latest[zone] = (track_id, suppressed_at)
+            self.suppressed.clear()
+
+        peer_cues = self.peer_heartbeat.get("last_cue") or {}
+        for zone, (track_id, suppressed_at) in latest.items():
+            if self.clock.time() - suppressed_at > self.catch_up_window:
+                continue
+            peer_cue = peer_cues.get(zone)
+            if peer_cue is not None:
+                peer_track_id, peer_fired_at = peer_cue
+                if peer_fired_at >= suppressed_at - self.cue_match_window and (
+                    peer_track_id == track_id or peer_fired_at > suppressed_at
+                ):
+                    continue
+
+            log.warning(
+                f"failover: catching up on cue {track_id} in zone {zone} missed by the peer"
+            )
+            self.on_takeover(zone, track_id)
+
+    def _run(self):
+        next_heartbeat = 0.0
+        while not self._stop.is_set():
+            try:
+                data, _ = self._socket.recvfrom(65536)
+                self.receive_heartbeat(data)
+            except socket.timeout:
+                pass
+            except OSError:
+                if self._stop.is_set():
+                    break
+
+            self.evaluate()
+            if self.clock.monotonic() >= next_heartbeat:
+                self.send_heartbeat()
+                next_heartbeat = self.clock.monotonic() + self.interval
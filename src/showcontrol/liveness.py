@@ -0,0 +1,222 @@
+"""Liveness of the engine for systemd and /api/health.
+
+A heartbeat job runs on the scheduler every heartbeat_interval seconds. It is executed like the cues, so it
+only runs while the scheduler loop is advancing and its executor has a free thread. Every beat sends
+WATCHDOG=1 to systemd, so a wedged scheduler thread or a deadlocked executor stops the pings and systemd
+restarts showcontrol after WatchdogSec. A beat that comes late is only reported, a single hiccup must not kill
+a running show: with the default interval of a third of WatchdogSec two beats can be missed before systemd
+gives up.
+
+READY=1 is sent once the config is loaded and the jobs of all zones are armed, STOPPING=1 on shutdown.
+Without a NOTIFY_SOCKET (not started by systemd with Type=notify) nothing is sent.
+
+/api/health reports the same data, with status 503 if the engine is not alive, i.e. there was no beat for two
+intervals. Late beats are counted and reported there but don't fail the check.
+
+config example:
+
+    # seconds between two beats. Defaults to a third of the WatchdogSec of the service, or 5
+    heartbeat_interval: 5
+    # seconds a beat may be late before it is reported as late
+    heartbeat_max_lateness: 1.0
+"""
+
+from threading import Lock
+import logging
+import os
+import socket
+
+import apscheduler
+from apscheduler.jobstores.base import JobLookupError
+from apscheduler.jobstores.memory import MemoryJobStore
+from apscheduler.schedulers.base import BaseScheduler
+
+from showcontrol.clock import SystemClock
+from showcontrol.metrics import metrics
+
+log = logging.getLogger(__name__)
+
+heartbeat_job_id = "heartbeat"
+# the heartbeat has its own jobstore, a zone may be called default. Zone names starting with _ are
+# reserved, see read_zones
+heartbeat_jobstore = "_heartbeat"
+
+scheduler_states = {
+    apscheduler.schedulers.base.STATE_STOPPED: "stopped",
+    apscheduler.schedulers.base.STATE_RUNNING: "running",
+    apscheduler.schedulers.base.STATE_PAUSED: "paused",
+}
+
+
+def watchdog_interval(environ=os.environ) -> float | None:
+    """WatchdogSec of the service in seconds, None if the watchdog is off or meant for another process"""
+    usec = environ.get("WATCHDOG_USEC")
+    if not usec:
+        return None
+    pid = environ.get("WATCHDOG_PID")
+    if pid and int(pid) != os.getpid():
+        return None
+    return int(usec) / 1e6
+
+
+class SystemdNotifier(object):
+    """Sends sd_notify messages to the socket systemd passes in NOTIFY_SOCKET
+
+    Args:
+        address (str, optional): path of the socket, @ for the abstract namespace. Defaults to NOTIFY_SOCKET.
+    """
+
+    def __init__(self, address: str | None = None):
+        self.address = os.environ.get("NOTIFY_SOCKET") if address is None else address
+        self.socket: socket.socket | None = None
+        if self.address:
+            self.socket = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+
+    @property
+    def enabled(self) -> bool:
+        return self.socket is not None
+
+    def notify(self, *fields: str) -> bool:
+        """sends fields like READY=1, returns False if nothing was sent"""
+        if self.socket is None:
+            return False
+        address = self.address
+        if address.startswith("@"):
+            address = "\0" + address[1:]
+        try:
+            self.socket.sendto("\n".join(fields).encode(), address)
+        except OSError as e:
+            log.error(f"sd_notify to {self.address} failed: {e}")
+            return False
+        return True
+
+    def ready(self, status: str | None = None) -> bool:
+        return self.notify("READY=1", *([f"STATUS={status}"] if status else []))
+
+    def watchdog(self) -> bool:
+        return self.notify("WATCHDOG=1")
+
+    def status(self, status: str) -> bool:
+        return self.notify(f"STATUS={status}")
+
+    def stopping(self) -> bool:
+        return self.notify("STOPPING=1")
+
+    def close(self):
+        if self.socket is not None:
+            self.socket.close()
+            self.socket = None
+
+
+class Heartbeat(object):
+    """Job on the scheduler that proves the scheduler loop and its executor are advancing
+
+    Args:
+        scheduler (BaseScheduler): scheduler of the dispatcher
+        notifier (SystemdNotifier, optional): Defaults to SystemdNotifier().
+        clock (SystemClock, optional): Defaults to SystemClock().
+        interval (float, optional): seconds between two beats. Defaults to a third of the WatchdogSec, or 5.
+        max_lateness (float, optional): seconds a beat may be late before it is reported as late. Defaults to 1.0.
+    """
+
+    def __init__(
+        self,
+        scheduler: BaseScheduler,
+        notifier: SystemdNotifier | None = None,
+        clock: SystemClock | None = None,
+        interval: float | None = None,
+        max_lateness: float = 1.0,
+    ):
+        self.sched = scheduler
+        self.sched.add_jobstore(MemoryJobStore(), alias=heartbeat_jobstore)
+        self.notifier = SystemdNotifier() if notifier is None else notifier
+        self.clock = SystemClock() if clock is None else clock
+        if interval is None:
+            watchdog = watchdog_interval()
+            interval = 5.0 if watchdog is None else watchdog / 3
+        self.interval = interval
+        self.max_lateness = max_lateness
+
+        self.n_beats = 0
+        self.n_late = 0
+        # seconds the last beat came after the interval
+        self.lateness = 0.0
+        self._last_beat: float | None = None
+        self._started: float | None = None
+        self._lock = Lock()
+
+    def start(self, status: str | None = None):
+        """adds the heartbeat job and tells systemd the engine is ready, call after the scheduler was started"""
+        self._started = self.clock.monotonic()
+        self.sched.add_job(
+            self.beat,
+            "interval",
+            seconds=self.interval,
+            id=heartbeat_job_id,
+            jobstore=heartbeat_jobstore,
+            replace_existing=True,
+            # a late beat still runs and reports its lateness
+            misfire_grace_time=None,
+            coalesce=True,
+        )
+        self.notifier.ready(status)
+        log.info(
+            f"heartbeat every {self.interval}s, systemd watchdog {'on' if self.notifier.enabled else 'off'}"
+        )
+
+    def stop(self):
+        self.notifier.stopping()
+        try:
+            self.sched.remove_job(heartbeat_job_id, heartbeat_jobstore)
+        except JobLookupError:
+            pass
+        self._started = None
+
+    def beat(self):
+        """run by the scheduler, the loop is advancing, so the watchdog is pinged even if the beat is late"""
+        now = self.clock.monotonic()
+        with self._lock:
+            previous = self._started if self._last_beat is None else self._last_beat
+            lateness = max(0.0, now - previous - self.interval)
+            self._last_beat = now
+            self.lateness = lateness
+            self.n_beats += 1
+            if lateness > self.max_lateness:
+                self.n_late += 1
+        metrics.set("heartbeat_lateness", lateness)
+        if lateness > self.max_lateness:
+            metrics.increment("heartbeats_late")
+            log.warning(f"heartbeat is {lateness:.3f}s late")
+        self.notifier.watchdog()
+
+    def age(self) -> float | None:
+        """seconds since the last beat, or since the start if there was none yet"""
+        last = self._started if self._last_beat is None else self._last_beat
+        return None if last is None else self.clock.monotonic() - last
+
+    def is_alive(self) -> bool:
+        """the scheduler is running and advancing: the last beat is at most two intervals ago"""
+        age = self.age()
+        return (
+            self.sched.state == apscheduler.schedulers.base.STATE_RUNNING
+            and age is not None
+            and age <= 2 * self.interval
+        )
+
+    def is_late(self) -> bool:
+        """the last beat came more than max_lateness after its interval"""
+        return self.lateness > self.max_lateness
+
+    def status(self) -> dict:
+        return {
+            "alive": self.is_alive(),
+            "late": self.is_late(),
+            "scheduler": scheduler_states.get(self.sched.state, "unknown"),
+            "last_beat_age": self.age(),
+            "lateness": self.lateness,
+            "interval": self.interval,
+            "max_lateness": self.max_lateness,
+            "n_beats": self.n_beats,
+            "n_late": self.n_late,
+            "watchdog": self.notifier.enabled,
+        }
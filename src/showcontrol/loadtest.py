@@ -0,0 +1,339 @@
+from collections import defaultdict
+from datetime import timedelta
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from threading import Event, Thread
+import bisect
+import http.client
+import json
+import logging
+import time
+
+import click
+from flask import Flask
+from werkzeug.serving import make_server
+
+from showcontrol.api import construct_api_blueprint
+from showcontrol.config import find_config_files
+from showcontrol.emulators import (
+    FakeReaper,
+    emulator_config,
+    free_port,
+    syncplayer_fleet,
+)
+from showcontrol.dispatcher import Dispatcher
+
+log = logging.getLogger(__name__)
+
+endpoints = ["/api/upcoming_tracks", "/api/tracks", "/api/scheduler_state"]
+
+
+def percentile(values: list[float], p: float) -> float | None:
+    """nearest rank percentile of values, p between 0 and 100"""
+    if not values:
+        return None
+    values = sorted(values)
+    index = min(len(values) - 1, max(0, round(p / 100 * len(values)) - 1))
+    return values[index]
+
+
+def summarize(values: list[float]) -> dict:
+    return {
+        "n": len(values),
+        "p50": percentile(values, 50),
+        "p99": percentile(values, 99),
+        "max": max(values) if values else None,
+    }
+
+
+def match_arrivals(
+    fire_times: list[float],
+    regions: list,
+    arrivals: dict[object, list[float]],
+    cue_interval: float,
+) -> tuple[list[float], int]:
+    """Matches the /region messages that arrived to the cues by their region. A cue owns the arrivals of its
+    region from half a cue interval before its fire time up to half a cue interval before the next cue of
+    the same region, the first of them counts, redundant copies and stray datagrams are ignored
+
+    Args:
+        fire_times (list[float]): fire time of every cue in ns
+        regions (list): region of every cue
+        arrivals (dict[object, list[float]]): region: arrival times in ns
+        cue_interval (float): ns between two cues
+
+    Returns:
+        tuple[list[float], int]: lateness of every cue that arrived in ms, number of cues that never arrived
+    """
+    # region: fire times of its cues in order
+    cue_times = defaultdict(list)
+    for fire_time, region in zip(fire_times, regions):
+        cue_times[region].append(fire_time)
+
+    lateness = []
+    n_missing = 0
+    for region, times in cue_times.items():
+        received = sorted(arrivals.get(region, []))
+        for i, fire_time in enumerate(times):
+            window_start = fire_time - cue_interval / 2
+            window_end = (
+                times[i + 1] - cue_interval / 2 if i + 1 < len(times) else float("inf")
+            )
+            j = bisect.bisect_left(received, window_start)
+            if j < len(received) and received[j] < window_end:
+                lateness.append((received[j] - fire_time) / 1e6)
+            else:
+                n_missing += 1
+    return lateness, n_missing
+
+
+class LoadTest(object):
+    """Runs showcontrol against local emulators and measures how web load delays cues.
+
+    A dense synthetic schedule (one cue every cue_interval seconds) is fired into a fake reaper
+    and fake syncplayers, while the api blueprint is served by the same werkzeug server
+    `showcontrol` uses and hammered by http clients. Cue lateness is the time between the
+    scheduled fire time of a cue and the arrival of its /region message at the fake reaper.
+
+    Args:
+        config_dir (Path): config dir the tracks are read from
+        work_dir (Path): directory for the config copy pointing at the emulators
+        n_players (int, optional): number of emulated syncplayers. Defaults to 8.
+        cue_interval (float, optional): seconds between two cues. Defaults to 0.25.
+    """
+
+    def __init__(
+        self,
+        config_dir: Path,
+        work_dir: Path,
+        n_players: int = 8,
+        cue_interval: float = 0.25,
+    ):
+        self.cue_interval = cue_interval
+        self.reaper = FakeReaper(("127.0.0.1", free_port())).start()
+        self.players = [
+            p.start() for p in syncplayer_fleet(n_players, free_port(), free_port())
+        ]
+        find_config_files(
+            emulator_config(config_dir, work_dir, self.reaper, self.players)
+        )
+
+        self.dispatcher = Dispatcher()
+        self.schedctrl = self.dispatcher.default_zone
+        # the shipped schedule is replaced by the synthetic one
+        self.dispatcher.sched.remove_all_jobs()
+        self.dispatcher.start()
+
+        app = Flask(__name__)
+        app.register_blueprint(
+            construct_api_blueprint(self.dispatcher), url_prefix="/api"
+        )
+        self.server = make_server("127.0.0.1", 0, app, threaded=True)
+        self.port = self.server.server_port
+        self.server_thread = Thread(
+            target=self.server.serve_forever, name="LoadTestHTTP", daemon=True
+        )
+        self.server_thread.start()
+
+    def close(self):
+        self.server.shutdown()
+        self.dispatcher.stop()
+        for emulator in [self.reaper, *self.players]:
+            emulator.close()
+
+    def measure_lateness(self, duration: float) -> tuple[list[float], int]:
+        """fires one cue every cue_interval seconds for duration seconds
+
+        Returns:
+            tuple[list[float], int]: lateness of every cue that arrived in ms, number of cues that never arrived
+        """
+        track_ids = list(self.schedctrl.tracks)
+        n_cues = max(1, int(duration / self.cue_interval))
+        start = self.schedctrl.clock.now() + timedelta(seconds=0.5)
+        fire_times = [
+            start + timedelta(seconds=i * self.cue_interval) for i in range(n_cues)
+        ]
+
+        self.reaper.messages.clear()
+        for i, fire_time in enumerate(fire_times):
+            self.schedctrl.sched.add_job(
+                self.schedctrl.play_scheduled_track,
+                "date",
+                run_date=fire_time,
+                args=[track_ids[i % len(track_ids)]],
+                jobstore=self.schedctrl.name,
+            )
+
+        time.sleep((fire_times[-1] - self.schedctrl.clock.now()).total_seconds() + 0.5)
+
+        # region: arrival times of its /region messages, redundant copies included
+        arrivals = defaultdict(list)
+        for t, address, args in self.reaper.messages:
+            if address == "/region" and args:
+                arrivals[args[0]].append(t)
+        regions = [
+            self.schedctrl.tracks[track_ids[i % len(track_ids)]].audio_index
+            for i in range(n_cues)
+        ]
+        return match_arrivals(
+            [fire_time.timestamp() * 1e9 for fire_time in fire_times],
+            regions,
+            arrivals,
+            self.cue_interval * 1e9,
+        )
+
+    def run_client(self, stop: Event, latencies: dict, errors: dict):
+        n = 0
+        while not stop.is_set():
+            endpoint = endpoints[n % len(endpoints)]
+            n += 1
+            t_start = time.perf_counter()
+            try:
+                connection = http.client.HTTPConnection(
+                    "127.0.0.1", self.port, timeout=10
+                )
+                connection.request("GET", endpoint)
+                response = connection.getresponse()
+                response.read()
+                connection.close()
+                if response.status != 200:
+                    errors[endpoint] += 1
+                    continue
+            except OSError:
+                errors[endpoint] += 1
+                continue
+            latencies[endpoint].append((time.perf_counter() - t_start) * 1000)
+
+    def run(self, n_clients: int, duration: float) -> dict:
+        """measures cue lateness without load, then with n_clients hammering the api
+
+        Returns:
+            dict: latency and lateness statistics in ms
+        """
+        baseline, baseline_missing = self.measure_lateness(duration)
+
+        stop = Event()
+        latencies = defaultdict(list)
+        errors = defaultdict(int)
+        clients = [
+            Thread(
+                target=self.run_client,
+                args=(stop, latencies, errors),
+                name=f"LoadTestClient-{i}",
+                daemon=True,
+            )
+            for i in range(n_clients)
+        ]
+        t_start = time.perf_counter()
+        for client in clients:
+            client.start()
+        loaded, loaded_missing = self.measure_lateness(duration)
+        stop.set()
+        for client in clients:
+            client.join()
+        t_elapsed = time.perf_counter() - t_start
+
+        n_requests = sum(len(v) for v in latencies.values())
+        return {
+            "clients": n_clients,
+            "duration": duration,
+            "cue_interval": self.cue_interval,
+            "requests_per_second": n_requests / t_elapsed,
+            "http": {
+                endpoint: summarize(latencies[endpoint]) | {"errors": errors[endpoint]}
+                for endpoint in endpoints
+            },
+            "cue_lateness": {
+                "idle": summarize(baseline) | {"missing": baseline_missing},
+                "loaded": summarize(loaded) | {"missing": loaded_missing},
+            },
+        }
+
+
+def format_report(report: dict) -> str:
+    def ms(value):
+        return "-" if value is None else f"{value:8.2f}"
+
+    lines = [
+        f"{report['clients']} clients, {report['requests_per_second']:.0f} requests/s, "
+        f"one cue every {report['cue_interval']}s",
+        "",
+        f"{'endpoint':<24}{'n':>8}{'errors':>8}{'p50 ms':>10}{'p99 ms':>10}",
+    ]
+    for endpoint, stats in report["http"].items():
+        lines.append(
+            f"{endpoint:<24}{stats['n']:>8}{stats['errors']:>8}  {ms(stats['p50'])}  {ms(stats['p99'])}"
+        )
+    lines += [
+        "",
+        f"{'cue lateness':<24}{'n':>8}{'missing':>8}{'p50 ms':>10}{'p99 ms':>10}",
+    ]
+    for phase, stats in report["cue_lateness"].items():
+        lines.append(
+            f"{phase:<24}{stats['n']:>8}{stats['missing']:>8}  {ms(stats['p50'])}  {ms(stats['p99'])}"
+        )
+
+    idle, loaded = report["cue_lateness"]["idle"], report["cue_lateness"]["loaded"]
+    if idle["p99"] is not None and loaded["p99"] is not None:
+        lines.append(
+            f"\nweb load adds {loaded['p50'] - idle['p50']:.2f} ms (p50) / {loaded['p99'] - idle['p99']:.2f} ms (p99) of cue lateness"
+        )
+    return "\n".join(lines)
+
+
+@click.command(
+    help="hammer the api with concurrent clients while cues fire into local emulators"
+)
+@click.option(
+    "-c",
+    "--config-dir",
+    "config_dir",
+    type=click.Path(
+        exists=True, dir_okay=True, file_okay=False, resolve_path=True, path_type=Path
+    ),
+    default=None,
+    help="path to the config dir the tracks are read from, defaults to the usual config locations",
+)
+@click.option(
+    "-n",
+    "--clients",
+    "n_clients",
+    type=int,
+    multiple=True,
+    default=[10],
+    help="number of concurrent http clients, can be given multiple times",
+)
+@click.option("-d", "--duration", type=float, default=10, help="seconds per phase")
+@click.option(
+    "-i", "--cue-interval", type=float, default=0.25, help="seconds between two cues"
+)
+@click.option("-p", "--players", "n_players", type=int, default=8)
+@click.option("--json", "as_json", is_flag=True, help="print the results as json")
+def main(
+    config_dir: Path | None,
+    n_clients: tuple[int],
+    duration: float,
+    cue_interval: float,
+    n_players: int,
+    as_json: bool,
+):
+    # werkzeug logs every request
+    logging.getLogger("werkzeug").setLevel(logging.ERROR)
+
+    config_dir = find_config_files(config_dir).config_file_path.parent
+
+    with TemporaryDirectory() as work_dir:
+        loadtest = LoadTest(config_dir, Path(work_dir), n_players, cue_interval)
+        try:
+            reports = [loadtest.run(n, duration) for n in n_clients]
+        finally:
+            loadtest.close()
+
+    if as_json:
+        click.echo(json.dumps(reports, indent=2))
+    else:
+        click.echo("\n\n".join(format_report(r) for r in reports))
+
+
+if __name__ == "__main__":
+    main()
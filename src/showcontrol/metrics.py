@@ -0,0 +1,48 @@
+"""Counters and gauges of the engine, served by /api/metrics.
+
+A metric is identified by its name and labels, the key in the snapshot follows the prometheus notation:
+video_datagrams_sent{zone="hall"}
+"""
+
+from threading import Lock
+
+
+class Metrics(object):
+    """Thread safe registry of counters and gauges"""
+
+    def __init__(self):
+        self._values: dict[str, float] = {}
+        self._lock = Lock()
+
+    @staticmethod
+    def key(name: str, **labels) -> str:
+        if not labels:
+            return name
+        label_str = ",".join(f'{k}="{v}"' for k, v in sorted(labels.items()))
+        return f"{name}{{{label_str}}}"
+
+    def increment(self, name: str, value: float = 1, **labels):
+        key = self.key(name, **labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + value
+
+    def set(self, name: str, value: float, **labels):
+        """sets a gauge, a value that can go up and down"""
+        key = self.key(name, **labels)
+        with self._lock:
+            self._values[key] = value
+
+    def get(self, name: str, **labels) -> float:
+        return self._values.get(self.key(name, **labels), 0)
+
+    def snapshot(self) -> dict[str, float]:
+        with self._lock:
+            return dict(sorted(self._values.items()))
+
+    def reset(self):
+        with self._lock:
+            self._values.clear()
+
+
+# registry shared by all zones of the process
+metrics = Metrics()
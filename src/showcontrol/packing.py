@@ -0,0 +1,365 @@
+"""Optimizer for the programme of a day.
+
+create_schedule fills a day greedily: the blocks of the block plan in order, every track on the next multiple
+of 5 minutes, until the opening hours are over. The optimizer searches over the order of the blocks, the
+padding between tracks and the track a block starts with (the order inside a block is kept, it is only
+rotated) and picks the programme that uses the opening hours best and plays the tracks evenly:
+
+- every track has to end before the end of the opening hours
+- the padding is at least the track_padding of the block
+- fixed blocks (student_pieces) stay at their position in the block plan and are not rotated
+- airtime is fair if every track is played about as often as it appears in the blocks of the day
+
+The candidates are generated lazily and evaluated in parallel on a process pool, batch by batch, only the best
+candidate so far is kept. If a day has more than max_candidates candidates, a reproducible random sample of
+them is searched instead, together with the greedy programme:
+
+    showcontrol_schedule_generator --optimize --workers 4 --max-candidates 20000
+"""
+
+from collections import Counter
+from collections.abc import Iterable, Iterator
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from itertools import islice, permutations, product
+import logging
+import math
+import os
+import random
+import statistics
+
+from showcontrol.catalog import TrackCatalog
+from showcontrol.export import ScheduleEntry
+from showcontrol.schedule_generator import (
+    blockplan_days,
+    fill_day,
+    time_start,
+    time_stop,
+)
+
+log = logging.getLogger(__name__)
+
+# candidates searched per day at most, larger spaces are sampled
+default_max_candidates = 20000
+# candidates a worker evaluates in one go
+chunksize = 512
+
+
+@dataclass(frozen=True)
+class Candidate:
+    blocks: tuple[str, ...]
+    # seconds added to the track_padding of every block
+    extra_padding: int
+    # index of the first track of every block
+    rotations: tuple[int, ...]
+
+
+@dataclass
+class PackingResult:
+    candidate: Candidate
+    plays: list[tuple[datetime, str]]
+    # share of the opening hours a track is playing
+    utilisation: float
+    # seconds between the end of the last track and the end of the opening hours
+    idle_tail: float
+    # coefficient of variation of the play counts, relative to how often a track appears in the blocks
+    unfairness: float
+    score: float
+    counts: dict[str, int] = field(default_factory=dict)
+
+
+def block_order_candidates(
+    block_names: list[str], fixed_blocks: set[str]
+) -> list[tuple[str, ...]]:
+    """all distinct orders of the blocks, fixed blocks stay where they are"""
+    free = [i for i, name in enumerate(block_names) if name not in fixed_blocks]
+    orders = set()
+    for order in permutations([block_names[i] for i in free]):
+        names = list(block_names)
+        for i, name in zip(free, order):
+            names[i] = name
+        orders.add(tuple(names))
+    return sorted(orders)
+
+
+def candidate_space(
+    block_names: list[str],
+    blocks: dict,
+    fixed_blocks: set[str],
+    paddings: list[int],
+    max_candidates: int | None = None,
+    seed: int = 0,
+) -> tuple[int, Iterator[Candidate]]:
+    """The candidates of a day, generated lazily. Fixed blocks are only tried with their first track.
+
+    If there are more than max_candidates, a random sample of max_candidates is returned instead, the greedy
+    candidate first. The sample only depends on seed, so the result is reproducible.
+
+    Returns:
+        tuple[int, Iterator[Candidate]]: number and candidates
+    """
+    orders = block_order_candidates(block_names, fixed_blocks)
+
+    def n_first_tracks(name: str) -> int:
+        # a block without tracks is tried once instead of ruling out every candidate
+        return 1 if name in fixed_blocks else max(1, len(blocks[name]["tracks"]))
+
+    # the orders are permutations of the same blocks, all have the same number of rotations
+    n_rotations = math.prod(n_first_tracks(name) for name in block_names)
+    total = len(orders) * len(paddings) * n_rotations
+
+    def rotations(order: tuple[str, ...]) -> Iterator[tuple[int, ...]]:
+        return product(*(range(n_first_tracks(name)) for name in order))
+
+    if max_candidates is None or total <= max_candidates:
+        return total, (
+            Candidate(order, extra_padding, rotation)
+            for order in orders
+            for extra_padding in paddings
+            for rotation in rotations(order)
+        )
+
+    def sampled() -> Iterator[Candidate]:
+        yield Candidate(tuple(block_names), paddings[0], (0,) * len(block_names))
+        indices = random.Random(seed).sample(range(total), max_candidates - 1)
+        for index in sorted(indices):
+            index, rotation_index = divmod(index, n_rotations)
+            order_index, padding_index = divmod(index, len(paddings))
+            order = orders[order_index]
+            rotation = []
+            # mixed radix digits, the last block varies fastest like in product()
+            for name in reversed(order):
+                rotation_index, digit = divmod(rotation_index, n_first_tracks(name))
+                rotation.append(digit)
+            yield Candidate(order, paddings[padding_index], tuple(reversed(rotation)))
+
+    return max_candidates, sampled()
+
+
+def _keep_best(
+    best: tuple[float, float, Candidate] | None,
+    scored: Iterable[tuple[float, float, Candidate]],
+) -> tuple[float, float, Candidate] | None:
+    """the first of equally good candidates, so the result does not depend on the number of workers"""
+    for result in scored:
+        if best is None or result[0] > best[0]:
+            best = result
+    return best
+
+
+# blocks and tracks of the worker processes, sent once when the pool starts instead of with every candidate
+_worker_context: dict = {}
+
+
+def _init_worker(blocks, tracks, start, stop, fairness_weight):
+    _worker_context.update(
+        blocks=blocks,
+        tracks=tracks,
+        start=start,
+        stop=stop,
+        fairness_weight=fairness_weight,
+    )
+
+
+def evaluate(
+    candidate: Candidate,
+    blocks: dict,
+    tracks: TrackCatalog,
+    start: datetime,
+    stop: datetime,
+    fairness_weight: float = 0.1,
+) -> PackingResult:
+    """fills the day of a candidate and scores it"""
+    variant_blocks = {}
+    variant_names = []
+    for i, (name, rotation) in enumerate(zip(candidate.blocks, candidate.rotations)):
+        block = blocks[name]
+        block_tracks = list(block["tracks"])
+        variant = f"{name}#{i}"
+        variant_names.append(variant)
+        variant_blocks[variant] = {
+            "tracks": block_tracks[rotation:] + block_tracks[:rotation],
+            "track_padding": block["track_padding"] + candidate.extra_padding,
+        }
+
+    plays = [
+        (trackstart, track_name)
+        for trackstart, track_name in fill_day(
+            variant_names, variant_blocks, tracks, start, stop
+        )
+        if trackstart + timedelta(seconds=tracks[track_name].duration) <= stop
+    ]
+
+    opening = (stop - start).total_seconds()
+    played = sum(tracks[name].duration for _, name in plays)
+    if plays:
+        last_start, last_name = plays[-1]
+        end = last_start + timedelta(seconds=tracks[last_name].duration)
+        idle_tail = (stop - end).total_seconds()
+    else:
+        idle_tail = opening
+
+    counts = Counter(name for _, name in plays)
+    appearances = Counter(
+        track_name
+        for block_name in candidate.blocks
+        for track_name in blocks[block_name]["tracks"]
+    )
+    shares = [counts[name] / n for name, n in appearances.items()]
+    if shares:
+        mean = statistics.fmean(shares)
+        unfairness = statistics.pstdev(shares) / mean if mean > 0 else 1.0
+    else:
+        # a day without tracks
+        unfairness = 0.0
+
+    utilisation = played / opening
+    return PackingResult(
+        candidate,
+        plays,
+        utilisation,
+        idle_tail,
+        unfairness,
+        utilisation - fairness_weight * unfairness,
+        dict(counts),
+    )
+
+
+def _evaluate_in_worker(candidate: Candidate) -> tuple[float, float, Candidate]:
+    result = evaluate(candidate, **_worker_context)
+    return result.score, result.utilisation, candidate
+
+
+def optimize_day(
+    block_names: list[str],
+    blocks: dict,
+    tracks: TrackCatalog,
+    start: datetime,
+    stop: datetime,
+    fixed_blocks: set[str] | None = None,
+    max_extra_padding: int = 60,
+    padding_step: int = 10,
+    fairness_weight: float = 0.1,
+    workers: int | None = None,
+    max_candidates: int | None = default_max_candidates,
+) -> tuple[PackingResult, PackingResult, int]:
+    """Searches the best programme for a day
+
+    Args:
+        block_names (list[str]): blocks of the day from the block plan
+        blocks (dict): blocks as returned by read_blocks
+        tracks (TrackCatalog): tracks by name
+        start (datetime): start of the opening hours
+        stop (datetime): end of the opening hours
+        fixed_blocks (set[str], optional): blocks that keep their position. Defaults to {"student_pieces"}.
+        max_extra_padding (int, optional): seconds of padding added at most. Defaults to 60.
+        padding_step (int, optional): Defaults to 10.
+        fairness_weight (float, optional): weight of the unfairness in the score. Defaults to 0.1.
+        workers (int, optional): number of processes, 1 evaluates in this process. Defaults to the number of cpus.
+        max_candidates (int, optional): candidates searched at most, a larger space is sampled. None searches
+            all of them. Defaults to 20000.
+
+    Returns:
+        tuple[PackingResult, PackingResult, int]: best programme, the greedy programme of create_schedule
+            with the same constraints and the number of evaluated candidates
+    """
+    if fixed_blocks is None:
+        fixed_blocks = {"student_pieces"}
+
+    n_candidates, candidates = candidate_space(
+        block_names,
+        blocks,
+        fixed_blocks,
+        list(range(0, max_extra_padding + 1, padding_step)),
+        max_candidates,
+    )
+    context = dict(
+        blocks=blocks,
+        tracks=tracks,
+        start=start,
+        stop=stop,
+        fairness_weight=fairness_weight,
+    )
+
+    if workers == 1:
+        best = _keep_best(None, (_score(evaluate(c, **context)) for c in candidates))
+    else:
+        # the candidates are handed to the pool in batches, they are never all in memory
+        batch_size = chunksize * 4 * (workers or os.cpu_count() or 1)
+        best = None
+        with ProcessPoolExecutor(
+            workers,
+            initializer=_init_worker,
+            initargs=(blocks, tracks, start, stop, fairness_weight),
+        ) as pool:
+            while batch := list(islice(candidates, batch_size)):
+                best = _keep_best(
+                    best,
+                    pool.map(_evaluate_in_worker, batch, chunksize=chunksize),
+                )
+
+    greedy = Candidate(tuple(block_names), 0, (0,) * len(block_names))
+    if best is None:
+        # no candidate could be evaluated, the day is planned like create_schedule does
+        return evaluate(greedy, **context), evaluate(greedy, **context), n_candidates
+    return evaluate(best[2], **context), evaluate(greedy, **context), n_candidates
+
+
+def _score(result: PackingResult) -> tuple[float, float, Candidate]:
+    return result.score, result.utilisation, result.candidate
+
+
+def format_report(day: str, best: PackingResult, greedy: PackingResult) -> list[str]:
+    """utilisation of the opening hours by the optimized and the greedy programme"""
+    lines = [
+        f"{day}: utilisation {best.utilisation:.1%} (greedy {greedy.utilisation:.1%}), "
+        f"idle tail {best.idle_tail / 60:.0f} min (greedy {greedy.idle_tail / 60:.0f} min), "
+        f"unfairness {best.unfairness:.2f} (greedy {greedy.unfairness:.2f})",
+        f"\tblocks {', '.join(best.candidate.blocks)}, padding +{best.candidate.extra_padding}s, "
+        f"first tracks {best.candidate.rotations}",
+    ]
+    lines.append(
+        "\tplays " + ", ".join(f"{name} {n}" for name, n in sorted(best.counts.items()))
+    )
+    return lines
+
+
+def optimized_entries(
+    blockplan: dict,
+    blocks: dict,
+    tracks: TrackCatalog,
+    workers: int | None = None,
+    max_candidates: int | None = default_max_candidates,
+) -> tuple[list[ScheduleEntry], list[str]]:
+    """the weekly schedule with the optimized programme of every day of the block plan
+
+    Returns:
+        tuple[list[ScheduleEntry], list[str]]: entries of the schedule and the report of the utilisation of
+            every day
+    """
+    entries = []
+    report = []
+    for day, days in blockplan_days(blockplan).items():
+        best, greedy, n_candidates = optimize_day(
+            blockplan[day]["blocks"],
+            blocks,
+            tracks,
+            time_start,
+            time_stop,
+            workers=workers,
+            max_candidates=max_candidates,
+        )
+        log.info(f"evaluated {n_candidates} programmes for day {day}")
+        report += format_report(day, best, greedy)
+        entries.extend(
+            ScheduleEntry(
+                track_name,
+                trackstart.hour,
+                trackstart.minute,
+                trackstart.second,
+                tuple(days),
+            )
+            for trackstart, track_name in best.plays
+        )
+    return entries, report
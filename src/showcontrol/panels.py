@@ -0,0 +1,360 @@
+"""Continuous health check of the loudspeaker panels.
+
+Replaces scripts/panelpinger.py. All panels are probed concurrently from one asyncio loop with unprivileged
+probes, no ping processes are spawned:
+
+- udp:PORT sends a one byte datagram to a closed port. A host that is up answers with an icmp port unreachable,
+  any reply counts as well. A host that is down or drops the datagram stays silent until the timeout.
+- tcp:PORT opens a connection. An accepted or refused connection means the host is up.
+
+A panel is up if any of its probes succeeds, and down after down_after failed rounds in a row.
+
+The osc protocol of panelpinger.py is kept: /check/panels sent to osc_port triggers a check round, the sender
+gets /ping/request as confirmation and then /panel/ok name address or /panel/error name for every panel on
+reply_port.
+
+config example:
+
+    # one panel per line: name address
+    panel_list: panelList.txt
+    panel_probes: ["udp:9"]
+    panel_interval: 10
+    panel_timeout: 1.0
+    panel_osc_port: 41234
+    panel_osc_reply_port: 41231
+"""
+
+from collections import deque
+from dataclasses import dataclass, field
+from pathlib import Path
+from threading import Thread
+import asyncio
+import logging
+
+from pythonosc.osc_message_builder import OscMessageBuilder
+from pythonosc.osc_packet import OscPacket, ParseError
+
+from showcontrol.clock import SystemClock
+from showcontrol.config import ConfigError
+from showcontrol.metrics import metrics
+
+log = logging.getLogger(__name__)
+
+
+@dataclass
+class Panel:
+    name: str
+    address: str
+    # True: up, False: down, None: not probed yet
+    up: bool | None = None
+    since: str | None = None
+    n_failures: int = 0
+    # seconds until the first successful probe answered
+    latency: float | None = None
+    # (time, up, latency) of the last rounds
+    history: deque = field(default_factory=lambda: deque(maxlen=100))
+
+    def summary(self) -> dict:
+        return {
+            "name": self.name,
+            "address": self.address,
+            "up": self.up,
+            "since": self.since,
+            "latency": self.latency,
+        }
+
+
+def read_panel_list(panel_list: Path | str) -> list[Panel]:
+    """Reads a panel list in the format of panelList.txt, one panel per line: name address
+
+    Raises:
+        ConfigError: raised when a line is invalid or a name is not unique
+    """
+    panels = []
+    names = set()
+    with open(panel_list, "r") as f:
+        for line in f:
+            if not line.strip() or line.startswith("#"):
+                continue
+            try:
+                name, address = line.split()
+            except ValueError:
+                raise ConfigError(f"invalid line in panel list {panel_list}: {line!r}")
+            if name in names:
+                raise ConfigError(f"panel name {name} is not unique")
+            names.add(name)
+            panels.append(Panel(name, address))
+    return panels
+
+
+def parse_probe(probe: str) -> tuple[str, int]:
+    protocol, _, port = probe.partition(":")
+    if protocol not in ("udp", "tcp") or not port.isdigit():
+        raise ConfigError(
+            f"invalid panel probe {probe}, has to be udp:PORT or tcp:PORT"
+        )
+    return protocol, int(port)
+
+
+class _UDPProbe(asyncio.DatagramProtocol):
+    def __init__(self, result: asyncio.Future):
+        self.result = result
+
+    def datagram_received(self, data, addr):
+        if not self.result.done():
+            self.result.set_result(True)
+
+    def error_received(self, exc):
+        if self.result.done():
+            return
+        # icmp port unreachable: the host is up, but nothing listens on the port
+        self.result.set_result(isinstance(exc, ConnectionRefusedError))
+
+
+async def probe_udp(address: str, port: int, timeout: float) -> bool:
+    loop = asyncio.get_running_loop()
+    result = loop.create_future()
+    try:
+        transport, _ = await loop.create_datagram_endpoint(
+            lambda: _UDPProbe(result), remote_addr=(address, port)
+        )
+    except OSError:
+        return False
+    try:
+        # asyncio drops empty datagrams before python 3.12
+        transport.sendto(b"\0")
+        return await asyncio.wait_for(result, timeout)
+    except asyncio.TimeoutError:
+        return False
+    finally:
+        transport.close()
+
+
+async def probe_tcp(address: str, port: int, timeout: float) -> bool:
+    try:
+        _, writer = await asyncio.wait_for(
+            asyncio.open_connection(address, port), timeout
+        )
+    except ConnectionRefusedError:
+        return True
+    except (OSError, asyncio.TimeoutError):
+        return False
+    writer.close()
+    return True
+
+
+probe_functions = {"udp": probe_udp, "tcp": probe_tcp}
+
+
+class _OSCProtocol(asyncio.DatagramProtocol):
+    def __init__(self, monitor: "PanelMonitor"):
+        self.monitor = monitor
+
+    def datagram_received(self, data, addr):
+        try:
+            packet = OscPacket(data)
+        except ParseError:
+            return
+        for timed_message in packet.messages:
+            if timed_message.message.address == "/check/panels":
+                self.monitor.osc_request(addr[0])
+
+
+def osc_message(address: str, *args) -> bytes:
+    builder = OscMessageBuilder(address)
+    for arg in args:
+        builder.add_arg(arg)
+    return builder.build().dgram
+
+
+class PanelMonitor(object):
+    """Probes all panels every interval seconds in a background asyncio loop
+
+    Args:
+        panels (list[Panel]): panels to check
+        probes (list[str], optional): probes as protocol:port. Defaults to ["udp:9"].
+        interval (float, optional): seconds between the start of two check rounds. Defaults to 10.
+        timeout (float, optional): seconds to wait for a probe. Defaults to 1.0.
+        down_after (int, optional): failed rounds until a panel is down. Defaults to 1.
+        history (int, optional): number of rounds kept in the history of every panel. Defaults to 100.
+        concurrency (int, optional): maximum number of probes at the same time. Defaults to 256.
+        osc_address (tuple[str, int], optional): address the osc interface listens on. Defaults to None (no osc).
+        osc_reply_port (int, optional): port the osc replies are sent to. Defaults to 41231.
+        clock (SystemClock, optional): Defaults to SystemClock().
+    """
+
+    def __init__(
+        self,
+        panels: list[Panel],
+        probes: list[str] | None = None,
+        interval: float = 10,
+        timeout: float = 1.0,
+        down_after: int = 1,
+        history: int = 100,
+        concurrency: int = 256,
+        osc_address: tuple[str, int] | None = None,
+        osc_reply_port: int = 41231,
+        clock: SystemClock | None = None,
+    ):
+        self.panels = {panel.name: panel for panel in panels}
+        for panel in panels:
+            panel.history = deque(panel.history, maxlen=history)
+        self.probes = [parse_probe(p) for p in (probes or ["udp:9"])]
+        self.interval = interval
+        self.timeout = timeout
+        self.down_after = down_after
+        self.concurrency = concurrency
+        self.osc_address = osc_address
+        self.osc_reply_port = osc_reply_port
+        self.clock = SystemClock() if clock is None else clock
+
+        self.n_rounds = 0
+        self.last_round: str | None = None
+        self.last_round_duration: float | None = None
+
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._thread: Thread | None = None
+        self._wakeup: asyncio.Event | None = None
+        self._stopping = False
+        self._osc_transport = None
+        # addresses that requested a check over osc and wait for the result of the next round
+        self._osc_requests: set[str] = set()
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._stopping = False
+        self._loop = asyncio.new_event_loop()
+        self._thread = Thread(target=self._run, name="PanelMonitor", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        if self._thread is None:
+            return
+        self._stopping = True
+        self._loop.call_soon_threadsafe(self._wakeup_now)
+        self._thread.join()
+        self._thread = None
+
+    def request_check(self):
+        """starts a check round right away, can be called from any thread"""
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._wakeup_now)
+
+    def osc_request(self, address: str):
+        log.info(f"panel check requested over osc by {address}")
+        self._osc_requests.add(address)
+        self._osc_send(address, "/ping/request")
+        self._wakeup_now()
+
+    def _wakeup_now(self):
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    def _osc_send(self, address: str, *message):
+        if self._osc_transport is not None:
+            self._osc_transport.sendto(
+                osc_message(*message), (address, self.osc_reply_port)
+            )
+
+    async def probe(self, panel: Panel, semaphore: asyncio.Semaphore):
+        async with semaphore:
+            t_start = self.clock.monotonic()
+            results = await asyncio.gather(
+                *(
+                    probe_functions[protocol](panel.address, port, self.timeout)
+                    for protocol, port in self.probes
+                )
+            )
+            latency = self.clock.monotonic() - t_start
+        ok = any(results)
+        now = self.clock.now().isoformat()
+        panel.history.append((now, ok, latency if ok else None))
+        panel.latency = latency if ok else None
+
+        if ok:
+            panel.n_failures = 0
+            up = True
+        else:
+            panel.n_failures += 1
+            up = False if panel.n_failures >= self.down_after else panel.up
+        if up != panel.up:
+            if up is False:
+                log.warning(f"panel {panel.name} ({panel.address}) is down")
+            elif panel.up is False:
+                log.info(f"panel {panel.name} ({panel.address}) is up again")
+            panel.up = up
+            panel.since = now
+
+    async def check_all(self):
+        """probes all panels concurrently, a round takes at most about timeout seconds per concurrency panels"""
+        t_start = self.clock.monotonic()
+        semaphore = asyncio.Semaphore(self.concurrency)
+        await asyncio.gather(
+            *(self.probe(panel, semaphore) for panel in self.panels.values())
+        )
+        self.n_rounds += 1
+        self.last_round = self.clock.now().isoformat()
+        self.last_round_duration = self.clock.monotonic() - t_start
+        n_down = sum(1 for p in self.panels.values() if p.up is False)
+        metrics.set("panels_down", n_down)
+        metrics.set("panel_round_seconds", self.last_round_duration)
+
+    def _reply_osc_requests(self, requests: set[str]):
+        for address in requests:
+            for panel in self.panels.values():
+                if panel.up:
+                    self._osc_send(address, "/panel/ok", panel.name, panel.address)
+                else:
+                    self._osc_send(address, "/panel/error", panel.name)
+
+    async def _main(self):
+        self._wakeup = asyncio.Event()
+        if self.osc_address is not None:
+            try:
+                (
+                    self._osc_transport,
+                    _,
+                ) = await asyncio.get_running_loop().create_datagram_endpoint(
+                    lambda: _OSCProtocol(self), local_addr=self.osc_address
+                )
+            except OSError as e:
+                log.error(
+                    f"panel check osc interface could not listen on {self.osc_address[0]}:{self.osc_address[1]}: {e}"
+                )
+        try:
+            while not self._stopping:
+                self._wakeup.clear()
+                # requests that arrive during a round are answered with the results of the next one
+                requests, self._osc_requests = self._osc_requests, set()
+                await self.check_all()
+                self._reply_osc_requests(requests)
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), self.interval)
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            if self._osc_transport is not None:
+                self._osc_transport.close()
+                self._osc_transport = None
+
+    def _run(self):
+        asyncio.set_event_loop(self._loop)
+        try:
+            self._loop.run_until_complete(self._main())
+        except Exception as e:
+            log.error(f"panel monitor stopped: {e!r}")
+        finally:
+            self._loop.close()
+
+    def status(self) -> dict:
+        panels = list(self.panels.values())
+        return {
+            "enabled": True,
+            "n_panels": len(panels),
+            "n_up": sum(1 for p in panels if p.up),
+            "n_down": sum(1 for p in panels if p.up is False),
+            "last_round": self.last_round,
+            "last_round_duration": self.last_round_duration,
+            "panels": [p.summary() for p in panels],
+        }
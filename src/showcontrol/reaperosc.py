@@ -0,0 +1,166 @@
+"""REAPER OSC pattern configs (.ReaperOSC files).
+
+The stock pattern config makes REAPER send feedback for everything a control surface can display. The
+generator writes a minimal config with only the actions showcontrol sends and the feedback it reads:
+
+    showcontrol_reaperosc -o ShowControl.ReaperOSC
+"""
+
+from dataclasses import dataclass, field
+from pathlib import Path
+import logging
+import sys
+
+import click
+
+log = logging.getLogger(__name__)
+
+# pattern flags that make reaper send feedback, i (integer) and r (rotary) patterns are receive only
+feedback_flags = "nfbts"
+
+
+@dataclass
+class PatternConfig:
+    """Contents of a REAPER .ReaperOSC pattern config file
+
+    settings contains the device settings (DEVICE_TRACK_COUNT 8), actions maps every action
+    to its patterns including the flag (TRACK_MUTE: ["b/track/mute", "b/track/@/mute"])
+    """
+
+    settings: dict[str, str] = field(default_factory=dict)
+    actions: dict[str, list[str]] = field(default_factory=dict)
+
+    def get_int(self, setting: str, default: int = 0) -> int:
+        try:
+            return int(self.settings[setting])
+        except (KeyError, ValueError):
+            return default
+
+    def feedback_patterns(self, action: str) -> list[str]:
+        """Returns the osc addresses reaper sends feedback on for an action, without the flag"""
+        return [
+            p[2:]
+            for p in self.actions.get(action, [])
+            if len(p) > 2 and p[1] == "/" and p[0] in feedback_flags
+        ]
+
+
+def read_pattern_config(pattern_file: Path | str) -> PatternConfig:
+    """Reads a .ReaperOSC pattern config file
+
+    Args:
+        pattern_file (Path | str): path of the pattern config
+
+    Returns:
+        PatternConfig: settings and actions of the file, commented out lines are ignored
+    """
+    config = PatternConfig()
+    with open(pattern_file, "r") as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+
+            name, *values = line.split()
+            if not values:
+                continue
+            if name.startswith("DEVICE_") or name.startswith("REAPER_"):
+                config.settings[name] = values[0]
+            elif "/" in values[0]:
+                # actions may be split over several lines
+                config.actions.setdefault(name, []).extend(values)
+            else:
+                config.settings[name] = values[0]
+    return config
+
+
+# actions showcontrol sends to reaper, see SchedControl.play_track
+showcontrol_actions = {
+    "GOTO_REGION": ["i/region"],
+    "STOP": ["t/stop"],
+    "PLAY": ["t/play"],
+    "TRACK_MUTE": ["b/track/@/mute"],
+}
+
+# feedback read by showcontrol.syncmonitor.ReaperFeedback
+showcontrol_feedback = {
+    "TIME": ["f/time"],
+    "LAST_REGION_NUMBER": ["s/lastregion/number/str"],
+    "LAST_REGION_TIME": ["f/lastregion/time"],
+}
+
+# showcontrol only mutes track 1, no markers, regions, sends or fx are displayed
+trimmed_settings = {
+    "DEVICE_TRACK_COUNT": "1",
+    "DEVICE_SEND_COUNT": "0",
+    "DEVICE_RECEIVE_COUNT": "0",
+    "DEVICE_FX_COUNT": "0",
+    "DEVICE_FX_PARAM_COUNT": "0",
+    "DEVICE_FX_INST_PARAM_COUNT": "0",
+    "DEVICE_MARKER_COUNT": "0",
+    "DEVICE_REGION_COUNT": "0",
+    "REAPER_TRACK_FOLLOWS": "REAPER",
+    "DEVICE_TRACK_FOLLOWS": "DEVICE",
+    "DEVICE_TRACK_BANK_FOLLOWS": "DEVICE",
+    "DEVICE_FX_FOLLOWS": "DEVICE",
+}
+
+
+def trimmed_pattern_config(feedback: bool = True) -> PatternConfig:
+    """Pattern config with only the actions showcontrol sends
+
+    Args:
+        feedback (bool, optional): include the feedback the sync monitor reads (needs reaper_feedback_port).
+            Without it reaper only sends feedback for play, stop and the mute of track 1. Defaults to True.
+    """
+    actions = {
+        action: list(patterns) for action, patterns in showcontrol_actions.items()
+    }
+    if feedback:
+        for action, patterns in showcontrol_feedback.items():
+            actions.setdefault(action, []).extend(patterns)
+    return PatternConfig(dict(trimmed_settings), actions)
+
+
+def format_pattern_config(config: PatternConfig, comment: str | None = None) -> str:
+    lines = []
+    if comment is not None:
+        lines += [f"# {line}".rstrip() for line in comment.splitlines()] + [""]
+    lines += [f"{name} {value}" for name, value in config.settings.items()]
+    lines.append("")
+    lines += [
+        f"{action} {' '.join(patterns)}" for action, patterns in config.actions.items()
+    ]
+    return "\n".join(lines) + "\n"
+
+
+@click.command(
+    help="write a REAPER OSC pattern config with only the messages showcontrol uses"
+)
+@click.option(
+    "-o",
+    "--output-file",
+    type=click.Path(dir_okay=False, writable=True, path_type=Path),
+    default=None,
+    help="file to write the pattern config to, defaults to stdout",
+)
+@click.option(
+    "--feedback/--no-feedback",
+    default=True,
+    help="include the time and region feedback the sync monitor reads",
+)
+def main(output_file: Path | None, feedback: bool):
+    config = trimmed_pattern_config(feedback)
+    text = format_pattern_config(
+        config,
+        "generated by showcontrol_reaperosc, only contains the messages showcontrol uses",
+    )
+    if output_file is None:
+        sys.stdout.write(text)
+    else:
+        with open(output_file, "w") as f:
+            f.write(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""Redundant sending of idempotent commands.
+
+A lost datagram is only noticed by the audience: a screen stays frozen on the first frame of a video, or
+reaper keeps playing the previous region. Commands that leave the receiver in the same state no matter how
+often they arrive are therefore sent several times in a short burst. Commands that change state relative to
+the current one (a relative seek, reaper /stop and /play, which restart the transport) are sent once.
+
+config example:
+
+    # copies of every idempotent command, 1 disables the redundancy
+    redundancy: 3
+    # seconds between two copies
+    redundancy_spacing: 0.0002
+"""
+
+from collections.abc import Callable
+import re
+
+from showcontrol.clock import SystemClock
+
+# mpv commands that set an absolute state
+idempotent_video_commands = {"playlist-play-index", "set_property", "loadfile"}
+
+# reaper osc addresses that set an absolute state
+idempotent_osc_addresses = re.compile(
+    r"^/(region|marker|track/\d+/(mute|solo|volume))$"
+)
+
+
+def is_idempotent_video_command(command: list) -> bool:
+    """True if the mpv command can be repeated without changing its effect"""
+    if not command:
+        return False
+    if command[0] == "seek":
+        # only absolute seeks, relative ones add up
+        return len(command) > 2 and str(command[2]).startswith("absolute")
+    return command[0] in idempotent_video_commands
+
+
+def is_idempotent_osc_message(address: str) -> bool:
+    """True if the reaper osc message can be repeated without changing its effect"""
+    return idempotent_osc_addresses.match(address) is not None
+
+
+def send_burst(
+    send: Callable[[], int],
+    copies: int,
+    spacing: float = 0.0002,
+    clock: SystemClock | None = None,
+) -> tuple[int, int]:
+    """calls send copies times, waiting spacing seconds in between
+
+    Args:
+        send (Callable[[], int]): sends one copy, returns the number of datagrams sent
+        copies (int): number of copies, at least one copy is sent
+        spacing (float, optional): seconds between two copies. Defaults to 0.0002.
+        clock (SystemClock, optional): Defaults to SystemClock().
+
+    Returns:
+        tuple[int, int]: number of datagrams sent, number of those that were duplicates
+    """
+    clock = SystemClock() if clock is None else clock
+    n_sent = 0
+    n_duplicates = 0
+    for copy in range(max(1, copies)):
+        if copy and spacing > 0:
+            clock.sleep(spacing)
+        n = send()
+        n_sent += n
+        if copy:
+            n_duplicates += n
+    return n_sent, n_duplicates
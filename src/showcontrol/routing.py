@@ -0,0 +1,300 @@
+"""JACK routing of the snapshots in config/snapshots and of running JACK servers.
+
+aj-snapshot files are parsed with iterparse, so even snapshots with thousands of connections are read in
+one pass without building the xml tree. A snapshot is compiled into a RoutingGraph, an index of
+client: port: destinations. Two graphs are compared connection by connection, so a routing error of a
+running server (jack_lsp -c -p) against its snapshot shows up before the show:
+
+    showcontrol_routing check main
+    ssh avm@172.25.18.201 jack_lsp -c -p | showcontrol_routing check main -l -
+    showcontrol_routing diff wfs1 wfs2
+"""
+
+from collections.abc import Iterable
+from dataclasses import dataclass, field
+from pathlib import Path
+import subprocess
+import sys
+import time
+import xml.etree.ElementTree as ET
+
+import click
+
+from showcontrol import config as showcontrol_config
+from showcontrol.config import ConfigError, find_config_files
+
+snapshots_dirname = "snapshots"
+snapshot_suffix = ".snap"
+
+
+def port_name(client: str, port: str) -> str:
+    return f"{client}:{port}"
+
+
+def split_port_name(name: str) -> tuple[str, str]:
+    client, _, port = name.partition(":")
+    return client, port
+
+
+@dataclass
+class RoutingGraph:
+    """Connections of a JACK server
+
+    In a directed graph the destinations of a port are the input ports its output is connected to. jack_lsp
+    without -p does not tell inputs from outputs, its graph is undirected and lists the connections of both
+    ends.
+    """
+
+    name: str
+    # client: port: full names of the ports it is connected to
+    clients: dict[str, dict[str, set[str]]] = field(default_factory=dict)
+    directed: bool = True
+
+    def add_port(self, client: str, port: str) -> set[str]:
+        return self.clients.setdefault(client, {}).setdefault(port, set())
+
+    def add_connection(self, source: str, destination: str):
+        self.add_port(*split_port_name(source)).add(destination)
+
+    def ports(self) -> set[str]:
+        return {
+            port_name(client, port)
+            for client, ports in self.clients.items()
+            for port in ports
+        }
+
+    def connections(self, directed: bool = True) -> set[tuple[str, str]]:
+        """(source, destination) of every connection, sorted pairs of port names if not directed"""
+        connections = set()
+        for client, ports in self.clients.items():
+            for port, destinations in ports.items():
+                source = port_name(client, port)
+                for destination in destinations:
+                    if directed:
+                        connections.add((source, destination))
+                    else:
+                        connections.add(tuple(sorted((source, destination))))
+        return connections
+
+    @property
+    def n_connections(self) -> int:
+        return len(self.connections(self.directed))
+
+
+def read_snapshot(path: Path | str, name: str | None = None) -> RoutingGraph:
+    """Reads the jack section of an aj-snapshot file, the alsa section is skipped
+
+    Raises:
+        ConfigError: raised when the file is no valid snapshot
+    """
+    path = Path(path)
+    graph = RoutingGraph(path.stem if name is None else name)
+    client = None
+    destinations = None
+    in_jack = False
+    try:
+        for event, elem in ET.iterparse(path, events=("start", "end")):
+            if event == "start":
+                if elem.tag == "jack":
+                    in_jack = True
+                elif not in_jack:
+                    continue
+                elif elem.tag == "client":
+                    client = elem.get("name")
+                    graph.clients.setdefault(client, {})
+                elif elem.tag == "port" and client is not None:
+                    destinations = graph.add_port(client, elem.get("name"))
+                elif elem.tag == "connection" and destinations is not None:
+                    destinations.add(elem.get("port"))
+            else:
+                if elem.tag == "jack":
+                    in_jack = False
+                elif elem.tag == "client":
+                    client = None
+                    # the client is in the graph, drop its elements
+                    elem.clear()
+                elif elem.tag == "port":
+                    destinations = None
+    except ET.ParseError as e:
+        raise ConfigError(f"could not read snapshot {path}: {e}")
+    return graph
+
+
+def parse_jack_lsp(lines: Iterable[str], name: str = "live") -> RoutingGraph:
+    """Reads the output of jack_lsp -c, with -p the graph is directed like a snapshot
+
+    jack_lsp prints every port at the start of a line, followed by its connections and properties
+    indented by spaces.
+    """
+    # port name: connected ports, output ports
+    connected: dict[str, set[str]] = {}
+    outputs = set()
+    has_properties = False
+    current = None
+    for line in lines:
+        line = line.rstrip("\n")
+        if not line.strip():
+            continue
+        if not line[0].isspace():
+            current = line
+            connected.setdefault(current, set())
+        elif current is None:
+            continue
+        elif line.strip().startswith("properties:"):
+            has_properties = True
+            properties = line.split(":", 1)[1].split(",")
+            if "output" in (p.strip() for p in properties):
+                outputs.add(current)
+        else:
+            connected[current].add(line.strip())
+
+    graph = RoutingGraph(name, directed=has_properties)
+    for port, destinations in connected.items():
+        ports = graph.add_port(*split_port_name(port))
+        # in a directed graph only outputs have destinations, like in aj-snapshot
+        if not has_properties or port in outputs:
+            ports.update(destinations)
+    return graph
+
+
+def read_jack_lsp(server: str | None = None) -> RoutingGraph:
+    """Reads the connections of a local JACK server with jack_lsp -c -p"""
+    args = ["jack_lsp", "-c", "-p"]
+    if server is not None:
+        args += ["-s", server]
+    result = subprocess.run(args, capture_output=True, text=True, check=True)
+    return parse_jack_lsp(result.stdout.splitlines(), name=server or "live")
+
+
+@dataclass
+class RoutingDiff:
+    expected: str
+    actual: str
+    # connections of expected that are missing in actual and connections only in actual
+    missing: list[tuple[str, str]]
+    extra: list[tuple[str, str]]
+    # clients of expected without a single port in actual
+    missing_clients: list[str]
+
+    @property
+    def ok(self) -> bool:
+        return not (self.missing or self.extra or self.missing_clients)
+
+    def lines(self) -> list[str]:
+        lines = [f"client {client} is missing" for client in self.missing_clients]
+        lines += [
+            f"- {source} -> {destination}" for source, destination in self.missing
+        ]
+        lines += [f"+ {source} -> {destination}" for source, destination in self.extra]
+        return lines
+
+
+def diff_graphs(expected: RoutingGraph, actual: RoutingGraph) -> RoutingDiff:
+    """compares the connections of two graphs, directions are ignored if one of them is undirected"""
+    directed = expected.directed and actual.directed
+    expected_connections = expected.connections(directed)
+    actual_connections = actual.connections(directed)
+    return RoutingDiff(
+        expected.name,
+        actual.name,
+        missing=sorted(expected_connections - actual_connections),
+        extra=sorted(actual_connections - expected_connections),
+        missing_clients=sorted(
+            client
+            for client, ports in expected.clients.items()
+            if client not in actual.clients and ports
+        ),
+    )
+
+
+def find_snapshot(snapshot: str) -> Path:
+    """a snapshot file, or the name of a snapshot in the snapshots dir of the config"""
+    path = Path(snapshot)
+    if path.is_file():
+        return path
+    if showcontrol_config.config_paths is None:
+        find_config_files()
+    snapshots_dir = (
+        showcontrol_config.config_paths.config_file_path.parent / snapshots_dirname
+    )
+    path = snapshots_dir / f"{snapshot}{snapshot_suffix}"
+    if not path.is_file():
+        raise ConfigError(f"snapshot {snapshot} not found in {snapshots_dir}")
+    return path
+
+
+def print_diff(diff: RoutingDiff, t_elapsed: float):
+    for line in diff.lines():
+        click.echo(line)
+    click.echo(
+        f"{diff.expected} -> {diff.actual}: {len(diff.missing)} missing, {len(diff.extra)} extra connections, "
+        f"{len(diff.missing_clients)} missing clients ({t_elapsed * 1000:.1f} ms)",
+        err=True,
+    )
+
+
+config_dir_option = click.option(
+    "-c",
+    "--config-dir",
+    "config_dir",
+    type=click.Path(
+        exists=True, dir_okay=True, file_okay=False, resolve_path=True, path_type=Path
+    ),
+    help="path to configfile",
+)
+
+
+@click.group(
+    help="compare JACK routing snapshots with each other and with running servers"
+)
+def main():
+    pass
+
+
+@main.command(help="compare two snapshots, exits with 1 if they differ")
+@config_dir_option
+@click.argument("expected")
+@click.argument("actual")
+def diff(config_dir: Path | None, expected: str, actual: str):
+    if config_dir is not None:
+        find_config_files(config_dir)
+    t_start = time.perf_counter()
+    result = diff_graphs(
+        read_snapshot(find_snapshot(expected)), read_snapshot(find_snapshot(actual))
+    )
+    print_diff(result, time.perf_counter() - t_start)
+    sys.exit(0 if result.ok else 1)
+
+
+@main.command(
+    help="compare the routing of a JACK server with a snapshot, exits with 1 if they differ"
+)
+@config_dir_option
+@click.option(
+    "-l",
+    "--live",
+    type=click.File("r"),
+    default=None,
+    help="output of jack_lsp -c -p, - for stdin. Defaults to running jack_lsp on this machine",
+)
+@click.option("-s", "--server", default=None, help="name of the local JACK server")
+@click.argument("snapshot")
+def check(config_dir: Path | None, live, server: str | None, snapshot: str):
+    if config_dir is not None:
+        find_config_files(config_dir)
+    t_start = time.perf_counter()
+    expected = read_snapshot(find_snapshot(snapshot))
+    if live is None:
+        try:
+            actual = read_jack_lsp(server)
+        except (OSError, subprocess.CalledProcessError) as e:
+            raise click.ClickException(f"could not run jack_lsp: {e}")
+    else:
+        actual = parse_jack_lsp(live)
+    result = diff_graphs(expected, actual)
+    print_diff(result, time.perf_counter() - t_start)
+    sys.exit(0 if result.ok else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -9,21 +9,47 @@ from apscheduler.schedulers import (
     SchedulerNotRunningError,
 )
 from pythonosc.udp_client import SimpleUDPClient
+from apscheduler.jobstores.base import JobLookupError
+from apscheduler.jobstores.memory import MemoryJobStore
 from apscheduler.schedulers.background import BackgroundScheduler
-from threading import Thread
+from apscheduler.schedulers.base import BaseScheduler
+from apscheduler.triggers.date import DateTrigger
+from threading import Lock, Thread
 import yaml
+import heapq
 import os
 import socket
 import json
 import time
 import logging
+from showcontrol.catalog import TrackCatalog, read_catalog
+from showcontrol.clock import SystemClock
+from showcontrol.compiled import load_schedule
+from showcontrol.cuequeue import CueQueue, CueQueueTrigger, QueuedCue
+from showcontrol.delivery import (
+    VideoDelivery,
+    create_video_delivery,
+    read_video_players,
+)
+from showcontrol.metrics import metrics
+from showcontrol.season import DatesTrigger, parse_opening_hours
+from showcontrol.state import StateStore, ZoneState
+from showcontrol.redundancy import (
+    is_idempotent_osc_message,
+    is_idempotent_video_command,
+    send_burst,
+)
+from showcontrol.drift import DriftCorrector
+from showcontrol.failover import Failover
+from showcontrol.syncmonitor import ReaperFeedback, SyncPoller
+from showcontrol.validation import ValidationResult, log_result, validate_schedule
 from showcontrol.config import (
     ConfigError,
+    ZoneConfig,
     find_config_files,
     get_config,
     read_config_option,
-    read_schedule,
-    read_tracks,
+    read_zones,
 )
 
 logFormat = "%(asctime)s [%(threadName)-12.12s] [%(levelname)-5.5s]: %(message)s"
@@ -33,18 +59,63 @@ log = logging.getLogger(__name__)
 
 
 class SchedControl(object):
-    def __init__(self):
-
-        self.config = get_config()
+    """Engine of one zone: its reaper, video players, tracks and schedule.
+
+    Args:
+        clock (SystemClock, optional): Defaults to SystemClock().
+        zone (ZoneConfig, optional): zone to control. Defaults to the first zone of the config.
+        scheduler (BaseScheduler, optional): scheduler shared with other zones, the jobs of this zone are kept in
+            a jobstore named after the zone. Defaults to a BackgroundScheduler owned by this engine.
+        catalog (TrackCatalog, optional): tracks shared with other zones that use the same tracks dir. Defaults
+            to reading the tracks dir of the zone.
+    """
+
+    def __init__(
+        self,
+        clock: SystemClock | None = None,
+        zone: ZoneConfig | None = None,
+        scheduler: BaseScheduler | None = None,
+        catalog: TrackCatalog | None = None,
+    ):
+        # set before anything can fail, __del__ stops a partly created engine
+        self.owns_scheduler = False
+        self.video_delivery: VideoDelivery | None = None
+        self.reaper_feedback: ReaperFeedback | None = None
+        self.sync_poller: SyncPoller | None = None
+        self.drift_corrector: DriftCorrector | None = None
+
+        if zone is None:
+            zone = read_zones(get_config())[0]
+        self.zone = zone
+        self.name = zone.name
+        self.config = zone.config
+        self.clock = SystemClock() if clock is None else clock
         # read track configs
-        self.generate_track_list()
+        if catalog is None:
+            self.generate_track_list()
+        else:
+            self.tracks = catalog
 
         # setup ports and ip for video panels
         self.video_broadcast_ip = read_config_option(self.config, "broadcast_ip", str)
         self.video_broadcast_port = read_config_option(self.config, "video_port", int)
         self.info_broadcast_port = read_config_option(self.config, "info_port", int)
+        self.video_delivery = create_video_delivery(self.config)
+
+        # idempotent commands are sent this many times
+        self.redundancy = read_config_option(self.config, "redundancy", int, 1)
+        self.redundancy_spacing = read_config_option(
+            self.config, "redundancy_spacing", float, 0.0002
+        )
 
         self.playing = False
+        # saves the pause state, the last cue and the queue, see showcontrol.state
+        self.state: StateStore | None = None
+        # scheduled cues of this zone are skipped while paused, the scheduler may be shared with other zones
+        self.paused = False
+        # (track_id, monotonic time) of the last track that was started
+        self.last_cue: tuple[str, float] | None = None
+        self.failover: Failover | None = None
 
         # setup reaper connection
         self.reaper_hostname = read_config_option(
@@ -53,23 +124,114 @@ class SchedControl(object):
         self.reaper_port = read_config_option(self.config, "reaper_port", int, 8000)
 
         self.reaper = SimpleUDPClient(self.reaper_hostname, self.reaper_port)
-        print(f"communicating with reaper at {self.reaper_hostname}:{self.reaper_port}")
+        print(
+            f"zone {self.name}: communicating with reaper at {self.reaper_hostname}:{self.reaper_port}"
+        )
 
         # setup scheduler
-        self.sched = BackgroundScheduler()
+        self.owns_scheduler = scheduler is None
+        self.sched = BackgroundScheduler() if scheduler is None else scheduler
+        self.sched.add_jobstore(MemoryJobStore(), alias=self.name)
         self.add_jobs_to_scheduler()
 
+        # tracks queued through the api, see showcontrol.cuequeue
+        self.cue_queue = CueQueue(self.get_track_duration)
+        self.queue_job_id = f"{self.name}_cue_queue"
+        self._queue_lock = Lock()
+        self.arm_cue_queue()
+
+        self.setup_monitoring()
+
+    def setup_monitoring(self):
+        """creates the listener for the reaper feedback, the poller of the video players and the drift correction, if they are configured"""
+        self.reaper_feedback = None
+        feedback_port = read_config_option(self.config, "reaper_feedback_port", int)
+        if feedback_port is not None:
+            listen_ip = read_config_option(self.config, "listen_ip", str, "0.0.0.0")
+            self.reaper_feedback = ReaperFeedback(
+                (listen_ip, feedback_port), clock=self.clock
+            )
+
+        self.sync_poller = None
+        poll_interval = read_config_option(self.config, "sync_poll_interval", float)
+        if poll_interval:
+            self.sync_poller = SyncPoller(
+                create_video_delivery(self.config),
+                read_video_players(self.config),
+                self.info_broadcast_port,
+                name=self.name,
+                reaper_feedback=self.reaper_feedback,
+                interval=poll_interval,
+                timeout=read_config_option(
+                    self.config, "sync_poll_timeout", float, 0.2
+                ),
+                history=read_config_option(self.config, "sync_history", int, 600),
+                skew_threshold=read_config_option(
+                    self.config, "sync_skew_threshold", float, 0.1
+                ),
+                reaper_threshold=read_config_option(
+                    self.config, "sync_reaper_threshold", float, 0.2
+                ),
+                clock=self.clock,
+            )
+
+        self.drift_corrector = None
+        if read_config_option(self.config, "drift_correction", bool, False):
+            if self.sync_poller is None or self.reaper_feedback is None:
+                raise ConfigError(
+                    "drift_correction needs sync_poll_interval and reaper_feedback_port"
+                )
+            self.drift_corrector = DriftCorrector(
+                lambda command, targets: self.send_udp_broadcast(
+                    command, self.video_broadcast_port, targets
+                ),
+                self.reaper_feedback,
+                targeted=self.video_delivery.can_target,
+                name=self.name,
+                poll_interval=poll_interval,
+                threshold=read_config_option(
+                    self.config, "drift_threshold", float, 0.04
+                ),
+                seek_threshold=read_config_option(
+                    self.config, "drift_seek_threshold", float, 1.0
+                ),
+                max_speed_change=read_config_option(
+                    self.config, "drift_max_speed_change", float, 0.02
+                ),
+                min_interval=read_config_option(
+                    self.config, "drift_min_interval", float, 10
+                ),
+                seek_min_interval=read_config_option(
+                    self.config, "drift_seek_min_interval", float, 60
+                ),
+                clock=self.clock,
+            )
+            self.sync_poller.on_sample = self.drift_corrector.update
+
     def start_scheduler(self):
-        try:
-            self.sched.start()
-        except SchedulerAlreadyRunningError:
-            pass
+        """starts the scheduler if this engine owns it, and the monitoring of reaper and the video players"""
+        if self.owns_scheduler:
+            try:
+                self.sched.start()
+            except SchedulerAlreadyRunningError:
+                pass
+        if self.reaper_feedback is not None:
+            self.reaper_feedback.start()
+        if self.sync_poller is not None:
+            self.sync_poller.start()
 
     def stop_scheduler(self):
-        try:
-            self.sched.shutdown(wait=False)
-        except SchedulerNotRunningError:
-            pass
+        if self.sync_poller is not None:
+            self.sync_poller.close()
+        if self.reaper_feedback is not None:
+            self.reaper_feedback.close()
+        if self.owns_scheduler:
+            try:
+                self.sched.shutdown(wait=False)
+            except SchedulerNotRunningError:
+                pass
+        if self.video_delivery is not None:
+            self.video_delivery.close()
 
     def __del__(self):
         self.stop_scheduler()
@@ -80,38 +242,63 @@ class SchedControl(object):
         Args:
             track_nr (int): index of the track to start playing
         """
-        self.reaper.send_message("/region", [track_nr])
+        self.send_reaper("/region", [track_nr])
         # if playing == False:
-        self.reaper.send_message("/stop", [1.0])
-        self.reaper.send_message("/play", [1.0])
+        self.send_reaper("/stop", [1.0])
+        self.send_reaper("/play", [1.0])
         log.info("started track {} in reaper", track_nr)
 
-    def send_udp_broadcast(self, command_dict: dict, port=None):
-        """Sends the command in command_dict to the ip address defined in self.video_broadcast_ip
-        if no port is specified, it will send the broadcast to all defined brooadcast ports
+    def send_reaper(self, address: str, value):
+        """sends an osc message to reaper, idempotent messages are repeated according to the redundancy config"""
+        copies = self.redundancy if is_idempotent_osc_message(address) else 1
+
+        def send() -> int:
+            self.reaper.send_message(address, value)
+            return 1
+
+        n_sent, n_duplicates = send_burst(
+            send, copies, self.redundancy_spacing, self.clock
+        )
+        metrics.increment("osc_messages_sent", n_sent, zone=self.name)
+        metrics.increment("osc_duplicates_sent", n_duplicates, zone=self.name)
+
+    def send_udp_broadcast(self, command_dict: dict, port=None, targets=None):
+        """Sends the command in command_dict to the video players using the configured delivery mode
+        (broadcast, multicast or unicast). if no port is specified, it will send the command to all defined ports
 
         Args:
             command_dict (dict): should follow the format {"command": [COMMAND_NAME, ARGS*]}
-            port (int, optional): Port the broadcast is sent to. Defaults to None.
+            port (int, optional): Port the command is sent to. Defaults to None.
+            targets (list[str], optional): names of the players to send to, only possible with unicast delivery. Defaults to None (all players).
         """
         # command_dict.update({"async": True})
         message = json.dumps(command_dict).encode("utf-8") + b"\n"
-        print(message)
-
-        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-        sock.setsockopt(socket.SOL_SOCKET, socket.SO_BROADCAST, 1)
+        log.debug(message)
 
         if port:
-            sock.sendto(message, (self.video_broadcast_ip, port))
+            ports = [port]
         else:
-            sock.sendto(message, (self.video_broadcast_ip, self.video_broadcast_port))
-            sock.sendto(message, (self.video_broadcast_ip, self.info_broadcast_port))
-        sock.close()
+            ports = [self.video_broadcast_port, self.info_broadcast_port]
+
+        # idempotent commands are repeated, a single lost datagram would leave a screen frozen
+        if is_idempotent_video_command(command_dict.get("command", [])):
+            copies = self.redundancy
+        else:
+            copies = 1
+        n_sent, n_duplicates = send_burst(
+            lambda: self.video_delivery.send(message, ports, targets),
+            copies,
+            self.redundancy_spacing,
+            self.clock,
+        )
+        metrics.increment("video_commands_sent", zone=self.name)
+        metrics.increment("video_datagrams_sent", n_sent, zone=self.name)
+        metrics.increment("video_duplicates_sent", n_duplicates, zone=self.name)
 
     def video_pause(self):
         self.playing = False
         try:
-            time.sleep(0.05)
+            self.clock.sleep(0.05)
             self.send_udp_broadcast({"command": ["set_property", "pause", "yes"]})
         except:
             print("sending pause command failed")
@@ -119,28 +306,37 @@ class SchedControl(object):
     def video_resume(self):
         self.playing = True
         try:
-            time.sleep(0.1)
+            self.clock.sleep(0.1)
             self.send_udp_broadcast({"command": ["set_property", "pause", "no"]})
         except:
             print("sending play command failed")
 
+    @property
+    def paused(self) -> bool:
+        return self._paused
+
+    @paused.setter
+    def paused(self, paused: bool):
+        self._paused = paused
+        self.save_state()
+
     def scheduler_pause(self):
         """Pauses scheduler and playback"""
-        log.info("Pausing Scheduler")
-        self.sched.pause()
+        log.info(f"Pausing Scheduler of zone {self.name}")
+        self.paused = True
 
-        self.reaper.send_message("/track/1/mute", [1])
-        time.sleep(0.5)
-        self.reaper.send_message("/stop", [1.0])
+        self.send_reaper("/track/1/mute", [1])
+        self.clock.sleep(0.5)
+        self.send_reaper("/stop", [1.0])
 
         # Video nr 0 starts with a black screen
         self.play_video(0, start_paused=True)
 
     def scheduler_resume(self):
         """Resumes the scheduler. Playback is not resumed"""
-        log.info("Resuming Scheduler")
-        self.reaper.send_message("/track/1/mute", [0])
-        self.sched.resume()
+        log.info(f"Resuming Scheduler of zone {self.name}")
+        self.send_reaper("/track/1/mute", [0])
+        self.paused = False
 
     def play_track(
         self,
@@ -155,11 +351,11 @@ class SchedControl(object):
         """
 
         if pause_scheduler:
-            print("pausing scheduler")
-            self.sched.pause()
+            print(f"pausing scheduler of zone {self.name}")
+            self.paused = True
 
         # unmute reaper
-        self.reaper.send_message("/track/1/mute", [0])
+        self.send_reaper("/track/1/mute", [0])
 
         if not isinstance(track_id, str):
             print("Error: Play_track argument wasn't of type string")
@@ -170,12 +366,32 @@ class SchedControl(object):
             raise KeyError("Invalid Track")
 
         log.info(
-            f"Play track: {track_id} (audio_index {track['audio_index']}, video_index {track['video_index']}"
+            f"Play track: {track_id} (audio_index {track.audio_index}, video_index {track.video_index}"
         )
 
-        self.play_reaper(track["audio_index"])
-        if "video_index" in track:
-            self.play_video(track["video_index"])
+        self.last_cue = (track_id, self.clock.monotonic())
+        self.save_state()
+        self.play_reaper(track.audio_index)
+        if track.video_index is not None:
+            self.play_video(track.video_index)
+
+        if self.failover is not None:
+            self.failover.cue_fired(self.name, track_id)
+
+    def play_scheduled_track(self, track_id: str):
+        """starts playing a track from the schedule. Does nothing if the zone is paused or this instance
+        is the failover standby
+
+        Args:
+            track_id (str): id of the track to start playing
+        """
+        if self.paused:
+            return
+        if self.failover is not None and not self.failover.may_fire(
+            self.name, track_id
+        ):
+            return
+        self.play_track(track_id, pause_scheduler=False)
 
     def play_video(self, video_index, start_paused=False):
         """Play the video with the given index on all video players, using their specified broadcast addresses
@@ -192,7 +408,7 @@ class SchedControl(object):
             # machines are on "freeze on first frame", so the video players inside need an explicit play/unpause command.
             # start the video on the inner screens
             if not start_paused:
-                time.sleep(0.03)
+                self.clock.sleep(0.03)
                 self.send_udp_broadcast(
                     {"command": ["set_property", "pause", "no"], "async": True},
                     self.video_broadcast_port,
@@ -204,47 +420,327 @@ class SchedControl(object):
             )
 
     def add_jobs_to_scheduler(self):
-        """Read the schedule specified in the config files, then add all jobs to the scheduler"""
-        for job in read_schedule():
+        """Read the schedule specified in the config files, then add all jobs to the scheduler
+
+        Entries with a day_of_week repeat every week. Entries with a date (see showcontrol.season) are only
+        played on that date, all dated entries of a track share one job.
+
+        A compiled schedule (see showcontrol.compiled) next to the schedule file is loaded instead of the yaml
+        file if it is up to date. The schedule is checked first (see showcontrol.validation), entries with unknown tracks or invalid
+        times are skipped.
+
+        Raises:
+            ConfigError: raised when the schedule has errors and schedule_strict is set
+        """
+        schedule = load_schedule(self.zone.schedule_file_path)
+        self.schedule_validation = self.validate_schedule(schedule)
+        if not self.schedule_validation.ok and read_config_option(
+            self.config, "schedule_strict", bool, False
+        ):
+            raise ConfigError(
+                f"schedule of zone {self.name} has errors: {self.schedule_validation.summary()}"
+            )
+
+        dated: dict[str, list[datetime]] = {}
+        for i, job in enumerate(schedule):
+            if i in self.schedule_validation.invalid_entries:
+                continue
             if job["command"] != "play":
                 log.warning(
                     f"could not add job from schedule: invalid command {job['command']}"
                 )
                 continue
 
+            if "date" in job:
+                day = job["date"]
+                run_date = datetime(
+                    day.year,
+                    day.month,
+                    day.day,
+                    job["hour"],
+                    job["minute"],
+                    job["second"],
+                )
+                dated.setdefault(job["track_id"], []).append(run_date.astimezone())
+                continue
+
             self.sched.add_job(
-                self.play_track,
+                self.play_scheduled_track,
                 "cron",
                 hour=job["hour"],
                 minute=job["minute"],
                 second=job["second"],
                 day_of_week=job["day_of_week"],
-                args=[
-                    job["track_id"],
-                    False,
-                ],  # first arg is track_id, second is whether scheduler should be paused
+                args=[job["track_id"]],
+                jobstore=self.name,
+            )
+
+        for track_id, run_dates in dated.items():
+            self.sched.add_job(
+                self.play_scheduled_track,
+                DatesTrigger(run_dates),
+                args=[track_id],
+                jobstore=self.name,
             )
 
-    def schedule_track(self, track_id: str, in_seconds: int):
+    def validate_schedule(self, schedule: list[dict]) -> ValidationResult:
+        """checks the schedule against the tracks and the opening_hours of the config and logs the issues"""
+        opening_hours = read_config_option(self.config, "opening_hours", str, None)
+        result = validate_schedule(
+            schedule,
+            self.tracks,
+            None if opening_hours is None else parse_opening_hours(opening_hours),
+            read_config_option(self.config, "schedule_max_gap", float, 900),
+        )
+        log_result(result, f"schedule of zone {self.name}")
+        return result
+
+    def schedule_track(self, track_id: str, in_seconds: int) -> QueuedCue:
+        """queues a track in in_seconds, see queue_track"""
+        return self.queue_track(track_id, in_seconds=in_seconds)
+
+    def cue_time(
+        self,
+        when: datetime | None = None,
+        in_seconds: float | None = None,
+        append: bool = False,
+    ) -> datetime:
+        """Fire time of a cue: at when, in in_seconds or, with append, when the track that is playing and all
+        queued cues have ended
+
+        Raises:
+            ValueError: raised when the time is in the past or not exactly one of the options is given
+        """
+        now = self.clock.now()
+        if (when is not None) + (in_seconds is not None) + bool(append) != 1:
+            raise ValueError("give exactly one of a time, an interval or append")
+        if append:
+            when = now
+            if self.last_cue is not None:
+                track_id, started = self.last_cue
+                remaining = self.get_track_duration(track_id) - (
+                    self.clock.monotonic() - started
+                )
+                when = max(when, now + timedelta(seconds=remaining))
+            tail = self.cue_queue.tail()
+            if tail is not None:
+                when = max(when, tail)
+            return when
+        if in_seconds is not None:
+            if in_seconds < 0:
+                raise ValueError(f"interval {in_seconds} is negative")
+            return now + timedelta(seconds=in_seconds)
+        if when < now:
+            raise ValueError(f"{when.isoformat()} is in the past")
+        return when
+
+    def queue_track(
+        self,
+        track_id: str,
+        when: datetime | None = None,
+        in_seconds: float | None = None,
+        append: bool = False,
+    ) -> QueuedCue:
+        """Queues a track at when, in in_seconds or after the current track and all queued cues. Queued
+        cues are skipped while the zone is paused, like the cues of the schedule
+
+        Raises:
+            KeyError: raised when the track is unknown
+            ValueError: raised when the time is in the past or not exactly one of the options is given
+        """
+        if track_id not in self.tracks:
+            raise KeyError("track_id is invalid")
+        with self._queue_lock:
+            cue = self.cue_queue.add(
+                track_id,
+                self.cue_time(when, in_seconds, append),
+                relative=when is None,
+            )
+            self.arm_cue_queue()
+            self.save_cue(cue)
+        log.info(f"zone {self.name}: queued {track_id} at {cue.time} as {cue.id}")
+        return cue
+
+    def reschedule_cue(
+        self,
+        cue_id: str,
+        when: datetime | None = None,
+        in_seconds: float | None = None,
+        append: bool = False,
+    ) -> QueuedCue:
+        """moves a queued cue, see queue_track
+
+        Raises:
+            KeyError: raised when no cue with this id is queued
+        """
+        with self._queue_lock:
+            if cue_id not in self.cue_queue:
+                raise KeyError(f"no cue {cue_id}")
+            if append:
+                # the cue itself does not count for the end of the queue
+                cue = self.cue_queue.cancel(cue_id)
+                cue = self.cue_queue.add(
+                    cue.track_id, self.cue_time(append=True), cue_id, relative=True
+                )
+            else:
+                cue = self.cue_queue.reschedule(
+                    cue_id, self.cue_time(when, in_seconds), relative=when is None
+                )
+            self.arm_cue_queue()
+            self.save_cue(cue)
+        return cue
+
+    def cancel_cue(self, cue_id: str) -> QueuedCue:
+        """
+        Raises:
+            KeyError: raised when no cue with this id is queued
+        """
+        with self._queue_lock:
+            cue = self.cue_queue.cancel(cue_id)
+            self.arm_cue_queue()
+            if self.state is not None:
+                self.state.delete_cue(cue.id)
+        log.info(f"zone {self.name}: cancelled {cue.track_id} at {cue.time}")
+        return cue
+
+    def arm_cue_queue(self):
+        """sets the queue job to the first queued cue, adds the job if it was removed"""
+        trigger = CueQueueTrigger(self.cue_queue)
         try:
-            track = self.tracks[track_id]
-        except KeyError:
-            raise KeyError(("track_id is invalid"))
-        when = datetime.now() + timedelta(seconds=in_seconds)
-        self.sched.add_job(
-            self.play_track, "date", args=[track_id, False], run_date=when
+            self.sched.reschedule_job(self.queue_job_id, self.name, trigger=trigger)
+        except JobLookupError:
+            self.sched.add_job(
+                self.play_queued_cues,
+                trigger,
+                id=self.queue_job_id,
+                name=f"cue queue of zone {self.name}",
+                jobstore=self.name,
+                # a cue that was due while the scheduler was busy is still played
+                misfire_grace_time=None,
+                coalesce=True,
+                max_instances=2,
+            )
+
+    def save_cue(self, cue: QueuedCue):
+        if self.state is not None:
+            self.state.save_cue(
+                self.name, cue.id, cue.track_id, cue.time.timestamp(), cue.relative
+            )
+
+    def save_state(self):
+        """saves the pause state and the last cue of this zone, if a StateStore is attached"""
+        if self.state is None:
+            return
+        if self.last_cue is None:
+            last_track, last_cue_time = None, None
+        else:
+            last_track, started = self.last_cue
+            # the monotonic clock does not survive a restart
+            last_cue_time = self.clock.time() - (self.clock.monotonic() - started)
+        self.state.save_zone(self.name, self.paused, last_track, last_cue_time)
+
+    def restore_state(self, saved: ZoneState, queue_grace: float = 60):
+        """Restores the state saved before a restart: the pause state, the last cue and the queued cues
+
+        Args:
+            saved (ZoneState): state of this zone as loaded by the StateStore
+            queue_grace (float, optional): seconds a queued cue may be late and still be played, older cues are
+                dropped. Defaults to 60.
+        """
+        self._paused = saved.paused
+        if saved.last_track in self.tracks and saved.last_cue_time is not None:
+            started = self.clock.monotonic() - (self.clock.time() - saved.last_cue_time)
+            self.last_cue = (saved.last_track, started)
+
+        now = self.clock.now()
+        with self._queue_lock:
+            for cue_id, track_id, timestamp, relative in saved.cues:
+                when = datetime.fromtimestamp(timestamp, now.tzinfo)
+                late = (now - when).total_seconds()
+                if track_id not in self.tracks or late > queue_grace:
+                    log.warning(
+                        f"zone {self.name}: dropped queued cue {cue_id} of {track_id} at {when}"
+                    )
+                    if self.state is not None:
+                        self.state.delete_cue(cue_id)
+                    continue
+                self.cue_queue.add(track_id, when, cue_id, relative)
+            self.arm_cue_queue()
+        log.info(
+            f"zone {self.name}: restored {'paused' if self.paused else 'running'} state "
+            f"and {len(self.cue_queue)} queued cues"
         )
 
+    def play_queued_cues(self):
+        """plays the queued cues that are due, run by the queue job"""
+        while due := self.cue_queue.pop_due(self.clock.now()):
+            for cue in due:
+                if self.state is not None:
+                    self.state.delete_cue(cue.id)
+                metrics.increment("queued_cues_fired", zone=self.name)
+                self.play_scheduled_track(cue.track_id)
+
+    def rearm_jobs(self, step: float, event: dict | None = None):
+        """Recomputes the next fire times of all jobs of this zone after the wall clock was stepped.
+
+        Cron jobs are recomputed from the current time. Date jobs and cues queued in seconds from now were
+        scheduled relative to the time they were queued at, so they are moved together with the clock. Cues
+        queued at a time of day keep it. After a backwards step no cron job is
+        allowed to fire while the last started track is still playing, so no track is played twice.
+
+        Args:
+            step (float): size of the wall clock step in seconds, negative if the clock went backwards
+            event (dict, optional): clock event as reported by the ClockWatchdog. Defaults to None.
+        """
+        now = self.clock.now()
+        earliest = now
+        if step < 0 and self.last_cue is not None:
+            track_id, started = self.last_cue
+            remaining = self.get_track_duration(track_id) - (
+                self.clock.monotonic() - started
+            )
+            if remaining > 0:
+                earliest = now + timedelta(seconds=remaining)
+
+        for job in self.sched.get_jobs(jobstore=self.name):
+            # paused jobs are recomputed when they are resumed, pending jobs when the scheduler starts
+            if getattr(job, "next_run_time", None) is None:
+                continue
+            if job.id == self.queue_job_id:
+                continue
+            if isinstance(job.trigger, DateTrigger):
+                next_run_time = job.next_run_time + timedelta(seconds=step)
+            else:
+                next_run_time = job.trigger.get_next_fire_time(None, earliest)
+            if next_run_time is None:
+                job.remove()
+            else:
+                job.modify(next_run_time=next_run_time)
+
+        # cues queued in seconds from now move like date jobs, cues at a time of day keep it
+        with self._queue_lock:
+            for cue in self.cue_queue.shift(step):
+                self.save_cue(cue)
+            self.arm_cue_queue()
+
+        log.info(f"zone {self.name}: rearmed all jobs after clock step of {step:+.3f}s")
+        if self.sched.running:
+            self.sched.wakeup()
+
+    def get_track_duration(self, track_id: str) -> float:
+        """Returns the duration of a track in seconds, 0 if the track is unknown"""
+        return self.tracks.duration(track_id)
+
     def generate_track_list(self):
-        """Reads the tracks directory and stores the tracks into the self.tracks dict
+        """Reads the tracks directory into the TrackCatalog self.tracks
 
         Raises:
-            KeyError: Raised when a track id is not unique
+            ConfigError: Raised when a track file is invalid or a name or index is not unique
         """
-        self.tracks = read_tracks(identifier_is_name=True)
+        self.tracks = read_catalog(self.zone.tracks_dir)
 
     def get_upcoming_tracks(self, n_tracks=20):
-        """Returns the next n_tracks scheduled tracks.
+        """Returns the next n_tracks scheduled or queued tracks.
 
         Args:
             n_tracks (int, optional): Number of tracks to return. Defaults to 15.
@@ -252,27 +748,32 @@ class SchedControl(object):
         Returns:
             List[Tuple[str]]: Scheduled tracks as list with tuples in the format (time, title)
         """
-        # get all jobs
-        jobs = self.sched.get_jobs()
-
-        # limit n_tracks to the number of available jobs
-        n_tracks = min(len(jobs), n_tracks)
+        # the jobs are sorted by their next run time, paused jobs come last
+        jobs = (
+            (job.next_run_time, job.args[0])
+            for job in self.sched.get_jobs(jobstore=self.name)
+            if job.id != self.queue_job_id and job.next_run_time is not None
+        )
+        cues = ((cue.time, cue.track_id) for cue in self.cue_queue.upcoming(n_tracks))
 
         # build a readable data structure out of that
         next_tracks = []
-        for job in jobs[:n_tracks]:
+        for run_time, track_id in heapq.merge(jobs, cues, key=lambda job: job[0]):
+            if len(next_tracks) == n_tracks:
+                break
             try:
-                track = self.tracks[job.args[0]]
-                next_tracks.append(
-                    (job.next_run_time.strftime("%H:%M"), track["title"])
-                )
+                track = self.tracks[track_id]
+                next_tracks.append((run_time.strftime("%H:%M"), track.title))
             except KeyError:
                 pass
 
         return next_tracks
 
     def is_running(self) -> bool:
-        return self.sched.state == apscheduler.schedulers.base.STATE_RUNNING
+        return (
+            not self.paused
+            and self.sched.state == apscheduler.schedulers.base.STATE_RUNNING
+        )
 
 
 if __name__ == "__main__":
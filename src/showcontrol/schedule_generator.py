@@ -1,12 +1,33 @@
 import yaml
 import os
-from datetime import datetime, timedelta
+import sys
+from datetime import date, datetime, timedelta
 from pathlib import Path
 import logging
 
 import click
 
-from .config import read_blocks, read_tracks
+from .compiled import CompiledScheduleWriter, compiled_path
+from .catalog import TrackCatalog, read_catalog
+from .config import read_blocks
+from .export import (
+    FullScheduleWriter,
+    ScheduleEntry,
+    TrackScheduleWriter,
+    YAMLWriter,
+    export_filenames,
+    export_paths,
+    export_schedule,
+    writer_classes,
+)
+from .season import (
+    OpeningHours,
+    ScheduledPlay,
+    Season,
+    read_season,
+    season_filename,
+)
+from .validation import ValidationResult, validate_schedule
 
 log = logging.getLogger()
 
@@ -22,53 +43,25 @@ day_numbers = {
 
 time_start = datetime(2022, 2, 1, 10, 40, 0)
 time_stop = datetime(2022, 2, 1, 18, 30, 0)
+default_opening_hours = OpeningHours(time_start.time(), time_stop.time())
 
 
-day_names = ["Mo", "Di", "Mi", "Do", "Fr", "Sa", "So"]
+def read_entries(schedule_file) -> list[ScheduleEntry]:
+    with open(schedule_file, "r") as f:
+        return [ScheduleEntry.from_dict(entry) for entry in yaml.safe_load(f)]
 
 
 def create_alternative_schedule(input_file, output_file, tracks_folder):
-    tracks = read_tracks(tracks_folder, identifier_is_name=False)
-    with open(input_file, "r") as f:
-        schedule = yaml.safe_load(f)
-
-    # prepare track dicts by adding empty runtime dicts
-    for t in tracks.values():
-        t["runtimes"] = {}
-
-    # populate runtime dicts by adding all occurances from the schedule file to them
-    for e in schedule:
-        idx = e["audio_index"]
-        day_of_week = e["day_of_week"]
-        time = f"{e['hour']:02}:{e['minute']:02}"
-
-        if day_of_week not in tracks[idx]["runtimes"]:
-            tracks[idx]["runtimes"][day_of_week] = []
-        tracks[idx]["runtimes"][day_of_week].append(time)
-
-    # write schedule to file
-    with open(output_file, "w") as f:
-        for t in tracks.values():
-            # write track title
-            f.write(t["title"] + "\n")
-
-            for day_nrs, times in t["runtimes"].items():
-                # convert day_nrs to human readable format
-                if isinstance(day_nrs, str):
-                    day_nrs = day_nrs.split(",")
-                    days = ",".join([day_names[int(d)] for d in day_nrs])
-                else:
-                    days = day_names[day_nrs]
-
-                playtimes = ", ".join(times)
-                f.write(f"\t{days:<20}\t{playtimes}\n")
-            f.write("\n")
+    """writes the play times of every track of a schedule file"""
+    tracks = read_catalog(tracks_folder)
+    export_schedule(
+        read_entries(input_file), [TrackScheduleWriter(output_file, tracks)]
+    )
 
 
 def create_readable_txt(input_file, output_file, tracks_folder):
-    track_dict = read_tracks(tracks_folder, identifier_is_name=False)
-    with open(input_file, "r") as f:
-        schedule = yaml.safe_load(f)
+    """writes every entry of a schedule file with its days, start and title"""
+    tracks = read_catalog(tracks_folder)
 
     # make sure output file is not a directory, append .txt to the output filename if it has no file ending
     if os.path.isdir(output_file):
@@ -78,52 +71,11 @@ def create_readable_txt(input_file, output_file, tracks_folder):
         if not fe:
             output_file = output_file + ".txt"
 
-    with open(output_file, "w") as outfile:
-        for scheduled_item in schedule:
-            # convert day numbers to names
-            # if there is only one day, it is already an integer
-            day_nrs = scheduled_item["day_of_week"]
-            if isinstance(day_nrs, str):
-                day_nrs = day_nrs.split(",")
-                days = ",".join([day_names[int(d)] for d in day_nrs])
-            else:
-                days = day_names[day_nrs]
-
-            timestr = f"{scheduled_item['hour']:02}:{scheduled_item['minute']:02}:{scheduled_item['second']:02}"
-
-            idx = scheduled_item["audio_index"]
-            if idx in track_dict:
-                track_title = track_dict[idx]["title"]
-                outfile.write(f"{days:<20}\t{timestr}\t{track_title}\n")
-            else:
-                print(f"index {idx} missing from track_dict")
-                outfile.write(timestr + "\n")
-    outfile.close()
-    print("Program Schedule points", len(schedule))
-    print("written programfile to", output_file)
-
-
-def writeEntry(
-    file,
-    hour,
-    minute,
-    secs,
-    audio_idx,
-    video_idx,
-    track_name: str,
-    days=[0, 1, 2, 3, 4, 5, 6],
-):
-    days = [str(d) for d in days]
-    file.write(
-        f"- track_id: {track_name}\n"
-        f"  audio_index: {audio_idx} # included for compatibility \n"
-        f"  video_index: {video_idx}  # included for compatibility \n"
-        f"  command: play\n"
-        f"  day_of_week: {','.join(days)}\n"
-        f"  hour: {hour}\n"
-        f"  minute: {minute}\n"
-        f"  second: {secs}\n"
+    n_entries = export_schedule(
+        read_entries(input_file), [FullScheduleWriter(output_file, tracks)]
     )
+    print("Program Schedule points", n_entries)
+    print("written programfile to", output_file)
 
 
 def round_up_time(timestamp: datetime, round_to_minutes=5):
@@ -131,17 +83,52 @@ def round_up_time(timestamp: datetime, round_to_minutes=5):
     return timestamp + (datetime.min - timestamp) % delta
 
 
-def create_schedule(path_config, output_file):
-    # load tracks
-    tracks = read_tracks(path_config / "tracks")
-    print(tracks)
-    # load blocks
-    blocks = read_blocks(path_config / "blocks")
-
-    # load block plan
+def fill_day(
+    block_names: list[str],
+    blocks: dict,
+    tracks: TrackCatalog,
+    start: datetime,
+    stop: datetime,
+) -> list[tuple[datetime, str]]:
+    """Fills a day with the tracks of the blocks in order. Every track starts on a multiple of 5 minutes
+    after the previous track and the padding of its block, the last track is the last one starting before stop
+
+    Returns:
+        list[tuple[datetime, str]]: start time and name of every track
+    """
+    plays = []
+    blockstart = start
+    # iterate over all blocks on a certain day
+    for blockname in block_names:
+        block = blocks[blockname]
+        trackstart = blockstart
+
+        # iterate over all tracks in a block
+        for track_name in block["tracks"]:
+            if trackstart >= stop:
+                return plays
+
+            plays.append((trackstart, track_name))
+            trackstart = round_up_time(
+                trackstart
+                + timedelta(seconds=tracks[track_name].duration)
+                + timedelta(seconds=block["track_padding"])
+            )
+        # blockstart = blockstart + timedelta(minutes=block["length"])
+        blockstart = trackstart
+        # if blockstart <= trackstart:
+        # log.warn("Block length is too short")
+    return plays
+
+
+def read_blockplan(path_config: Path) -> dict:
     with open(path_config / "blockplan.yml") as f:
-        blockplan = yaml.load(f, Loader=yaml.FullLoader)
+        return yaml.load(f, Loader=yaml.FullLoader)
 
+
+def blockplan_days(blockplan: dict) -> dict[str, list[int]]:
+    """Returns the day numbers every entry of a block plan applies to, default applies to all days
+    without an explicit entry"""
     # find days with explicit schedules
     days_explicit_schedule = set(blockplan.keys()) - set(["default"])
 
@@ -151,63 +138,128 @@ def create_schedule(path_config, output_file):
     days_default_schedule = set(day_numbers.keys()) - days_explicit_schedule
     day_numbers_default = [day_numbers[d] for d in days_default_schedule]
     day_numbers_default.sort()
-    with open(output_file, "w") as out_file:
-        # iterate over all days (including "default")
-        for day in blockplan:
-            logging.info(f"building schedule for day {day}")
-            day_over = False
-
-            # get the daynumbers for the default block plan
-            if day == "default":
-                days = day_numbers_default
-                logging.info(
-                    f"default schedule on days {', '.join(days_default_schedule)}"
-                )
-            else:
-                days = [day_numbers[day]]
-
-            blockstart = time_start
-
-            # iterate over all blocks on a certain day
-            for blockname in blockplan[day]["blocks"]:
-                block = blocks[blockname]
-
-                trackstart = blockstart
-
-                if day_over:
-                    break
-
-                # iterate over all tracks in a block
-                for track_name in block["tracks"]:
-                    if trackstart >= time_stop:
-                        day_over = True
-                        break
-
-                    audio_idx = tracks[track_name]["audio_index"]
-                    video_idx = tracks[track_name]["video_index"]
-                    track_minutes = tracks[track_name]["duration"]["minutes"]
-                    track_seconds = tracks[track_name]["duration"]["seconds"]
-
-                    writeEntry(
-                        out_file,
-                        trackstart.hour,
-                        trackstart.minute,
-                        trackstart.second,
-                        audio_idx,
-                        video_idx,
-                        track_name,
-                        days,
-                    )
-
-                    trackstart = round_up_time(
-                        trackstart
-                        + timedelta(minutes=track_minutes, seconds=track_seconds)
-                        + timedelta(seconds=block["track_padding"])
-                    )
-                # blockstart = blockstart + timedelta(minutes=block["length"])
-                blockstart = trackstart
-                # if blockstart <= trackstart:
-                # log.warn("Block length is too short")
+    return {
+        day: day_numbers_default if day == "default" else [day_numbers[day]]
+        for day in blockplan
+    }
+
+
+def day_template(
+    block_names: tuple[str, ...],
+    hours: OpeningHours,
+    blocks: dict,
+    tracks: TrackCatalog,
+) -> list[tuple[timedelta, str]]:
+    """the programme of a day with the given blocks and opening hours, as offsets from midnight"""
+    midnight = datetime.combine(datetime.min.date(), datetime.min.time())
+    plays = fill_day(
+        list(block_names),
+        blocks,
+        tracks,
+        datetime.combine(midnight.date(), hours.start),
+        datetime.combine(midnight.date(), hours.stop),
+    )
+    return [(start - midnight, track_name) for start, track_name in plays]
+
+
+def season_timeline(
+    season: Season, blocks: dict, tracks: TrackCatalog
+) -> list[ScheduledPlay]:
+    """Generates the dated programme of a whole season in one pass over its days. The programme of a day
+    only depends on its blocks and opening hours, so it is filled once for every combination and reused
+    for all other days with the same plan
+
+    Returns:
+        list[ScheduledPlay]: every play of the season in order
+    """
+    templates: dict[tuple, list[tuple[timedelta, str]]] = {}
+    timeline = []
+    for plan in season.days():
+        if plan.hours is None:
+            continue
+        key = (plan.blocks, plan.hours)
+        if key not in templates:
+            templates[key] = day_template(plan.blocks, plan.hours, blocks, tracks)
+        midnight = datetime.combine(plan.date, datetime.min.time())
+        timeline.extend(
+            ScheduledPlay(midnight + offset, track_name)
+            for offset, track_name in templates[key]
+        )
+    log.info(
+        f"season {season.start} - {season.stop}: {len(timeline)} plays from {len(templates)} day templates"
+    )
+    return timeline
+
+
+def read_programme(path_config: Path) -> tuple[TrackCatalog, dict, dict]:
+    """tracks, blocks and block plan of a config dir"""
+    return (
+        read_catalog(path_config / "tracks"),
+        read_blocks(path_config / "blocks"),
+        read_blockplan(path_config),
+    )
+
+
+def weekly_entries(
+    blockplan: dict, blocks: dict, tracks: TrackCatalog
+) -> list[ScheduleEntry]:
+    """the entries of the weekly schedule, every day of the block plan filled from opening to closing"""
+    entries = []
+    # iterate over all days (including "default")
+    for day, days in blockplan_days(blockplan).items():
+        log.info(f"building schedule for day {day}")
+        entries.extend(
+            ScheduleEntry(
+                track_name,
+                trackstart.hour,
+                trackstart.minute,
+                trackstart.second,
+                tuple(days),
+            )
+            for trackstart, track_name in fill_day(
+                blockplan[day]["blocks"], blocks, tracks, time_start, time_stop
+            )
+        )
+    return entries
+
+
+def create_season_schedule(path_config: Path, season_file: Path, output_file: Path):
+    """writes a schedule with a dated entry for every play of the season"""
+    tracks, blocks, blockplan = read_programme(path_config)
+    season = read_season(season_file, blockplan, str(default_opening_hours))
+    timeline = season_timeline(season, blocks, tracks)
+    export_schedule(
+        (ScheduleEntry.from_play(play) for play in timeline),
+        [YAMLWriter(output_file, tracks)],
+    )
+    return timeline
+
+
+def create_schedule(path_config, output_file):
+    """writes the weekly schedule"""
+    tracks, blocks, blockplan = read_programme(path_config)
+    entries = weekly_entries(blockplan, blocks, tracks)
+    export_schedule(entries, [YAMLWriter(output_file, tracks)])
+    return entries
+
+
+def validate_entries(
+    entries: list[ScheduleEntry],
+    tracks: TrackCatalog,
+    season: Season | None = None,
+    max_gap: float | None = 900,
+) -> ValidationResult:
+    """checks generated entries against the tracks and the opening hours they were generated for"""
+    if season is None:
+        opening_hours = default_opening_hours
+    else:
+
+        def opening_hours(day: date) -> OpeningHours | None:
+            return season.day(day).hours
+
+    return validate_schedule(
+        [entry.as_dict() for entry in entries], tracks, opening_hours, max_gap
+    )
 
 
 @click.command(help="generate schedules for showcontrol")
@@ -226,32 +278,134 @@ def create_schedule(path_config, output_file):
     type=click.Path(dir_okay=False, resolve_path=True, path_type=Path, file_okay=True),
     default=Path("schedule.yml"),
 )
+@click.option(
+    "-s",
+    "--season",
+    "season_file",
+    type=click.Path(dir_okay=False, resolve_path=True, path_type=Path),
+    default=None,
+    help=f"write a dated schedule for the season described in this file (see {season_filename} in showcontrol.season)",
+)
+@click.option(
+    "--compile/--no-compile",
+    "compile_schedule",
+    default=True,
+    help="also write a compiled schedule next to the output file, showcontrol loads it instead of the yaml file (see showcontrol.compiled)",
+)
+@click.option(
+    "--optimize",
+    is_flag=True,
+    help="search the block order, padding and first tracks that use the opening hours best (see showcontrol.packing)",
+)
+@click.option(
+    "-w",
+    "--workers",
+    type=click.IntRange(min=1),
+    default=None,
+    help="processes of the optimizer. Defaults to the number of cpus",
+)
+@click.option(
+    "--max-candidates",
+    type=click.IntRange(min=1),
+    default=20000,
+    show_default=True,
+    help="programmes the optimizer tries per day at most, a larger search space is sampled",
+)
+@click.option(
+    "--validate/--no-validate",
+    default=True,
+    help="check the written schedule for overlaps, gaps, tracks outside the opening hours and unknown tracks, exits with 1 on errors",
+)
+@click.option(
+    "--max-gap",
+    type=float,
+    default=900,
+    show_default=True,
+    help="seconds of silence between two tracks until a gap is reported",
+)
 @click.option(
     "-r",
     "--readable-schedule-dir",
     type=click.Path(
         exists=True, dir_okay=True, resolve_path=True, path_type=Path, file_okay=False
     ),
-    help="path to where the readable schedules should be saved",
+    help="path to where the readable schedules and other exports are saved",
     default=None,
 )
-def main(config_dir: Path, output_file: Path, readable_schedule_dir: Path | None):
-    create_schedule(config_dir, output_file)
-    today = datetime.now().strftime("%Y-%m-%d")
-
-    if readable_schedule_dir is None:
-        return
-
-    create_readable_txt(
-        output_file,
-        readable_schedule_dir / f"hufoprogram_{today}_full_schedule.txt",
-        config_dir / "tracks",
-    )
-    create_alternative_schedule(
-        output_file,
-        readable_schedule_dir / f"hufoprogram_{today}_track_schedule.txt",
-        config_dir / "tracks",
-    )
+@click.option(
+    "-e",
+    "--export",
+    "export_formats",
+    type=click.Choice(list(export_filenames)),
+    multiple=True,
+    help="formats written to the readable schedule dir, can be given multiple times. Defaults to full and tracks",
+)
+def main(
+    config_dir: Path,
+    output_file: Path,
+    season_file: Path | None,
+    compile_schedule: bool,
+    optimize: bool,
+    workers: int | None,
+    max_candidates: int,
+    validate: bool,
+    max_gap: float,
+    readable_schedule_dir: Path | None,
+    export_formats: tuple[str, ...],
+):
+    if optimize and season_file is not None:
+        raise click.UsageError("--optimize works on the weekly schedule, not a season")
+    if export_formats and readable_schedule_dir is None:
+        raise click.UsageError("--export needs a --readable-schedule-dir")
+
+    tracks, blocks, blockplan = read_programme(config_dir)
+    season = None
+    if optimize:
+        # packing builds on fill_day of this module
+        from .packing import optimized_entries
+
+        entries, report = optimized_entries(
+            blockplan, blocks, tracks, workers, max_candidates
+        )
+        for line in report:
+            print(line)
+    elif season_file is None:
+        entries = weekly_entries(blockplan, blocks, tracks)
+    else:
+        season = read_season(season_file, blockplan, str(default_opening_hours))
+        entries = [
+            ScheduleEntry.from_play(play)
+            for play in season_timeline(season, blocks, tracks)
+        ]
+
+    if validate:
+        # checked before anything is written, load_schedule would pick up a broken schedule
+        result = validate_entries(entries, tracks, season, max_gap)
+        for issue in result.issues:
+            print(f"{'error' if issue.is_error else 'warning'}: {issue}")
+        print(f"validated {output_file}: {result.summary()}")
+        if not result.ok:
+            print(f"{output_file} not written")
+            sys.exit(1)
+
+    # the timeline is built once and streamed through the schedule and all exports
+    paths = {}
+    if readable_schedule_dir is not None:
+        today = datetime.now().strftime("%Y-%m-%d")
+        paths = export_paths(
+            readable_schedule_dir, export_formats or ("full", "tracks"), today
+        )
+    writers = [YAMLWriter(output_file, tracks)] + [
+        writer_classes[name](path, tracks) for name, path in paths.items()
+    ]
+    if compile_schedule:
+        # written after the yaml file, an older compiled schedule is not loaded
+        paths["compiled"] = compiled_path(output_file)
+        writers.append(CompiledScheduleWriter(paths["compiled"], tracks))
+    n_entries = export_schedule(entries, writers)
+    print(f"written {n_entries} entries to {output_file}")
+    for path in paths.values():
+        print(f"written {path}")
 
 
 if __name__ == "__main__":
@@ -7,4 +7,3 @@ CREATE TABLE user (
   password TEXT NOT NULL,
   admin INTEGER DEFAULT FALSE
 );
-
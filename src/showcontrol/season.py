@@ -0,0 +1,330 @@
+"""Calendar of a season: the dated programme of every day between a start and an end date.
+
+The weekly block plan says which blocks run on which weekday. The season adds date ranges with their own
+block plan and opening hours, closures (holidays, maintenance) and special event days. The programme of
+the days is filled by showcontrol.schedule_generator.season_timeline.
+
+The dated timeline is written to schedule.yml with a date on every entry (showcontrol_schedule_generator
+--season), showcontrol plays these entries on their dates instead of repeating them every week.
+
+season.yml example:
+
+    start: 2026-04-01
+    end: 2026-10-31
+    opening_hours:
+      default: 10:40-18:30
+      monday: closed
+      saturday: 11:00-19:00
+    closed:
+      - date: 2026-05-01
+        reason: Labour Day
+      - from: 2026-07-20
+        to: 2026-07-26
+        reason: maintenance
+    special:
+      - date: 2026-09-12
+        name: Long Night of Museums
+        hours: 10:00-23:00
+        blocks: [block_a, block_b, block_a, block_b]
+    periods:
+      - from: 2026-07-01
+        to: 2026-08-31
+        name: summer
+        opening_hours:
+          default: 10:00-19:00
+        # same format as blockplan.yml
+        blockplan:
+          default:
+            blocks: [default, student_pieces, default]
+"""
+
+from bisect import bisect_left
+from collections.abc import Iterator
+from dataclasses import dataclass, field
+from datetime import date, datetime, time, timedelta
+from pathlib import Path
+import logging
+
+from apscheduler.triggers.base import BaseTrigger
+
+from showcontrol.config import ConfigError, read_config_file
+
+log = logging.getLogger(__name__)
+
+season_filename = "season.yml"
+
+weekday_names = [
+    "monday",
+    "tuesday",
+    "wednesday",
+    "thursday",
+    "friday",
+    "saturday",
+    "sunday",
+]
+
+
+@dataclass(frozen=True)
+class OpeningHours:
+    start: time
+    stop: time
+
+    def __str__(self) -> str:
+        return f"{self.start.strftime('%H:%M')}-{self.stop.strftime('%H:%M')}"
+
+
+@dataclass
+class DayPlan:
+    date: date
+    # None if the installation is closed
+    hours: OpeningHours | None
+    blocks: tuple[str, ...]
+    # regular, special or closed
+    kind: str = "regular"
+    # reason of a closure, name of a special day or period
+    name: str | None = None
+
+
+@dataclass(frozen=True)
+class ScheduledPlay:
+    start: datetime
+    track_id: str
+
+
+@dataclass
+class Period:
+    start: date
+    stop: date
+    name: str | None = None
+    # weekday name or default: opening hours, None if closed
+    opening_hours: dict[str, OpeningHours | None] = field(default_factory=dict)
+    # weekday name or default: blocks
+    blockplan: dict[str, tuple[str, ...]] = field(default_factory=dict)
+
+    def __contains__(self, day: date) -> bool:
+        return self.start <= day <= self.stop
+
+
+def parse_opening_hours(value) -> OpeningHours | None:
+    """parses HH:MM-HH:MM, closed or an empty value mean closed"""
+    if value is None or value is False or str(value).strip().lower() == "closed":
+        return None
+    try:
+        start, stop = (
+            datetime.strptime(t.strip(), "%H:%M").time() for t in str(value).split("-")
+        )
+    except ValueError:
+        raise ConfigError(
+            f"invalid opening hours {value!r}, have to be HH:MM-HH:MM or closed"
+        )
+    if stop <= start:
+        raise ConfigError(f"opening hours {value} end before they start")
+    return OpeningHours(start, stop)
+
+
+def parse_date(value, what: str) -> date:
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    try:
+        return date.fromisoformat(str(value))
+    except ValueError:
+        raise ConfigError(f"invalid date {value!r} in {what}, has to be YYYY-MM-DD")
+
+
+def parse_date_range(entry: dict, what: str) -> tuple[date, date]:
+    """a single date or a from-to range, both ends included"""
+    if "date" in entry:
+        day = parse_date(entry["date"], what)
+        return day, day
+    if "from" not in entry or "to" not in entry:
+        raise ConfigError(f"every entry of {what} needs a date or from and to")
+    start, stop = parse_date(entry["from"], what), parse_date(entry["to"], what)
+    if stop < start:
+        raise ConfigError(
+            f"date range {start} - {stop} in {what} ends before it starts"
+        )
+    return start, stop
+
+
+def parse_weekdays(value: dict | None, parse, what: str) -> dict:
+    weekdays = {}
+    for day, entry in (value or {}).items():
+        if day != "default" and day not in weekday_names:
+            raise ConfigError(f"unknown day {day} in {what}")
+        weekdays[day] = parse(entry)
+    return weekdays
+
+
+def parse_blockplan(blockplan: dict | None) -> dict[str, tuple[str, ...]]:
+    return parse_weekdays(blockplan, lambda entry: tuple(entry["blocks"]), "block plan")
+
+
+def dates(start: date, stop: date) -> Iterator[date]:
+    for n in range((stop - start).days + 1):
+        yield start + timedelta(days=n)
+
+
+class Season(object):
+    """Opening hours and blocks of every day of a season
+
+    Args:
+        start (date): first day
+        stop (date): last day
+        blockplan (dict): contents of blockplan.yml
+        opening_hours (dict): weekday name or default: HH:MM-HH:MM or closed
+        closed (list[dict], optional): closures with a date or from and to and an optional reason. Defaults to None.
+        special (list[dict], optional): special days with a date, name, hours and blocks. Defaults to None.
+        periods (list[dict], optional): date ranges with their own opening_hours and blockplan. Defaults to None.
+    """
+
+    def __init__(
+        self,
+        start: date,
+        stop: date,
+        blockplan: dict,
+        opening_hours: dict,
+        closed: list[dict] | None = None,
+        special: list[dict] | None = None,
+        periods: list[dict] | None = None,
+    ):
+        if stop < start:
+            raise ConfigError(f"season ends ({stop}) before it starts ({start})")
+        self.start = start
+        self.stop = stop
+        self.blockplan = parse_blockplan(blockplan)
+        self.opening_hours = parse_weekdays(
+            opening_hours, parse_opening_hours, "opening hours"
+        )
+
+        self.closed: dict[date, str | None] = {}
+        for entry in closed or []:
+            first, last = parse_date_range(entry, "closed")
+            for day in dates(first, last):
+                self.closed[day] = entry.get("reason")
+
+        self.special: dict[date, DayPlan] = {}
+        for entry in special or []:
+            first, last = parse_date_range(entry, "special")
+            hours = parse_opening_hours(entry.get("hours"))
+            for day in dates(first, last):
+                self.special[day] = DayPlan(
+                    day,
+                    hours,
+                    tuple(entry["blocks"]) if "blocks" in entry else None,
+                    "special",
+                    entry.get("name"),
+                )
+
+        self.periods: list[Period] = []
+        for entry in periods or []:
+            first, last = parse_date_range(entry, "periods")
+            self.periods.append(
+                Period(
+                    first,
+                    last,
+                    entry.get("name"),
+                    parse_weekdays(
+                        entry.get("opening_hours"),
+                        parse_opening_hours,
+                        "opening hours",
+                    ),
+                    parse_blockplan(entry.get("blockplan")),
+                )
+            )
+
+    @staticmethod
+    def _lookup(weekdays: dict, weekday: str):
+        if weekday in weekdays:
+            return weekdays[weekday]
+        return weekdays.get("default")
+
+    def day(self, day: date) -> DayPlan:
+        """the plan of a single day, special days win over closures, closures over periods"""
+        weekday = weekday_names[day.weekday()]
+        period = next((p for p in self.periods if day in p), None)
+
+        hours = self._lookup(self.opening_hours, weekday)
+        blocks = self._lookup(self.blockplan, weekday)
+        name = None
+        if period is not None:
+            name = period.name
+            if weekday in period.opening_hours or "default" in period.opening_hours:
+                hours = self._lookup(period.opening_hours, weekday)
+            if weekday in period.blockplan or "default" in period.blockplan:
+                blocks = self._lookup(period.blockplan, weekday)
+
+        if day in self.special:
+            special = self.special[day]
+            if special.hours is not None:
+                hours = special.hours
+            if special.blocks is not None:
+                blocks = special.blocks
+            if hours is None or not blocks:
+                return DayPlan(day, None, (), "closed", special.name)
+            return DayPlan(day, hours, blocks, "special", special.name)
+        if day in self.closed:
+            return DayPlan(day, None, (), "closed", self.closed[day])
+        if hours is None or not blocks:
+            return DayPlan(day, None, (), "closed", name)
+        return DayPlan(day, hours, blocks, "regular", name)
+
+    def days(self) -> Iterator[DayPlan]:
+        for day in dates(self.start, self.stop):
+            yield self.day(day)
+
+
+def read_season(
+    season_path: Path | str, blockplan: dict, opening_hours: str | None = None
+) -> Season:
+    """Reads a season.yml
+
+    Args:
+        season_path (Path | str): path of the season file
+        blockplan (dict): contents of blockplan.yml, the weekly plan of the season
+        opening_hours (str, optional): default opening hours if the season has none. Defaults to None.
+
+    Raises:
+        ConfigError: raised when the season file is invalid
+    """
+    season = read_config_file(Path(season_path))
+    if not isinstance(season, dict) or "start" not in season or "end" not in season:
+        raise ConfigError(f"season {season_path} needs a start and an end date")
+    return Season(
+        parse_date(season["start"], "season"),
+        parse_date(season["end"], "season"),
+        blockplan,
+        season.get("opening_hours") or {"default": opening_hours},
+        closed=season.get("closed"),
+        special=season.get("special"),
+        periods=season.get("periods"),
+    )
+
+
+class DatesTrigger(BaseTrigger):
+    """Fires on a sorted list of dates, used for the dated entries of a season schedule
+
+    Args:
+        run_dates (list[datetime]): timezone aware datetimes
+    """
+
+    def __init__(self, run_dates: list[datetime]):
+        self.run_dates = sorted(run_dates)
+
+    def get_next_fire_time(self, previous_fire_time, now):
+        if previous_fire_time is not None:
+            # like the cron trigger, never fire twice for the same time
+            start = min(now, previous_fire_time + timedelta(microseconds=1))
+            if start == previous_fire_time:
+                start += timedelta(microseconds=1)
+        else:
+            start = now
+        i = bisect_left(self.run_dates, start)
+        return self.run_dates[i] if i < len(self.run_dates) else None
+
+    def __str__(self):
+        return f"dates[{len(self.run_dates)}]"
+
+    def __repr__(self):
+        return f"<{self.__class__.__name__} ({len(self.run_dates)} dates)>"
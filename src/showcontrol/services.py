@@ -0,0 +1,272 @@
+"""Health of the services running on the hosts of the system section of the config.
+
+All hosts are checked concurrently, so checking the whole installation takes at most one timeout instead
+of one timeout per host. The services of a host are checked with a single command over the transport,
+by default ssh to the user of the host running systemctl --user is-active. Results are cached for ttl
+seconds, only hosts with stale results are checked again.
+
+The results are at /api/services and on the services page of the web frontend.
+
+config example:
+
+    service_check_ttl: 30
+    service_check_timeout: 5
+    service_check_command: systemctl --user is-active
+    system:
+      - name: RE01
+        ip: 172.25.18.201
+        user: avm
+        services:
+          - seamless_jack
+          - aj-snapshot
+"""
+
+from abc import ABC, abstractmethod
+from dataclasses import dataclass, field
+from threading import Lock
+import asyncio
+import logging
+import math
+import shlex
+
+from showcontrol.clock import SystemClock
+from showcontrol.config import SystemConfig
+from showcontrol.metrics import metrics
+
+log = logging.getLogger(__name__)
+
+# state of all services of a host that could not be checked
+unreachable = "unreachable"
+
+
+class TransportError(Exception):
+    pass
+
+
+class ServiceTransport(ABC):
+    """Runs the check of the services of one host, see SSHTransport"""
+
+    @abstractmethod
+    async def check(
+        self, system: SystemConfig, services: list[str], timeout: float
+    ) -> dict[str, str]:
+        """checks the services of a host
+
+        Args:
+            system (SystemConfig): host to check
+            services (list[str]): services to check
+            timeout (float): seconds the check may take
+
+        Raises:
+            TransportError: raised when the host could not be reached
+
+        Returns:
+            dict[str, str]: systemd state (active, inactive, failed, ...) of every service
+        """
+        pass
+
+
+class SSHTransport(ServiceTransport):
+    """Checks the services over ssh, needs key based login to the hosts
+
+    Args:
+        command (str, optional): run on the host with the services as arguments, has to print one state
+            per service. Defaults to "systemctl --user is-active".
+    """
+
+    def __init__(self, command: str = "systemctl --user is-active"):
+        self.command = shlex.split(command)
+
+    def ssh_args(self, system: SystemConfig, timeout: float) -> list[str]:
+        destination = system.ip if system.user is None else f"{system.user}@{system.ip}"
+        return [
+            "ssh",
+            "-o",
+            "BatchMode=yes",
+            "-o",
+            f"ConnectTimeout={max(1, math.ceil(timeout))}",
+            destination,
+            "--",
+        ]
+
+    async def check(
+        self, system: SystemConfig, services: list[str], timeout: float
+    ) -> dict[str, str]:
+        process = await asyncio.create_subprocess_exec(
+            *self.ssh_args(system, timeout),
+            *self.command,
+            *services,
+            stdin=asyncio.subprocess.DEVNULL,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+        )
+        try:
+            stdout, stderr = await asyncio.wait_for(process.communicate(), timeout)
+        except asyncio.TimeoutError:
+            process.kill()
+            await process.wait()
+            raise TransportError(f"no answer within {timeout} s")
+
+        # ssh exits with 255 on connection errors, systemctl is-active exits with 3 if a unit is not active
+        if process.returncode == 255:
+            raise TransportError(stderr.decode(errors="replace").strip())
+        states = stdout.decode(errors="replace").split()
+        if len(states) != len(services):
+            raise TransportError(
+                f"expected {len(services)} states, got {stdout!r} {stderr!r}"
+            )
+        return dict(zip(services, states))
+
+
+@dataclass
+class ServiceStatus:
+    service: str
+    state: str
+    ok: bool
+
+
+@dataclass
+class HostHealth:
+    name: str
+    ip: str
+    reachable: bool
+    services: list[ServiceStatus] = field(default_factory=list)
+    error: str | None = None
+    checked: str | None = None
+    # seconds the check took
+    duration: float | None = None
+    # monotonic time of the check, used for the ttl
+    checked_at: float = -math.inf
+
+
+class ServiceHealth(object):
+    """Checks the services of all hosts concurrently and caches the results
+
+    Args:
+        systems (list[SystemConfig]): hosts to check, hosts without services are skipped
+        transport (ServiceTransport, optional): Defaults to SSHTransport().
+        ttl (float, optional): seconds a result is reused. Defaults to 30.
+        timeout (float, optional): seconds the check of a host may take. Defaults to 5.
+        clock (SystemClock, optional): Defaults to SystemClock().
+    """
+
+    def __init__(
+        self,
+        systems: list[SystemConfig],
+        transport: ServiceTransport | None = None,
+        ttl: float = 30,
+        timeout: float = 5,
+        clock: SystemClock | None = None,
+    ):
+        self.systems = [system for system in systems if system.services]
+        self.transport = SSHTransport() if transport is None else transport
+        self.ttl = ttl
+        self.timeout = timeout
+        self.clock = SystemClock() if clock is None else clock
+
+        self.hosts: dict[str, HostHealth] = {
+            system.name: HostHealth(system.name, system.ip, reachable=False)
+            for system in self.systems
+        }
+        # only one check runs at a time, callers that wait for it get its results
+        self._lock = Lock()
+
+    async def check_host(self, system: SystemConfig) -> HostHealth:
+        t_start = self.clock.monotonic()
+        try:
+            states = await asyncio.wait_for(
+                self.transport.check(system, system.services, self.timeout),
+                self.timeout,
+            )
+            host = HostHealth(
+                system.name,
+                system.ip,
+                reachable=True,
+                services=[
+                    ServiceStatus(
+                        s, states.get(s, "unknown"), states.get(s) == "active"
+                    )
+                    for s in system.services
+                ],
+            )
+        except (TransportError, OSError, asyncio.TimeoutError) as e:
+            log.warning(f"could not check the services of {system.name}: {e!r}")
+            host = HostHealth(
+                system.name,
+                system.ip,
+                reachable=False,
+                services=[
+                    ServiceStatus(s, unreachable, False) for s in system.services
+                ],
+                error=str(e) or type(e).__name__,
+            )
+        host.checked_at = self.clock.monotonic()
+        host.checked = self.clock.now().isoformat()
+        host.duration = host.checked_at - t_start
+        return host
+
+    async def check_hosts(self, systems: list[SystemConfig]):
+        for host in await asyncio.gather(*(self.check_host(s) for s in systems)):
+            self.hosts[host.name] = host
+
+    def refresh(self, force: bool = False):
+        """checks all hosts whose results are older than ttl, blocks for at most about one timeout
+
+        Args:
+            force (bool, optional): check all hosts regardless of the age of their results. Defaults to False.
+        """
+        t_request = self.clock.monotonic()
+        with self._lock:
+            if force:
+                # a check that finished while waiting for the lock is recent enough
+                stale = [
+                    s for s in self.systems if self.hosts[s.name].checked_at < t_request
+                ]
+            else:
+                stale = [
+                    s
+                    for s in self.systems
+                    if t_request - self.hosts[s.name].checked_at > self.ttl
+                ]
+            if not stale:
+                return
+            asyncio.run(self.check_hosts(stale))
+
+        down = self.down()
+        metrics.set("services_down", len(down))
+        for system_name, service in down:
+            log.warning(f"service {service} on {system_name} is down")
+
+    def down(self) -> list[tuple[str, str]]:
+        """(host, service) of all services that are not active"""
+        return [
+            (host.name, status.service)
+            for host in self.hosts.values()
+            for status in host.services
+            if not status.ok
+        ]
+
+    def status(self, refresh: bool = False) -> dict:
+        self.refresh(force=refresh)
+        return {
+            "enabled": True,
+            "down": [
+                {"system": system, "service": service}
+                for system, service in self.down()
+            ],
+            "systems": [
+                {
+                    "name": host.name,
+                    "ip": host.ip,
+                    "reachable": host.reachable,
+                    "error": host.error,
+                    "checked": host.checked,
+                    "duration": host.duration,
+                    "services": [
+                        {"service": s.service, "state": s.state, "ok": s.ok}
+                        for s in host.services
+                    ],
+                }
+                for host in self.hosts.values()
+            ],
+        }
@@ -1,17 +1,32 @@
-from flask import Blueprint, render_template, request
+from flask import Blueprint, abort, render_template, request
 from threading import Thread
 
 import apscheduler
+from showcontrol.dispatcher import Dispatcher
 from showcontrol.schedcontrol import SchedControl
 from showcontrol.auth import login_required
 
 
-def construct_showcontrol_bluperint(schedctrl: SchedControl) -> Blueprint:
+def construct_showcontrol_bluperint(dispatcher: Dispatcher) -> Blueprint:
     bp = Blueprint("showcontrol", __name__)
 
+    def get_zone() -> SchedControl:
+        """zone selected with the zone query parameter, the default zone if there is none"""
+        zone = request.args.get("zone")
+        if zone is None:
+            return dispatcher.default_zone
+        if zone not in dispatcher.zones:
+            abort(404, f"unknown zone {zone}")
+        return dispatcher.zones[zone]
+
+    @bp.context_processor
+    def inject_zones():
+        return {"zones": list(dispatcher.zones), "zone": get_zone().name}
+
     @bp.route("/", methods=("GET", "POST"))
     @login_required
     def showcontrol():
+        schedctrl = get_zone()
         if request.method == "POST":
             if "pause" in request.form:
                 t = Thread(target=schedctrl.scheduler_pause)
@@ -32,6 +47,7 @@ def construct_showcontrol_bluperint(schedctrl: SchedControl) -> Blueprint:
     @bp.route("/tracks", methods=("GET", "POST"))
     @login_required
     def web_tracks():
+        schedctrl = get_zone()
         if request.method == "POST":
             track = request.form.get("track")
 
@@ -43,15 +59,20 @@ def construct_showcontrol_bluperint(schedctrl: SchedControl) -> Blueprint:
 
             schedctrl.play_track(track_id=track)
 
-        # Sort track keys by audio index
-        sorted_track_keys = sorted(
-            schedctrl.tracks.keys(), key=lambda x: schedctrl.tracks[x]["audio_index"]
-        )
-        # passing keys as a list is needed in the rendering to specify an order of the tracks
+        # tracks in the order of their audio index
         return render_template(
             "showcontrol/tracks.html",
-            tracks=schedctrl.tracks,
-            track_keys=sorted_track_keys,
+            tracks=schedctrl.tracks.sorted_by_audio_index(),
+        )
+
+    @bp.route("/services", methods=("GET", "POST"))
+    @login_required
+    def services():
+        if dispatcher.service_health is None:
+            return render_template("showcontrol/services.html", health=None)
+        return render_template(
+            "showcontrol/services.html",
+            health=dispatcher.service_health.status(refresh=request.method == "POST"),
         )
 
     return bp
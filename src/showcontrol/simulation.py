@@ -0,0 +1,243 @@
+from dataclasses import dataclass, asdict
+from datetime import datetime, timedelta
+from pathlib import Path
+import heapq
+import json
+import logging
+import sys
+import time
+
+import click
+
+from showcontrol.clock import ManualClock
+from showcontrol.config import find_config_files
+from showcontrol.dispatcher import Dispatcher
+from showcontrol.export import day_names
+from showcontrol.schedcontrol import SchedControl
+
+log = logging.getLogger(__name__)
+
+
+@dataclass
+class TimelineEntry:
+    time: datetime
+    zone: str
+    sink: str
+    destination: str
+    message: str
+
+    def __str__(self) -> str:
+        return f"{self.time.isoformat(timespec='milliseconds')}\t{self.zone}\t{self.sink:<6}\t{self.destination:<21}\t{self.message}"
+
+
+class RecordingReaper(object):
+    """Stands in for the SimpleUDPClient talking to reaper, records every message into the timeline"""
+
+    def __init__(self, timeline: list, clock: ManualClock, zone: str, destination: str):
+        self.timeline = timeline
+        self.clock = clock
+        self.zone = zone
+        self.destination = destination
+
+    def send_message(self, address: str, value):
+        self.timeline.append(
+            TimelineEntry(
+                self.clock.now(),
+                self.zone,
+                "reaper",
+                self.destination,
+                f"{address} {value}",
+            )
+        )
+
+
+class RecordingSocket(object):
+    """Stands in for the udp socket of the video delivery, records every datagram into the timeline"""
+
+    def __init__(self, timeline: list, clock: ManualClock, zone: str):
+        self.timeline = timeline
+        self.clock = clock
+        self.zone = zone
+
+    def sendto(self, data: bytes, address: tuple[str, int]) -> int:
+        self.timeline.append(
+            TimelineEntry(
+                self.clock.now(),
+                self.zone,
+                "video",
+                f"{address[0]}:{address[1]}",
+                data.decode("utf-8").strip(),
+            )
+        )
+        return len(data)
+
+    def close(self):
+        pass
+
+
+class Simulation(object):
+    """Runs the jobs of all zones of a Dispatcher in virtual time.
+
+    The scheduler of the dispatcher is never started, instead the triggers of all its jobs are evaluated in order
+    and the job functions are called after the virtual clock was moved to their fire time. Reaper and the video
+    players of every zone are replaced by recording sinks, everything that would have been sent ends up in self.timeline.
+
+    Args:
+        start (datetime): virtual time the simulation starts at, has to be timezone aware
+        dispatcher (Dispatcher, optional): engine to simulate. Defaults to a new Dispatcher reading the current config.
+    """
+
+    def __init__(self, start: datetime, dispatcher: Dispatcher | None = None):
+        self.clock = ManualClock(start)
+        self.timeline: list[TimelineEntry] = []
+        # (fire time, zone, track_id) of all cues that were fired
+        self.cues: list[tuple[datetime, str, str]] = []
+
+        if dispatcher is None:
+            dispatcher = Dispatcher(clock=self.clock)
+        dispatcher.clock = self.clock
+        self.dispatcher = dispatcher
+
+        for name, schedctrl in dispatcher.zones.items():
+            schedctrl.clock = self.clock
+            schedctrl.reaper = RecordingReaper(
+                self.timeline,
+                self.clock,
+                name,
+                f"{schedctrl.reaper_hostname}:{schedctrl.reaper_port}",
+            )
+            schedctrl.video_delivery.socket.close()
+            schedctrl.video_delivery.socket = RecordingSocket(
+                self.timeline, self.clock, name
+            )
+
+    def run(self, until: datetime) -> int:
+        """fires all jobs up to the virtual time until
+
+        Returns:
+            int: number of fired jobs
+        """
+        queue = []
+        for seq, job in enumerate(self.dispatcher.sched.get_jobs()):
+            fire_time = job.trigger.get_next_fire_time(None, self.clock.now())
+            if fire_time is not None:
+                queue.append((fire_time, seq, job))
+        heapq.heapify(queue)
+
+        n_fired = 0
+        while queue and queue[0][0] <= until:
+            fire_time, seq, job = heapq.heappop(queue)
+
+            # a job that ran long (sleeps in the play functions) can push the clock past the next fire time
+            if fire_time > self.clock.now():
+                self.clock.set(fire_time)
+
+            if getattr(job.func, "__func__", None) is SchedControl.play_scheduled_track:
+                self.cues.append(
+                    (self.clock.now(), job.func.__self__.name, job.args[0])
+                )
+            elif getattr(job.func, "__func__", None) is SchedControl.play_queued_cues:
+                schedctrl = job.func.__self__
+                self.cues.extend(
+                    (self.clock.now(), schedctrl.name, cue.track_id)
+                    for cue in schedctrl.cue_queue.due(self.clock.now())
+                )
+            try:
+                job.func(*job.args, **job.kwargs)
+            except Exception as e:
+                log.error(f"job {job} raised {e!r} at {self.clock.now()}")
+            n_fired += 1
+
+            next_fire_time = job.trigger.get_next_fire_time(fire_time, fire_time)
+            if next_fire_time is not None:
+                heapq.heappush(queue, (next_fire_time, seq, job))
+
+        if until > self.clock.now():
+            self.clock.set(until)
+        return n_fired
+
+    def readable_cues(self) -> list[str]:
+        """the fired cues in a format similar to the readable full schedules"""
+        zones = self.dispatcher.zones
+        lines = []
+        for fire_time, zone, track_id in self.cues:
+            title = zones[zone].tracks[track_id].title
+            day = f"{day_names[fire_time.weekday()]} {fire_time.date().isoformat()}"
+            line = f"{day:<20}\t{fire_time.strftime('%H:%M:%S')}\t{title}"
+            lines.append(line if len(zones) == 1 else f"{zone}\t{line}")
+        return lines
+
+
+@click.command(
+    help="replay the schedule in virtual time and print everything showcontrol would send"
+)
+@click.option(
+    "-c",
+    "--config-dir",
+    "config_dir",
+    type=click.Path(
+        exists=True, dir_okay=True, file_okay=False, resolve_path=True, path_type=Path
+    ),
+    help="path to configfile",
+)
+@click.option(
+    "-s",
+    "--start",
+    type=click.DateTime(),
+    default=None,
+    help="start of the simulation, defaults to now",
+)
+@click.option("-d", "--days", type=float, default=7, help="number of days to simulate")
+@click.option(
+    "-f",
+    "--format",
+    "output_format",
+    type=click.Choice(["timeline", "readable", "json"]),
+    default="timeline",
+    help="timeline: every message sent, readable: one line per track, json: every message as json",
+)
+@click.option(
+    "-o",
+    "--output-file",
+    type=click.Path(dir_okay=False, writable=True, path_type=Path),
+    default=None,
+    help="file to write the output to, defaults to stdout",
+)
+def main(
+    config_dir: Path | None,
+    start: datetime | None,
+    days: float,
+    output_format: str,
+    output_file: Path | None,
+):
+    find_config_files(config_dir)
+    start = (datetime.now() if start is None else start).astimezone()
+    sim = Simulation(start)
+
+    t_start = time.perf_counter()
+    n_fired = sim.run(start + timedelta(days=days))
+    t_elapsed = time.perf_counter() - t_start
+
+    if output_format == "readable":
+        lines = sim.readable_cues()
+    elif output_format == "json":
+        lines = [
+            json.dumps(asdict(e) | {"time": e.time.isoformat()}) for e in sim.timeline
+        ]
+    else:
+        lines = [str(e) for e in sim.timeline]
+
+    if output_file is None:
+        click.echo("\n".join(lines))
+    else:
+        with open(output_file, "w") as f:
+            f.write("\n".join(lines) + "\n")
+
+    print(
+        f"simulated {days} days: {n_fired} jobs, {len(sim.timeline)} messages in {t_elapsed:.3f}s",
+        file=sys.stderr,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,197 @@
+"""Engine state that survives a restart, kept in the sqlite database of the instance.
+
+For every zone the pause state, the last fired cue and the queued cues (see showcontrol.cuequeue) are
+saved. Changes are collected in memory and written behind by a background thread, all changes of an
+interval in one transaction, so the engine never waits for the disk. Only the last change of a zone or cue
+within an interval is written.
+
+On startup the state of all zones is read in a single query and restored before the scheduler starts:
+paused zones stay paused, queued cues keep their ids and times. Cues that were due while showcontrol was
+down are still played if they are at most state_queue_grace seconds late, older ones are dropped.
+
+config example:
+
+    # seconds between two writes of the state
+    state_flush_interval: 0.5
+    # seconds a queued cue may be late after a restart and still be played
+    state_queue_grace: 60
+    # seconds the restore may take before a warning is logged
+    state_restore_budget: 0.5
+"""
+
+from dataclasses import dataclass, field
+from pathlib import Path
+from threading import Event, Lock, Thread
+import logging
+import sqlite3
+
+from showcontrol.metrics import metrics
+
+log = logging.getLogger(__name__)
+
+# the tables of the state, kept out of schema.sql so flask init-db does not drop them
+schema_path = Path(__file__).parent / "state_schema.sql"
+
+# both tables in one read, the zone state rows have no cue id
+restore_query = """
+SELECT zone, paused, last_track, last_cue_time, NULL, NULL FROM zone_state
+UNION ALL
+SELECT zone, NULL, track_id, time, id, relative FROM queued_cue
+"""
+
+
+@dataclass
+class ZoneState:
+    paused: bool = False
+    last_track: str | None = None
+    # unix time the last cue was fired at
+    last_cue_time: float | None = None
+    # (id, track_id, unix time, relative) of the queued cues
+    cues: list[tuple[str, str, float, bool]] = field(default_factory=list)
+
+
+class StateStore(object):
+    """Write-behind store of the engine state
+
+    Args:
+        path (Path | str): sqlite database, usually the database of the flask instance
+        flush_interval (float, optional): seconds between two writes. Defaults to 0.5.
+    """
+
+    def __init__(self, path: Path | str, flush_interval: float = 0.5):
+        self.path = Path(path)
+        self.flush_interval = flush_interval
+        # (table, key): row to write, None to delete it
+        self._pending: dict[tuple[str, str], tuple | None] = {}
+        self._lock = Lock()
+        self._db_lock = Lock()
+        self._stop = Event()
+        self._thread: Thread | None = None
+
+        self._db: sqlite3.Connection | None = sqlite3.connect(
+            self.path, check_same_thread=False
+        )
+        # readers of the flask routes don't block the writes
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(schema_path.read_text())
+
+    def save_zone(
+        self,
+        zone: str,
+        paused: bool,
+        last_track: str | None,
+        last_cue_time: float | None,
+    ):
+        with self._lock:
+            self._pending[("zone", zone)] = (
+                zone,
+                int(paused),
+                last_track,
+                last_cue_time,
+            )
+
+    def save_cue(
+        self,
+        zone: str,
+        cue_id: str,
+        track_id: str,
+        time: float,
+        relative: bool = False,
+    ):
+        with self._lock:
+            self._pending[("cue", cue_id)] = (
+                cue_id,
+                zone,
+                track_id,
+                time,
+                int(relative),
+            )
+
+    def delete_cue(self, cue_id: str):
+        with self._lock:
+            self._pending[("cue", cue_id)] = None
+
+    def load(self) -> dict[str, ZoneState]:
+        """the saved state of all zones, read in a single query"""
+        states: dict[str, ZoneState] = {}
+        with self._db_lock:
+            rows = self._db.execute(restore_query).fetchall()
+        for zone, paused, track_id, time, cue_id, relative in rows:
+            state = states.setdefault(zone, ZoneState())
+            if cue_id is None:
+                state.paused = bool(paused)
+                state.last_track = track_id
+                state.last_cue_time = time
+            else:
+                state.cues.append((cue_id, track_id, time, bool(relative)))
+        return states
+
+    def flush(self) -> int:
+        """writes the pending changes in one transaction
+
+        Returns:
+            int: number of written rows
+        """
+        # one flush at a time, an older change must never be written after a newer one
+        with self._db_lock:
+            with self._lock:
+                pending, self._pending = self._pending, {}
+            if not pending or self._db is None:
+                return 0
+            zones = [row for (table, _), row in pending.items() if table == "zone"]
+            cues = [
+                row for (table, _), row in pending.items() if table == "cue" and row
+            ]
+            deleted = [
+                (key,)
+                for (table, key), row in pending.items()
+                if table == "cue" and row is None
+            ]
+            try:
+                with self._db:
+                    self._db.executemany(
+                        "INSERT OR REPLACE INTO zone_state VALUES (?, ?, ?, ?)", zones
+                    )
+                    self._db.executemany(
+                        "INSERT OR REPLACE INTO queued_cue VALUES (?, ?, ?, ?, ?)", cues
+                    )
+                    self._db.executemany("DELETE FROM queued_cue WHERE id = ?", deleted)
+            except sqlite3.Error:
+                # written with the next flush, unless they were changed again in the meantime
+                with self._lock:
+                    self._pending = pending | self._pending
+                raise
+        metrics.increment("state_flushes")
+        metrics.increment("state_rows_written", len(pending))
+        return len(pending)
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = Thread(target=self._run, name="StateStore", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """stops the writer thread and writes the pending changes"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self.flush()
+
+    def close(self):
+        """writes the pending changes and closes the database, later changes are not saved"""
+        self.stop()
+        with self._db_lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+    def _run(self):
+        while not self._stop.wait(self.flush_interval):
+            try:
+                self.flush()
+            except sqlite3.Error as e:
+                log.error(f"writing the engine state to {self.path} failed: {e}")
@@ -0,0 +1,16 @@
+-- engine state, see showcontrol.state. Created by showcontrol on startup, init-db leaves it alone
+
+CREATE TABLE IF NOT EXISTS zone_state (
+  zone TEXT PRIMARY KEY,
+  paused INTEGER NOT NULL,
+  last_track TEXT,
+  last_cue_time REAL
+);
+
+CREATE TABLE IF NOT EXISTS queued_cue (
+  id TEXT PRIMARY KEY,
+  zone TEXT NOT NULL,
+  track_id TEXT NOT NULL,
+  time REAL NOT NULL,
+  relative INTEGER NOT NULL DEFAULT 0
+);
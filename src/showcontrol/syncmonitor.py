@@ -0,0 +1,459 @@
+"""Monitoring of the playback positions of reaper and the video players.
+
+The SyncPoller asks every syncplayer for its time-pos, playlist-pos and pause state through the mpv json ipc
+relay on the info port, and compares the answers with each other and with the play position reaper reports
+in its osc feedback.
+
+config example:
+
+    # seconds between two polls, polling is disabled without this option
+    sync_poll_interval: 1.0
+    # seconds to wait for the replies of one poll
+    sync_poll_timeout: 0.2
+    # number of polls kept in the history
+    sync_history: 600
+    # seconds of skew between the players and of offset to reaper that raise an alert
+    sync_skew_threshold: 0.1
+    sync_reaper_threshold: 0.2
+    # reaper sends its osc feedback to this port. TIME has to be enabled in the pattern config of the
+    # control surface, the shipped HufoShowControl.ReaperOSC has it commented out
+    reaper_feedback_port: 9000
+"""
+
+from collections import Counter, deque
+from collections.abc import Callable
+from dataclasses import asdict, dataclass, field
+from threading import Event, Lock, Thread
+import json
+import logging
+import select
+import socket
+
+from pythonosc.osc_packet import OscPacket, ParseError
+
+from showcontrol.clock import SystemClock
+from showcontrol.delivery import VideoDelivery
+from showcontrol.metrics import metrics
+
+log = logging.getLogger(__name__)
+
+polled_properties = ["time-pos", "playlist-pos", "pause"]
+
+
+class ReaperFeedback(object):
+    """Listens to the osc feedback of reaper and keeps track of its transport and play position
+
+    Args:
+        address (tuple[str, int]): address to listen on
+        clock (SystemClock, optional): Defaults to SystemClock().
+        stale_after (float, optional): while playing, the position is unknown if no /time arrived for this many seconds. Defaults to 1.0.
+    """
+
+    def __init__(
+        self,
+        address: tuple[str, int],
+        clock: SystemClock | None = None,
+        stale_after: float = 1.0,
+    ):
+        self.clock = SystemClock() if clock is None else clock
+        self.stale_after = stale_after
+
+        self.time: float | None = None
+        self.received_at: float | None = None
+        self.playing = False
+        self.region: str | None = None
+        self.region_time = 0.0
+        self.n_received = 0
+
+        self._lock = Lock()
+        self._stop = Event()
+        self._thread: Thread | None = None
+        self._socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self._socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self._socket.bind(address)
+        self._socket.settimeout(0.2)
+
+    @property
+    def address(self) -> tuple[str, int]:
+        return self._socket.getsockname()
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = Thread(target=self._run, name="ReaperFeedback", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def close(self):
+        self.stop()
+        self._socket.close()
+
+    def handle(self, data: bytes):
+        try:
+            packet = OscPacket(data)
+        except ParseError:
+            return
+        now = self.clock.monotonic()
+        with self._lock:
+            for timed_message in packet.messages:
+                message = timed_message.message
+                params = list(message.params)
+                if not params:
+                    continue
+                self.n_received += 1
+                if message.address == "/time":
+                    self.time = float(params[0])
+                    self.received_at = now
+                elif message.address == "/play":
+                    self.playing = bool(params[0])
+                elif message.address == "/stop" and params[0]:
+                    self.playing = False
+                elif message.address == "/lastregion/time":
+                    self.region_time = float(params[0])
+                elif message.address == "/lastregion/number/str":
+                    self.region = str(params[0])
+
+    def position(self, at: float | None = None) -> float | None:
+        """play position relative to the start of the current region at the monotonic time at
+
+        Returns:
+            float | None: position in seconds, None if reaper did not report its time recently
+        """
+        at = self.clock.monotonic() if at is None else at
+        with self._lock:
+            if self.time is None:
+                return None
+            position = self.time - self.region_time
+            if not self.playing:
+                return position
+            if at - self.received_at > self.stale_after:
+                return None
+            return position + (at - self.received_at)
+
+    def status(self) -> dict:
+        return {
+            "playing": self.playing,
+            "region": self.region,
+            "position": self.position(),
+        }
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                data, _ = self._socket.recvfrom(65536)
+            except socket.timeout:
+                continue
+            except OSError:
+                break
+            self.handle(data)
+
+
+@dataclass
+class PlayerState:
+    name: str
+    # position at the time the poll was sent
+    time_pos: float | None = None
+    playlist_pos: int | None = None
+    paused: bool | None = None
+    # seconds between sending the poll and receiving the time-pos reply
+    rtt: float | None = None
+
+
+@dataclass
+class SyncSample:
+    time: str
+    players: dict[str, PlayerState] = field(default_factory=dict)
+    missing: list[str] = field(default_factory=list)
+    # playlist position of the majority of the players
+    playlist_pos: int | None = None
+    # spread of the positions of the players on the majority playlist position
+    skew: float | None = None
+    reaper_position: float | None = None
+    # position of the player minus the position of reaper
+    reaper_offsets: dict[str, float] = field(default_factory=dict)
+
+
+class SyncPoller(object):
+    """Polls the video players for their playback state and computes their skew.
+
+    Positions are corrected to the time the poll was sent, assuming a player answered halfway through the
+    round trip. Alerts are raised once when a threshold is crossed and resolved when the value is back below it.
+
+    Args:
+        delivery (VideoDelivery): delivery used to send the requests, the replies arrive on its socket
+        players (dict[str, str]): name: host of the expected players
+        info_port (int): port of the json ipc relay
+        name (str, optional): name of the zone, used in logs and metrics. Defaults to "default".
+        reaper_feedback (ReaperFeedback, optional): compare the players with reaper. Defaults to None.
+        interval (float, optional): seconds between two polls. Defaults to 1.0.
+        timeout (float, optional): seconds to wait for the replies of a poll. Defaults to 0.2.
+        history (int, optional): number of samples kept. Defaults to 600.
+        skew_threshold (float, optional): Defaults to 0.1.
+        reaper_threshold (float, optional): Defaults to 0.2.
+        clock (SystemClock, optional): Defaults to SystemClock().
+    """
+
+    def __init__(
+        self,
+        delivery: VideoDelivery,
+        players: dict[str, str],
+        info_port: int,
+        name: str = "default",
+        reaper_feedback: ReaperFeedback | None = None,
+        interval: float = 1.0,
+        timeout: float = 0.2,
+        history: int = 600,
+        skew_threshold: float = 0.1,
+        reaper_threshold: float = 0.2,
+        clock: SystemClock | None = None,
+    ):
+        self.delivery = delivery
+        self.info_port = info_port
+        self.name = name
+        self.reaper_feedback = reaper_feedback
+        self.interval = interval
+        self.timeout = timeout
+        self.skew_threshold = skew_threshold
+        self.reaper_threshold = reaper_threshold
+        self.clock = SystemClock() if clock is None else clock
+
+        # replies are matched to the players by their address
+        self.players = {self._resolve(host): name for name, host in players.items()}
+
+        # called with every new sample
+        self.on_sample: Callable[[SyncSample], None] | None = None
+
+        self.history: deque[SyncSample] = deque(maxlen=history)
+        self.active_alerts: dict[tuple, dict] = {}
+        self.alerts = deque(maxlen=100)
+
+        self._request_id = 0
+        self._stop = Event()
+        self._thread: Thread | None = None
+
+    @staticmethod
+    def _resolve(host: str) -> str:
+        try:
+            return socket.gethostbyname(host)
+        except OSError:
+            return host
+
+    @property
+    def latest(self) -> SyncSample | None:
+        return self.history[-1] if self.history else None
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = Thread(target=self._run, name="SyncPoller", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def close(self):
+        self.stop()
+        self.delivery.close()
+
+    def _drain(self):
+        """discards replies that arrived after the timeout of an earlier poll"""
+        while select.select([self.delivery.socket], [], [], 0)[0]:
+            try:
+                self.delivery.socket.recvfrom(65536)
+            except OSError:
+                return
+
+    def _send_requests(self) -> dict[int, str]:
+        requests = {}
+        for prop in polled_properties:
+            self._request_id += 1
+            requests[self._request_id] = prop
+            message = {
+                "command": ["get_property", prop],
+                "request_id": self._request_id,
+            }
+            self.delivery.send(
+                json.dumps(message).encode("utf-8") + b"\n", [self.info_port]
+            )
+        return requests
+
+    def _collect(self, requests: dict[int, str], t_sent: float) -> dict[str, dict]:
+        """receives the replies until all players answered or the timeout passed
+
+        Returns:
+            dict[str, dict]: address: {property: (value, receive time)}
+        """
+        replies: dict[str, dict] = {}
+        deadline = t_sent + self.timeout
+        while True:
+            remaining = deadline - self.clock.monotonic()
+            if remaining <= 0:
+                break
+            if not select.select([self.delivery.socket], [], [], remaining)[0]:
+                break
+            try:
+                data, sender = self.delivery.socket.recvfrom(65536)
+            except OSError:
+                break
+            t_received = self.clock.monotonic()
+            for line in data.splitlines():
+                try:
+                    reply = json.loads(line)
+                except ValueError:
+                    continue
+                prop = requests.get(reply.get("request_id"))
+                if prop is None or reply.get("error") != "success":
+                    continue
+                replies.setdefault(sender[0], {})[prop] = (
+                    reply.get("data"),
+                    t_received,
+                )
+
+            if self.players and all(
+                len(replies.get(address, {})) == len(requests)
+                for address in self.players
+            ):
+                break
+        return replies
+
+    def poll(self) -> SyncSample:
+        """polls all players once, stores the sample in the history and updates the alerts"""
+        self._drain()
+        requests = self._send_requests()
+        t_sent = self.clock.monotonic()
+        replies = self._collect(requests, t_sent)
+
+        sample = SyncSample(self.clock.now().isoformat())
+        for address, values in replies.items():
+            state = PlayerState(self.players.get(address, address))
+            if "pause" in values:
+                state.paused = bool(values["pause"][0])
+            if "playlist-pos" in values and values["playlist-pos"][0] is not None:
+                state.playlist_pos = int(values["playlist-pos"][0])
+            if "time-pos" in values and values["time-pos"][0] is not None:
+                time_pos, t_received = values["time-pos"]
+                state.rtt = t_received - t_sent
+                state.time_pos = float(time_pos)
+                if not state.paused:
+                    state.time_pos -= state.rtt / 2
+            sample.players[state.name] = state
+
+        sample.missing = [
+            name
+            for name in self.players.values()
+            if sample.players.get(name, PlayerState(name)).time_pos is None
+        ]
+
+        playlist_positions = Counter(
+            p.playlist_pos
+            for p in sample.players.values()
+            if p.playlist_pos is not None
+        )
+        if playlist_positions:
+            sample.playlist_pos = playlist_positions.most_common(1)[0][0]
+        in_sync = [
+            p
+            for p in sample.players.values()
+            if p.playlist_pos == sample.playlist_pos and p.time_pos is not None
+        ]
+        if len(in_sync) > 1:
+            positions = [p.time_pos for p in in_sync]
+            sample.skew = max(positions) - min(positions)
+
+        if self.reaper_feedback is not None and self.reaper_feedback.playing:
+            sample.reaper_position = self.reaper_feedback.position(t_sent)
+        if sample.reaper_position is not None:
+            sample.reaper_offsets = {
+                p.name: p.time_pos - sample.reaper_position
+                for p in in_sync
+                if not p.paused
+            }
+
+        self.history.append(sample)
+        self._update_metrics(sample)
+        self._update_alerts(sample)
+        if self.on_sample is not None:
+            self.on_sample(sample)
+        return sample
+
+    def _update_metrics(self, sample: SyncSample):
+        metrics.increment("sync_polls", zone=self.name)
+        metrics.set("sync_players_missing", len(sample.missing), zone=self.name)
+        if sample.skew is not None:
+            metrics.set("sync_skew_seconds", sample.skew, zone=self.name)
+        for player, offset in sample.reaper_offsets.items():
+            metrics.set(
+                "sync_reaper_offset_seconds", offset, zone=self.name, player=player
+            )
+
+    def _update_alerts(self, sample: SyncSample):
+        alerts = {}
+        for name in sample.missing:
+            alerts[("missing", name)] = f"{name} did not answer"
+        for player in sample.players.values():
+            if (
+                player.playlist_pos is not None
+                and player.playlist_pos != sample.playlist_pos
+            ):
+                alerts[("playlist", player.name)] = (
+                    f"{player.name} plays video {player.playlist_pos} instead of {sample.playlist_pos}"
+                )
+        if sample.skew is not None and sample.skew > self.skew_threshold:
+            alerts[("skew", None)] = (
+                f"video players are {sample.skew * 1000:.0f} ms apart"
+            )
+        for name, offset in sample.reaper_offsets.items():
+            if abs(offset) > self.reaper_threshold:
+                alerts[("reaper_offset", name)] = (
+                    f"{name} is {offset * 1000:+.0f} ms off reaper"
+                )
+
+        for key, message in alerts.items():
+            if key in self.active_alerts:
+                continue
+            alert = {
+                "time": sample.time,
+                "zone": self.name,
+                "kind": key[0],
+                "player": key[1],
+                "message": message,
+            }
+            self.active_alerts[key] = alert
+            self.alerts.append(alert)
+            metrics.increment("sync_alerts", zone=self.name, kind=key[0])
+            log.warning(f"zone {self.name}: {message}")
+        for key in list(self.active_alerts):
+            if key not in alerts:
+                log.info(
+                    f"zone {self.name}: resolved {self.active_alerts.pop(key)['message']}"
+                )
+
+    def status(self) -> dict:
+        latest = self.latest
+        return {
+            "enabled": True,
+            "latest": None if latest is None else asdict(latest),
+            "alerts": list(self.active_alerts.values()),
+            "recent_alerts": list(self.alerts),
+            "reaper": (
+                None if self.reaper_feedback is None else self.reaper_feedback.status()
+            ),
+        }
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.poll()
+            except Exception as e:
+                log.error(f"zone {self.name}: sync poll failed: {e!r}")
+            self._stop.wait(self.interval)
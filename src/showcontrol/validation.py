@@ -0,0 +1,351 @@
+"""Checks a schedule before it is played.
+
+Every entry of a schedule is expanded into one interval per day it is played on, from its start to the end
+of its track. The intervals of a day are sorted by start and checked in one sweep:
+
+- overlap: a track starts before the previous one has ended
+- gap: more than max_gap seconds of silence between two tracks
+- outside_hours: a track starts before the opening hours or ends after them
+- unknown_track: the track_id is not in the tracks dir, the job would fail when it fires
+- invalid_entry: the entry is missing a field or has a time or day the cron trigger does not accept
+- unchecked_entry: the entry is a cron expression like hour: "10-17" that is played but not expanded, it is
+  not part of the checks above
+
+Overlaps, unknown tracks and invalid entries are errors, the rest are warnings. Weekly entries are checked per
+weekday, dated entries (see showcontrol.season) per date, so a season with thousands of plays is checked in
+a single sort of every day.
+
+config example:
+
+    # opening hours of every day, HH:MM-HH:MM. Defaults to no check of the opening hours
+    opening_hours: 10:40-18:30
+    # seconds between two tracks until a gap is reported
+    schedule_max_gap: 900
+    # refuse to load a schedule with errors instead of skipping the invalid entries
+    schedule_strict: false
+"""
+
+from collections.abc import Callable
+from dataclasses import dataclass
+from datetime import date, time
+import logging
+
+from apscheduler.triggers.cron import CronTrigger
+
+from showcontrol.catalog import TrackCatalog
+from showcontrol.season import OpeningHours, weekday_names
+
+log = logging.getLogger(__name__)
+
+errors = {"overlap", "unknown_track", "invalid_entry"}
+
+# three letter day names as understood by the cron trigger of apscheduler
+cron_day_names = [name[:3] for name in weekday_names]
+
+
+@dataclass
+class Issue:
+    kind: str
+    # weekday number of a weekly entry or date of a dated entry
+    day: int | date | None
+    # seconds after midnight
+    start: int | None
+    track_id: str | None
+    message: str
+    # position of the entry in the schedule
+    entry: int | None = None
+
+    @property
+    def is_error(self) -> bool:
+        return self.kind in errors
+
+    def __str__(self) -> str:
+        if isinstance(self.day, int):
+            where = weekday_names[self.day]
+        elif self.day is not None:
+            where = self.day.isoformat()
+        else:
+            where = f"entry {self.entry}"
+        if self.start is not None:
+            where += f" {format_seconds(self.start)}"
+        return f"{where}: {self.message}"
+
+
+@dataclass
+class ValidationResult:
+    issues: list[Issue]
+    n_entries: int
+    n_intervals: int
+    # positions of entries that can not be played
+    invalid_entries: set[int]
+
+    @property
+    def errors(self) -> list[Issue]:
+        return [issue for issue in self.issues if issue.is_error]
+
+    @property
+    def warnings(self) -> list[Issue]:
+        return [issue for issue in self.issues if not issue.is_error]
+
+    @property
+    def ok(self) -> bool:
+        return not self.errors
+
+    def summary(self) -> str:
+        return (
+            f"{self.n_entries} entries, {self.n_intervals} plays: "
+            f"{len(self.errors)} errors, {len(self.warnings)} warnings"
+        )
+
+
+def format_seconds(seconds: int) -> str:
+    return f"{seconds // 3600:02d}:{seconds // 60 % 60:02d}:{seconds % 60:02d}"
+
+
+def parse_day_of_week(value) -> list[int]:
+    """days of a cron day_of_week field: numbers, mon-sun, ranges like 0-4 and *
+
+    Raises:
+        ValueError: raised when a part of the field is invalid
+    """
+    days = set()
+    for part in str(value).split(","):
+        part = part.strip().lower()
+        if part == "*":
+            days.update(range(7))
+            continue
+        first, _, last = part.partition("-")
+        first, last = _day_number(first), _day_number(last or first)
+        if last < first:
+            raise ValueError(f"invalid day range {part}")
+        days.update(range(first, last + 1))
+    return sorted(days)
+
+
+def _day_number(value: str) -> int:
+    if value in cron_day_names:
+        return cron_day_names.index(value)
+    day = int(value)
+    if not 0 <= day <= 6:
+        raise ValueError(f"invalid day {value}")
+    return day
+
+
+def _cron_number(value) -> int:
+    """a plain number of a cron field, raises TypeError or ValueError for expressions like */30"""
+    if isinstance(value, str) and value.strip().isdigit():
+        return int(value)
+    if isinstance(value, bool) or not isinstance(value, int):
+        raise TypeError(f"{value!r} is not a number")
+    return value
+
+
+def expand_schedule(
+    schedule: list[dict], tracks: TrackCatalog
+) -> tuple[dict[int | date, list[tuple[int, int, str, int]]], list[Issue]]:
+    """Expands the entries of a schedule into intervals
+
+    Returns:
+        tuple[dict, list[Issue]]: weekday number or date: (start, end, track_id, entry) in seconds after
+            midnight, and the issues of entries that could not be expanded
+    """
+    days: dict[int | date, list[tuple[int, int, str, int]]] = {}
+    issues = []
+    for i, entry in enumerate(schedule):
+        track_id = entry.get("track_id")
+        if entry.get("command", "play") != "play":
+            continue
+        try:
+            if "date" in entry:
+                start = time(entry["hour"], entry["minute"], entry["second"])
+                if not isinstance(entry["date"], date):
+                    raise ValueError(f"invalid date {entry['date']}")
+                entry_days = [entry["date"]]
+            else:
+                # the engine passes the fields to the cron trigger, only what it rejects is invalid
+                CronTrigger(
+                    hour=entry["hour"],
+                    minute=entry["minute"],
+                    second=entry["second"],
+                    day_of_week=entry["day_of_week"],
+                )
+                try:
+                    start = time(
+                        _cron_number(entry["hour"]),
+                        _cron_number(entry["minute"]),
+                        _cron_number(entry["second"]),
+                    )
+                    entry_days = parse_day_of_week(entry["day_of_week"])
+                except (TypeError, ValueError):
+                    start, entry_days = None, []
+        except (KeyError, TypeError, ValueError) as e:
+            issues.append(
+                Issue("invalid_entry", None, None, track_id, f"invalid entry: {e}", i)
+            )
+            continue
+
+        if start is not None:
+            start = start.hour * 3600 + start.minute * 60 + start.second
+        if track_id not in tracks:
+            issues.append(
+                Issue(
+                    "unknown_track",
+                    entry_days[0] if entry_days else None,
+                    start,
+                    track_id,
+                    f"unknown track {track_id}",
+                    i,
+                )
+            )
+            continue
+        if start is None:
+            issues.append(
+                Issue(
+                    "unchecked_entry",
+                    None,
+                    None,
+                    track_id,
+                    f"{track_id} at the cron expression hour={entry['hour']} minute={entry['minute']} "
+                    f"second={entry['second']} day_of_week={entry['day_of_week']} is not checked",
+                    i,
+                )
+            )
+            continue
+
+        interval = (start, start + tracks[track_id].duration, track_id, i)
+        for day in entry_days:
+            days.setdefault(day, []).append(interval)
+    return days, issues
+
+
+def validate_schedule(
+    schedule: list[dict],
+    tracks: TrackCatalog,
+    opening_hours: (
+        OpeningHours | Callable[[int | date], OpeningHours | None] | None
+    ) = None,
+    max_gap: float | None = 900,
+) -> ValidationResult:
+    """Checks a schedule as returned by read_schedule
+
+    Args:
+        schedule (list[dict]): entries of the schedule
+        tracks (TrackCatalog): tracks by name
+        opening_hours (OpeningHours | Callable, optional): opening hours of every day, or a function that
+            returns them for a weekday number or date, None if closed. Defaults to None (not checked).
+        max_gap (float, optional): seconds between two tracks until a gap is reported, None to not check
+            gaps. Defaults to 900.
+
+    Returns:
+        ValidationResult: issues sorted by day and time
+    """
+    days, issues = expand_schedule(schedule, tracks)
+    n_intervals = 0
+    for day, intervals in days.items():
+        n_intervals += len(intervals)
+        intervals.sort()
+
+        if callable(opening_hours):
+            hours = opening_hours(day)
+        else:
+            hours = opening_hours
+        if opening_hours is not None:
+            issues.extend(check_opening_hours(day, intervals, hours))
+
+        # the track that ends last so far, a long track can overlap several short ones
+        last_end, last_track = None, None
+        for start, end, track_id, entry in intervals:
+            if last_end is not None:
+                if start < last_end:
+                    issues.append(
+                        Issue(
+                            "overlap",
+                            day,
+                            start,
+                            track_id,
+                            f"{track_id} starts {last_end - start}s before {last_track} ends",
+                            entry,
+                        )
+                    )
+                elif max_gap is not None and start - last_end > max_gap:
+                    issues.append(
+                        Issue(
+                            "gap",
+                            day,
+                            last_end,
+                            track_id,
+                            f"{start - last_end}s of silence after {last_track}",
+                            entry,
+                        )
+                    )
+            if last_end is None or end > last_end:
+                last_end, last_track = end, track_id
+
+    issues.sort(key=_issue_order)
+    invalid_entries = {
+        issue.entry
+        for issue in issues
+        if issue.kind in ("unknown_track", "invalid_entry")
+    }
+    return ValidationResult(issues, len(schedule), n_intervals, invalid_entries)
+
+
+def _issue_order(issue: Issue):
+    # weekdays before dates, entries without a day first
+    if issue.day is None:
+        day = (0, 0)
+    elif isinstance(issue.day, int):
+        day = (1, issue.day)
+    else:
+        day = (2, issue.day.toordinal())
+    return day, issue.start or 0
+
+
+def check_opening_hours(
+    day: int | date,
+    intervals: list[tuple[int, int, str, int]],
+    hours: OpeningHours | None,
+) -> list[Issue]:
+    if hours is None:
+        return [
+            Issue(
+                "outside_hours", day, start, track_id, f"{track_id} on a closed day", i
+            )
+            for start, _, track_id, i in intervals
+        ]
+    opening = hours.start.hour * 3600 + hours.start.minute * 60
+    closing = hours.stop.hour * 3600 + hours.stop.minute * 60
+    issues = []
+    for start, end, track_id, i in intervals:
+        if start < opening:
+            issues.append(
+                Issue(
+                    "outside_hours",
+                    day,
+                    start,
+                    track_id,
+                    f"{track_id} starts before the opening at {hours.start.strftime('%H:%M')}",
+                    i,
+                )
+            )
+        elif end > closing:
+            issues.append(
+                Issue(
+                    "outside_hours",
+                    day,
+                    start,
+                    track_id,
+                    f"{track_id} ends {end - closing}s after the closing at {hours.stop.strftime('%H:%M')}",
+                    i,
+                )
+            )
+    return issues
+
+
+def log_result(result: ValidationResult, name: str = "schedule"):
+    for issue in result.issues:
+        if issue.is_error:
+            log.error(f"{name}: {issue}")
+        else:
+            log.warning(f"{name}: {issue}")
+    log.info(f"{name}: {result.summary()}")